@@ -0,0 +1,46 @@
+import time
+from uuid import uuid4
+
+from context_logger import setup_logging
+
+from hello import Service, Codec, JsonCodec, CompactCodec
+
+SERVICE = Service(
+    uuid4(),
+    'benchmark-service',
+    'benchmark-role',
+    {'api': 'http://localhost:8080'},
+    {'site': 'benchmark-site', 'range': 'benchmark-range', 'version': '1.0.0'},
+    '192.168.1.100'
+)
+MESSAGE_COUNT = 100000
+
+
+def measure(codec: Codec) -> tuple[int, float, float]:
+    message = SERVICE.to_dict()
+    payload = codec.encode(message)
+
+    start = time.perf_counter()
+    for _ in range(MESSAGE_COUNT):
+        codec.encode(message)
+    encoding = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(MESSAGE_COUNT):
+        codec.decode(payload)
+    decoding = time.perf_counter() - start
+
+    return len(payload), encoding / MESSAGE_COUNT * 1e6, decoding / MESSAGE_COUNT * 1e6
+
+
+def main() -> None:
+    setup_logging('hello', 'WARNING', warn_on_overwrite=False)
+
+    print(f'{"codec":<14}{"bytes/msg":>10}{"encode us/msg":>16}{"decode us/msg":>16}')
+    for codec in [JsonCodec(), CompactCodec()]:
+        size, encoding, decoding = measure(codec)
+        print(f'{type(codec).__name__:<14}{size:>10}{encoding:>16.2f}{decoding:>16.2f}')
+
+
+if __name__ == '__main__':
+    main()
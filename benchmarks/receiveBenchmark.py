@@ -0,0 +1,75 @@
+import time
+import tracemalloc
+from typing import Any
+from uuid import uuid4
+
+from context_logger import setup_logging
+from zmq import Context, RADIO
+
+from hello import Service, Group, DishReceiver, Codec, JsonCodec, CompactCodec
+
+GROUP = Group('benchmark-group', 'udp://239.0.0.1:5556')
+SERVICE = Service(
+    uuid4(),
+    'benchmark-service',
+    'benchmark-role',
+    {'api': 'http://localhost:8080'},
+    {'site': 'benchmark-site', 'range': 'benchmark-range', 'version': '1.0.0'},
+    '192.168.1.100'
+)
+MESSAGE_COUNT = 1000
+
+
+def measure(context: Context[Any], codec: Codec, zero_copy: bool, handled: bool,
+            cache_size: int) -> tuple[float, float]:
+    group = GROUP.hello()
+    receiver = DishReceiver(context, zero_copy=zero_copy, max_batch=1, cache_size=cache_size)
+    if handled:
+        receiver.register_batch(lambda messages: None)
+    receiver._dish.rcvtimeo = 1000
+    receiver._dish.bind(group.url)
+    receiver._dish.join(group.name)
+    payload = codec.encode(SERVICE.to_dict())
+
+    with context.socket(RADIO) as radio:
+        radio.connect(group.url)
+        time.sleep(0.1)
+        for _ in range(MESSAGE_COUNT):
+            radio.send(payload, group=group.name)
+        time.sleep(0.5)
+
+        peaks = []
+        elapsed = 0.0
+        tracemalloc.start()
+        for _ in range(MESSAGE_COUNT):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            receiver._receive()
+            elapsed += time.perf_counter() - start
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+
+    receiver._handler_executor.shutdown()
+    receiver._dish.close()
+    return sum(peaks) / len(peaks), elapsed / MESSAGE_COUNT * 1e6
+
+
+def main() -> None:
+    setup_logging('hello', 'WARNING', warn_on_overwrite=False)
+    context = Context()
+
+    print(f'{"codec":<14}{"handled":<10}{"cache":<8}{"zero-copy":<12}{"peak bytes/msg":>16}{"us/msg":>10}')
+    for codec in [JsonCodec(), CompactCodec()]:
+        for handled in [False, True]:
+            for cache_size in [0, 1024]:
+                for zero_copy in [False, True]:
+                    peak, duration = measure(context, codec, zero_copy, handled, cache_size)
+                    print(f'{type(codec).__name__:<14}{str(handled):<10}{cache_size:<8}{str(zero_copy):<12}'
+                          f'{peak:>16.0f}{duration:>10.1f}')
+
+    context.term()
+
+
+if __name__ == '__main__':
+    main()
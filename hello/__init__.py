@@ -1,8 +1,16 @@
 from .group import *
+from .codec import *
+from .fragment import *
+from .limiter import *
+from .executor import *
+from .pool import *
 from .sender import *
 from .receiver import *
 from .scheduler import *
 from .service import *
+from .registry import *
+from .expiry import *
 from .advertizer import *
 from .discoverer import *
+from .aio import *
 from .api import *
@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 import random
+import re
 import time
 from logging import INFO, DEBUG
 from typing import Any
@@ -10,7 +11,7 @@ from typing import Any
 from common_utility import IReusableTimer
 from context_logger import get_logger
 
-from hello import Service, Group, Sender, Receiver, ServiceMatcher, ServiceQuery, AbstractScheduler
+from hello import Service, Group, Sender, Receiver, ServiceQuery, ServiceMatcherCache, AbstractScheduler
 
 
 class Advertizer:
@@ -30,6 +31,9 @@ class Advertizer:
     def advertise(self, service: Service | None = None, log_level: int = INFO) -> None:
         raise NotImplementedError()
 
+    def set_interval(self, interval: float | None) -> None:
+        pass
+
 
 class DefaultAdvertizer(Advertizer):
 
@@ -37,64 +41,94 @@ class DefaultAdvertizer(Advertizer):
         self._sender = sender
         self._group: Group | None = None
         self._service: Service | None = None
+        self._payload: bytes | None = None
+        self._interval: float | None = None
         self.log = get_logger(type(self).__name__)
 
     def start(self, group: Group, service: Service | None = None) -> None:
         self._sender.start(group.hello())
         self._group = group
-        self._service = service
+        self._set_service(service)
         self.log.info('Advertizer started', group=self._group, service=self._service)
 
     def stop(self) -> None:
         self._group = None
-        self._service = None
+        self._set_service(None)
         self._sender.stop()
         self.log.info('Advertizer stopped')
 
     def advertise(self, service: Service | None = None, log_level: int = INFO) -> None:
         if self._group:
             if service:
-                self._service = service
+                self._set_service(service)
             if self._service:
-                self._sender.send(self._service)
-                self.log.log(log_level, 'Service advertised', service=self._service, group=self._group)
+                if payload := self._get_payload(self._service):
+                    self._sender.send_encoded(payload)
+                    self.log.log(log_level, 'Service advertised', service=self._service, group=self._group)
             else:
                 self.log.warning('Cannot advertise service, no service provided', group=self._group)
         else:
             self.log.warning('Cannot advertise service, advertizer not started', service=service)
 
+    def set_interval(self, interval: float | None) -> None:
+        if interval != self._interval:
+            self._interval = interval
+            self._payload = None
+
+    def _set_service(self, service: Service | None) -> None:
+        if service is not self._service and service != self._service:
+            self._service = service
+            self._payload = None
+
+    def _get_payload(self, service: Service) -> bytes | None:
+        if self._payload is None:
+            if self._interval is None:
+                self._payload = self._sender.encode(service)
+            else:
+                self._payload = self._sender.encode({**service.to_dict(), 'interval': self._interval})
+        return self._payload
+
 
 class RespondingAdvertizer(DefaultAdvertizer):
 
-    def __init__(self, sender: Sender, receiver: Receiver, max_response_delay: float = 0.1) -> None:
+    def __init__(self, sender: Sender, receiver: Receiver, max_response_delay: float = 0.1,
+                 matcher_cache_size: int = 256) -> None:
         super().__init__(sender)
         self._receiver = receiver
         self._max_delay = max_response_delay
+        self._matchers = ServiceMatcherCache(matcher_cache_size)
 
     def start(self, group: Group, service: Service | None = None) -> None:
         super().start(group, service)
         self._receiver.start(group.query())
-        self._receiver.register(self._handle_message)
+        self._receiver.register(self._handle_message, self._accepts)
 
     def stop(self) -> None:
         self._receiver.deregister(self._handle_message)
         self._receiver.stop()
         super().stop()
 
+    def _accepts(self, name: str, role: str) -> bool:
+        if service := self._service:
+            try:
+                return self._matchers.matches(ServiceQuery(name, role), service)
+            except re.error:
+                return False
+        return False
+
     def _handle_message(self, message: dict[str, Any]) -> None:
         if self._service:
             try:
                 query = ServiceQuery(**message)
-                matcher = ServiceMatcher(query)
                 self.log.debug('Service query received', group=self._group, query=query)
-                self._handle_query(matcher, self._service)
+                self._handle_query(query, self._service)
             except Exception as error:
                 self.log.warning('Invalid service query received', group=self._group, received=message, error=error)
 
-    def _handle_query(self, matcher: ServiceMatcher, service: Service) -> None:
-        if matcher.matches(service):
+    def _handle_query(self, query: ServiceQuery, service: Service) -> None:
+        if self._matchers.matches(query, service):
             delay = round(self._max_delay * random.random(), 3)
-            self.log.debug('Responding to query', group=self._group, query=matcher.query, delay=delay)
+            self.log.debug('Responding to query', group=self._group, query=query, delay=delay)
             time.sleep(delay)
             self.advertise(service, DEBUG)
 
@@ -121,5 +155,12 @@ class ScheduledAdvertizer(AbstractScheduler[Service], Advertizer):
     def advertise(self, service: Service | None = None, log_level: int = INFO) -> None:
         self._advertizer.advertise(service, log_level)
 
+    def set_interval(self, interval: float | None) -> None:
+        self._advertizer.set_interval(interval)
+
+    def schedule_periodic(self, service: Service | None = None, interval: float | None = None) -> None:
+        self.set_interval(self._interval if interval is None else interval)
+        super().schedule_periodic(service, interval)
+
     def _execute(self, service: Service | None = None) -> None:
         self.advertise(service, DEBUG)
@@ -0,0 +1,387 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import random
+import re
+from logging import INFO, DEBUG
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine
+from uuid import UUID
+
+from context_logger import get_logger
+from zmq import RADIO, DISH, NOBLOCK, Again, ZMQError
+from zmq.asyncio import Context as AsyncContext, Socket as AsyncSocket
+
+from hello import PrefixedGroup, Group, Codec, JsonCodec, Compressor, CodecRegistry, Reassembler, FRAGMENT_TAG, \
+    Buffer, Prefilter, fragment_payload, MAX_DATAGRAM_SIZE, convert_to_dict, add_header, Service, ServiceQuery, \
+    ServiceMatcher, ServiceMatcherCache, ServiceRegistry, ServiceSnapshot, DiscoveryEvent, DiscoveryEventType
+
+
+class AsyncRadioSender:
+
+    def __init__(self, context: AsyncContext, codec: Codec | None = None,
+                 max_datagram_size: int = MAX_DATAGRAM_SIZE, compressor: Compressor | None = None,
+                 header: bool = False) -> None:
+        self._context = context
+        self._codec = codec if codec else JsonCodec()
+        self._compressor = compressor
+        self._header = header
+        self._max_datagram_size = max_datagram_size
+        self._payload_budget = max_datagram_size
+        self._radio: AsyncSocket | None = None
+        self._group: str | None = None
+        self.log = get_logger(type(self).__name__)
+
+    def __enter__(self) -> 'AsyncRadioSender':
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.stop()
+
+    def start(self, group: PrefixedGroup) -> None:
+        try:
+            if self._group:
+                raise RuntimeError('Sender already started')
+            radio = self._context.socket(RADIO)
+            try:
+                radio.connect(group.url)
+            except Exception:
+                radio.close()
+                raise
+            self._radio = radio
+            self._payload_budget = self._max_datagram_size - len(group.name.encode('utf-8')) - 1
+            self._group = group.name
+            self.log.debug('Sender started', url=group.url, group=group.name)
+        except Exception as error:
+            self.log.error('Failed to start sender', url=group.url, group=group.name, error=error)
+            raise error
+
+    def stop(self) -> None:
+        if radio := self._radio:
+            radio.close()
+        self._radio = None
+        self._group = None
+        self.log.debug('Sender stopped')
+
+    def encode(self, data: Any) -> bytes | None:
+        if message := convert_to_dict(data):
+            try:
+                payload = self._codec.encode(message)
+                if self._compressor:
+                    payload = self._compressor.compress(payload)
+                return add_header(message, payload) if self._header else payload
+            except Exception as error:
+                self.log.error('Failed to encode message', data=data, error=error)
+        else:
+            self.log.warning('Unsupported message type', data=data)
+        return None
+
+    async def send(self, data: Any) -> None:
+        if self._group:
+            if payload := self.encode(data):
+                await self.send_encoded(payload)
+        else:
+            self.log.warning('Cannot send message, sender not started', data=data)
+
+    async def send_encoded(self, payload: bytes) -> None:
+        if (radio := self._radio) and (group := self._group):
+            try:
+                if len(payload) > self._payload_budget:
+                    for fragment in fragment_payload(payload, self._payload_budget):
+                        await radio.send(fragment, group=group)
+                else:
+                    await radio.send(payload, group=group)
+                self.log.debug('Encoded message sent', size=len(payload), group=group)
+            except Exception as error:
+                self.log.error('Failed to send encoded message', size=len(payload), group=group, error=error)
+        else:
+            self.log.warning('Cannot send message, sender not started', size=len(payload))
+
+
+class AsyncDishReceiver:
+
+    def __init__(self, context: AsyncContext, codecs: CodecRegistry | None = None,
+                 reassembler: Reassembler | None = None, max_batch: int = 64) -> None:
+        self._context = context
+        self._codecs = codecs if codecs else CodecRegistry()
+        self._reassembler = reassembler if reassembler else Reassembler()
+        self._max_batch = max_batch
+        self._dish: AsyncSocket | None = None
+        self._group: str | None = None
+        self.log = get_logger(type(self).__name__)
+
+    def __enter__(self) -> 'AsyncDishReceiver':
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.stop()
+
+    def __aiter__(self) -> AsyncIterator[dict[str, Any]]:
+        return self.messages()
+
+    def start(self, group: PrefixedGroup) -> None:
+        try:
+            if self._group:
+                raise RuntimeError('Receiver already started')
+            dish = self._context.socket(DISH)
+            try:
+                dish.bind(group.url)
+                dish.join(group.name)
+            except Exception:
+                dish.close()
+                raise
+            self._dish = dish
+            self._group = group.name
+            self.log.debug('Receiver started', url=group.url, group=group.name)
+        except Exception as error:
+            self.log.error('Failed to start receiver', url=group.url, group=group.name, error=error)
+            raise error
+
+    def stop(self) -> None:
+        dish, self._dish = self._dish, None
+        self._group = None
+        self._reassembler.clear()
+        if dish:
+            dish.close()
+        self.log.debug('Receiver stopped')
+
+    async def receive(self, prefilter: Prefilter | None = None) -> list[dict[str, Any]]:
+        if not (dish := self._dish):
+            return []
+        try:
+            messages = self._process(await dish.recv(), prefilter)
+            for _ in range(self._max_batch - 1):
+                try:
+                    messages.extend(self._process(await dish.recv(NOBLOCK), prefilter))
+                except Again:
+                    break
+            return messages
+        except (asyncio.CancelledError, ZMQError):
+            if self._dish:
+                raise
+            return []
+
+    async def messages(self) -> AsyncIterator[dict[str, Any]]:
+        while self._dish:
+            for message in await self.receive():
+                yield message
+
+    def _process(self, data: Buffer, prefilter: Prefilter | None) -> list[dict[str, Any]]:
+        try:
+            if data and data[0] == FRAGMENT_TAG:
+                if not (payload := self._reassembler.add(data)):
+                    return []
+                data = payload
+            return self._codecs.decode_all(data, prefilter)
+        except Exception as error:
+            self.log.warn('Failed to process message', group=self._group, error=error)
+            return []
+
+
+class AsyncAdvertizer:
+
+    def __init__(self, sender: AsyncRadioSender, receiver: AsyncDishReceiver | None = None,
+                 max_response_delay: float = 0.1, matcher_cache_size: int = 256) -> None:
+        self._sender = sender
+        self._receiver = receiver
+        self._max_delay = max_response_delay
+        self._matchers = ServiceMatcherCache(matcher_cache_size)
+        self._group: Group | None = None
+        self._service: Service | None = None
+        self._payload: bytes | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+        self.log = get_logger(type(self).__name__)
+
+    async def __aenter__(self) -> 'AsyncAdvertizer':
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        await self.stop()
+
+    async def start(self, group: Group, service: Service | None = None) -> None:
+        self._sender.start(group.hello())
+        self._group = group
+        self._set_service(service)
+        if self._receiver:
+            self._receiver.start(group.query())
+            _create_task(self._tasks, self._respond_loop())
+        self.log.info('Advertizer started', group=self._group, service=self._service)
+
+    async def stop(self) -> None:
+        self._group = None
+        self._set_service(None)
+        await _cancel_tasks(self._tasks)
+        if self._receiver:
+            self._receiver.stop()
+        self._sender.stop()
+        self.log.info('Advertizer stopped')
+
+    async def advertise(self, service: Service | None = None, log_level: int = INFO) -> None:
+        if self._group:
+            if service:
+                self._set_service(service)
+            if self._service:
+                if self._payload is None:
+                    self._payload = self._sender.encode(self._service)
+                if self._payload:
+                    await self._sender.send_encoded(self._payload)
+                    self.log.log(log_level, 'Service advertised', service=self._service, group=self._group)
+            else:
+                self.log.warning('Cannot advertise service, no service provided', group=self._group)
+        else:
+            self.log.warning('Cannot advertise service, advertizer not started', service=service)
+
+    def schedule_periodic(self, service: Service | None = None, interval: float = 60) -> None:
+        _create_task(self._tasks, _repeat(interval, lambda: self.advertise(service, DEBUG), self.log))
+        self.log.info('Periodic execution scheduled', data=service, interval=interval)
+
+    def _set_service(self, service: Service | None) -> None:
+        if service is not self._service and service != self._service:
+            self._service = service
+            self._payload = None
+
+    def _accepts(self, name: str, role: str) -> bool:
+        if service := self._service:
+            try:
+                return self._matchers.matches(ServiceQuery(name, role), service)
+            except re.error:
+                return False
+        return False
+
+    async def _respond_loop(self) -> None:
+        while self._group and self._receiver:
+            for message in await self._receiver.receive(self._accepts):
+                await self._handle_message(message)
+
+    async def _handle_message(self, message: dict[str, Any]) -> None:
+        if service := self._service:
+            try:
+                query = ServiceQuery(**message)
+                self.log.debug('Service query received', group=self._group, query=query)
+                matched = self._matchers.matches(query, service)
+            except Exception as error:
+                self.log.warning('Invalid service query received', group=self._group, received=message, error=error)
+                return
+            if matched:
+                delay = round(self._max_delay * random.random(), 3)
+                self.log.debug('Responding to query', group=self._group, query=query, delay=delay)
+                await asyncio.sleep(delay)
+                await self.advertise(service, DEBUG)
+
+
+class AsyncDiscoverer:
+
+    def __init__(self, sender: AsyncRadioSender, receiver: AsyncDishReceiver,
+                 registry: ServiceRegistry | None = None) -> None:
+        self._sender = sender
+        self._receiver = receiver
+        self._group: Group | None = None
+        self._matcher: ServiceMatcher | None = None
+        self._services = registry if registry is not None else ServiceRegistry()
+        self._tasks: set[asyncio.Task[None]] = set()
+        self.log = get_logger(type(self).__name__)
+
+    async def __aenter__(self) -> 'AsyncDiscoverer':
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        await self.stop()
+
+    def __aiter__(self) -> AsyncIterator[DiscoveryEvent]:
+        return self.events()
+
+    async def start(self, group: Group, query: ServiceQuery | None = None) -> None:
+        self._group = group
+        if query:
+            self._matcher = ServiceMatcher(query)
+        self._sender.start(group.query())
+        self._receiver.start(group.hello())
+        self.log.info('Discoverer started', group=self._group, query=query)
+
+    async def stop(self) -> None:
+        self._group = None
+        self._matcher = None
+        await _cancel_tasks(self._tasks)
+        self._sender.stop()
+        self._receiver.stop()
+        self.log.info('Discoverer stopped')
+
+    async def discover(self, query: ServiceQuery | None = None, log_level: int = INFO) -> None:
+        if self._group:
+            if query:
+                self._matcher = ServiceMatcher(query)
+            if self._matcher:
+                await self._sender.send(self._matcher.query)
+                self.log.log(log_level, 'Service discovery initiated', group=self._group, query=self._matcher.query)
+            else:
+                self.log.warning('Cannot discover services, no query provided', group=self._group)
+        else:
+            self.log.warning('Cannot discover services, discoverer not started', query=query)
+
+    def schedule_periodic(self, query: ServiceQuery | None = None, interval: float = 60) -> None:
+        _create_task(self._tasks, _repeat(interval, lambda: self.discover(query, DEBUG), self.log))
+        self.log.info('Periodic execution scheduled', data=query, interval=interval)
+
+    def get_services(self) -> ServiceSnapshot:
+        return self._services.snapshot()
+
+    def get_registry(self) -> ServiceRegistry:
+        return self._services
+
+    async def events(self) -> AsyncIterator[DiscoveryEvent]:
+        while self._group:
+            for message in await self._receiver.receive(self._accepts):
+                if event := self._handle_message(message):
+                    yield event
+
+    def _accepts(self, name: str, role: str) -> bool:
+        return (matcher := self._matcher) is not None and matcher.matches_values(name, role)
+
+    def _handle_message(self, message: dict[str, Any]) -> DiscoveryEvent | None:
+        if (group := self._group) and (matcher := self._matcher):
+            try:
+                service = Service(UUID(message['uuid']), message['name'], message['role'],
+                                  message.get('urls', {}), message.get('info', {}), message['address'])
+                self.log.debug('Service received', service=service, group=group)
+            except Exception as error:
+                self.log.warn('Invalid service received', group=group, data=message, error=error)
+                return None
+            if matcher.matches(service):
+                return self._create_event(group, matcher, self._services.put(service), service)
+        return None
+
+    def _create_event(self, group: Group, matcher: ServiceMatcher, stored: Service | None,
+                      service: Service) -> DiscoveryEvent:
+        if stored:
+            if not stored.same_as(service):
+                self.log.info('Service updated', group=group, old_service=stored, new_service=service)
+                return DiscoveryEvent(group, matcher.query, service, DiscoveryEventType.UPDATED)
+            else:
+                self.log.debug('Service unchanged', group=group, service=service)
+                return DiscoveryEvent(group, matcher.query, service, DiscoveryEventType.UNCHANGED)
+        else:
+            self.log.info('Service discovered', group=group, service=service)
+            return DiscoveryEvent(group, matcher.query, service, DiscoveryEventType.DISCOVERED)
+
+
+def _create_task(tasks: set[asyncio.Task[None]], coroutine: Coroutine[Any, Any, None]) -> None:
+    task = asyncio.get_running_loop().create_task(coroutine)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+
+async def _cancel_tasks(tasks: set[asyncio.Task[None]]) -> None:
+    for task in list(tasks):
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    tasks.clear()
+
+
+async def _repeat(interval: float, execute: Callable[[], Awaitable[None]], log: Any) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await execute()
+        except Exception as error:
+            log.error('Error during scheduled execution', error=error)
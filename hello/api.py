@@ -2,34 +2,84 @@
 # SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
 # SPDX-License-Identifier: MIT
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
 from common_utility import ReusableTimer
 from zmq import Context
+from zmq.asyncio import Context as AsyncContext
 
-from hello import RadioSender, DishReceiver, DefaultAdvertizer, DefaultDiscoverer, \
-    RespondingAdvertizer, ScheduledAdvertizer, ScheduledDiscoverer, Advertizer, Discoverer
+from hello import SocketPool, Throttle, ThrottlePolicy, TokenBucket, GroupTokenBuckets, Codec, JsonCodec, Compressor, \
+    OverflowPolicy, CodecRegistry, SERVICE_DICTIONARY, Reassembler, MAX_DATAGRAM_SIZE, RadioSender, DishReceiver, \
+    DefaultAdvertizer, DefaultDiscoverer, RespondingAdvertizer, ScheduledAdvertizer, ScheduledDiscoverer, Advertizer, \
+    Discoverer, ServiceRegistry, AsyncRadioSender, AsyncDishReceiver, AsyncAdvertizer, AsyncDiscoverer, ServiceExpiry, \
+    UnchangedPolicy
 
 
 @dataclass
 class HelloConfig:
     context: Context[Any] = Context()
+    codec: Codec = JsonCodec()
+    compression_dictionary: bytes | None = SERVICE_DICTIONARY
+    sender_max_datagram_size: int = MAX_DATAGRAM_SIZE
+    sender_compression_threshold: int | None = None
+    sender_rate_limit: float | None = None
+    sender_rate_burst: int = 10
+    sender_throttle_policy: ThrottlePolicy = ThrottlePolicy.QUEUE
+    sender_throttle_queue_size: int = 256
+    sender_header: bool = False
+    group_rate_limit: float | None = None
+    group_rate_burst: int = 10
     receiver_max_workers: int = 1
-    receiver_poll_timeout: float = 0.1
+    receiver_poll_timeout: float | None = None
+    receiver_reassembly_limit: int = 64
+    receiver_reassembly_timeout: float = 5.0
+    receiver_zero_copy: bool = False
+    receiver_max_batch: int = 64
+    receiver_inline: bool = False
+    receiver_cache_size: int = 1024
+    receiver_queue_size: int = 1024
+    receiver_overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK
     advertizer_responder: bool = True
     advertizer_max_delay: float = 0.1
+    advertizer_matcher_cache_size: int = 256
     discoverer_max_workers: int = 1
+    discoverer_cache_size: int = 1024
+    discoverer_queue_size: int = 1024
+    discoverer_overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK
+    discoverer_index_keys: tuple[str, ...] = ()
+    discoverer_ttl: float | None = None
+    discoverer_ttl_interval_factor: float | None = 3.0
+    discoverer_expiry_tick: float = 1.0
+    discoverer_unchanged_policy: UnchangedPolicy = UnchangedPolicy.DELIVER
+    discoverer_unchanged_interval: float = 60
+    group_buckets: GroupTokenBuckets | None = field(default=None, init=False, repr=False, compare=False)
+    socket_pool: SocketPool = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.socket_pool = SocketPool(self.context)
+        if self.group_rate_limit is not None:
+            self.group_buckets = GroupTokenBuckets(self.group_rate_limit, self.group_rate_burst)
+
+    def __enter__(self) -> 'HelloConfig':
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.socket_pool.close()
 
 
 class Hello(object):
 
     @classmethod
     def default_advertizer(cls, config: HelloConfig) -> Advertizer:
-        sender = RadioSender(config.context)
+        sender = cls._create_sender(config)
         if config.advertizer_responder:
-            receiver = DishReceiver(config.context, config.receiver_max_workers, config.receiver_poll_timeout)
-            return RespondingAdvertizer(sender, receiver, config.advertizer_max_delay)
+            receiver = cls._create_receiver(config)
+            return RespondingAdvertizer(sender, receiver, config.advertizer_max_delay,
+                                        config.advertizer_matcher_cache_size)
         else:
             return DefaultAdvertizer(sender)
 
@@ -40,19 +90,83 @@ class Hello(object):
 
     @classmethod
     def default_discoverer(cls, config: HelloConfig) -> Discoverer:
-        sender = RadioSender(config.context)
-        receiver = DishReceiver(config.context, config.receiver_max_workers, config.receiver_poll_timeout)
-        return DefaultDiscoverer(sender, receiver, config.discoverer_max_workers)
+        sender = cls._create_sender(config)
+        receiver = cls._create_receiver(config)
+        registry = ServiceRegistry(config.discoverer_index_keys)
+        expiry = None
+        if config.discoverer_ttl is not None:
+            expiry = ServiceExpiry(config.discoverer_ttl, config.discoverer_ttl_interval_factor,
+                                   tick=config.discoverer_expiry_tick)
+        return DefaultDiscoverer(sender, receiver, config.discoverer_max_workers, config.discoverer_cache_size,
+                                 config.discoverer_queue_size, config.discoverer_overflow_policy, registry, expiry,
+                                 config.discoverer_unchanged_policy, config.discoverer_unchanged_interval)
 
     @classmethod
     def scheduled_discoverer(cls, config: HelloConfig) -> ScheduledDiscoverer:
         discoverer = cls.default_discoverer(config)
         return ScheduledDiscoverer(discoverer, ReusableTimer())
 
+    @classmethod
+    def async_advertizer(cls, config: HelloConfig) -> AsyncAdvertizer:
+        context = AsyncContext.shadow(config.context.underlying)
+        sender = cls._create_async_sender(context, config)
+        if config.advertizer_responder:
+            receiver = cls._create_async_receiver(context, config)
+            return AsyncAdvertizer(sender, receiver, config.advertizer_max_delay, config.advertizer_matcher_cache_size)
+        else:
+            return AsyncAdvertizer(sender)
+
+    @classmethod
+    def async_discoverer(cls, config: HelloConfig) -> AsyncDiscoverer:
+        context = AsyncContext.shadow(config.context.underlying)
+        sender = cls._create_async_sender(context, config)
+        receiver = cls._create_async_receiver(context, config)
+        return AsyncDiscoverer(sender, receiver, ServiceRegistry(config.discoverer_index_keys))
+
     @classmethod
     def builder(cls, config: HelloConfig | None = None) -> 'HelloBuilder':
         return HelloBuilder(config if config else HelloConfig())
 
+    @classmethod
+    def _create_sender(cls, config: HelloConfig) -> RadioSender:
+        compressor = cls._create_compressor(config)
+        throttle = None
+        if config.sender_rate_limit is not None or config.group_buckets:
+            bucket = None
+            if config.sender_rate_limit is not None:
+                bucket = TokenBucket(config.sender_rate_limit, config.sender_rate_burst)
+            throttle = Throttle(bucket, config.group_buckets, config.sender_throttle_policy,
+                                config.sender_throttle_queue_size)
+        return RadioSender(config.context, config.codec, config.sender_max_datagram_size, compressor, throttle,
+                           config.socket_pool, config.sender_header)
+
+    @classmethod
+    def _create_compressor(cls, config: HelloConfig) -> Compressor | None:
+        if config.sender_compression_threshold is not None:
+            return Compressor(config.sender_compression_threshold, config.compression_dictionary)
+        return None
+
+    @classmethod
+    def _create_receiver(cls, config: HelloConfig) -> DishReceiver:
+        codecs = CodecRegistry(dictionary=config.compression_dictionary)
+        reassembler = Reassembler(config.receiver_reassembly_limit, config.receiver_reassembly_timeout)
+        return DishReceiver(config.context, config.receiver_max_workers, config.receiver_poll_timeout,
+                            codecs, reassembler, config.receiver_zero_copy, config.receiver_max_batch,
+                            config.receiver_inline, config.receiver_cache_size, config.receiver_queue_size,
+                            config.receiver_overflow_policy)
+
+    @classmethod
+    def _create_async_sender(cls, context: AsyncContext, config: HelloConfig) -> AsyncRadioSender:
+        compressor = cls._create_compressor(config)
+        return AsyncRadioSender(context, config.codec, config.sender_max_datagram_size, compressor,
+                                config.sender_header)
+
+    @classmethod
+    def _create_async_receiver(cls, context: AsyncContext, config: HelloConfig) -> AsyncDishReceiver:
+        codecs = CodecRegistry(dictionary=config.compression_dictionary)
+        reassembler = Reassembler(config.receiver_reassembly_limit, config.receiver_reassembly_timeout)
+        return AsyncDishReceiver(context, codecs, reassembler, config.receiver_max_batch)
+
 
 class AdvertizerBuilder(object):
 
@@ -65,6 +179,9 @@ class AdvertizerBuilder(object):
     def scheduled(self) -> ScheduledAdvertizer:
         return Hello.scheduled_advertizer(self._config)
 
+    def asyncio(self) -> AsyncAdvertizer:
+        return Hello.async_advertizer(self._config)
+
 
 class DiscovererBuilder(object):
 
@@ -77,6 +194,9 @@ class DiscovererBuilder(object):
     def scheduled(self) -> ScheduledDiscoverer:
         return Hello.scheduled_discoverer(self._config)
 
+    def asyncio(self) -> AsyncDiscoverer:
+        return Hello.async_discoverer(self._config)
+
 
 class HelloBuilder(object):
 
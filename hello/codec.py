@@ -0,0 +1,342 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import json
+import re
+import zlib
+from _json import make_encoder
+from collections import OrderedDict
+from json.encoder import encode_basestring
+from json.scanner import make_scanner
+from struct import Struct, pack, unpack_from
+from typing import Any, Hashable, Protocol, cast
+
+JSON_CODEC_TAG = ord('{')
+COMPACT_CODEC_TAG = 0x01
+BATCH_TAG = 0x02
+COMPRESSED_TAG = 0x04
+HEADER_TAG = 0x05
+
+PRESET_DICTIONARY_FLAG = 0x01
+MAX_DECOMPRESSED_SIZE = 1 << 20
+
+MAX_BATCH_SIZE = 0xff
+BATCH_HEADER_SIZE = 2
+BATCH_ITEM_HEADER_SIZE = 2
+HEADER_SIZE = 3
+MAX_HEADER_FIELD_SIZE = 0xff
+
+# Common fragments of encoded services, the most frequent ones last as zlib prefers them close to the data
+SERVICE_DICTIONARY = (
+    b'"version":"1.0.0","firmware":"","hostname":"","serial":"","model":"","location":"",'
+    b'"grpc":"grpc://","mqtt":"mqtt://","ws":"ws://","https":"https://","http":"http://localhost:",'
+    b'"api":"http://","site":"","range":"",192.168.1.,"address":"192.168.'
+    b'"urls":{"api":"http://","info":{"site":"","range":"","version":"'
+    b'{"uuid":"","name":"","role":"","urls":{},"info":{},"address":null}'
+)
+
+Buffer = bytes | memoryview
+
+_SERVICE_FLAG = 0x01
+_NO_ADDRESS_FLAG = 0x02
+_EXTRA_FIELDS_FLAG = 0x04
+_SERVICE_KEYS = frozenset(('uuid', 'name', 'role', 'urls', 'info', 'address'))
+_SERVICE_HEADER = Struct('>BB16sBBB')
+_UUID_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+# The C encoder and scanner behind json.dumps and json.loads, created once instead of on every call
+_encode_json = make_encoder(None, json.JSONEncoder().default, encode_basestring, None, ':', ',', False, False, True)
+_scan_json = make_scanner(cast(Any, json.JSONDecoder()))
+
+
+class Prefilter(Protocol):
+    def __call__(self, name: str, role: str) -> bool: ...
+
+
+class Codec:
+
+    @property
+    def tag(self) -> int:
+        raise NotImplementedError()
+
+    def encode(self, message: dict[str, Any]) -> bytes:
+        raise NotImplementedError()
+
+    def decode(self, data: Buffer) -> dict[str, Any]:
+        raise NotImplementedError()
+
+
+class JsonCodec(Codec):
+
+    @property
+    def tag(self) -> int:
+        return JSON_CODEC_TAG
+
+    def encode(self, message: dict[str, Any]) -> bytes:
+        return json.dumps(message, separators=(',', ':')).encode('utf-8')
+
+    def decode(self, data: Buffer) -> dict[str, Any]:
+        message = json.loads(bytes(data) if isinstance(data, memoryview) else data)
+        if not isinstance(message, dict):
+            raise ValueError('Message is not an object')
+        return message
+
+
+class CompactCodec(Codec):
+    # Fixed-field service layout: tag, flags, 16-byte uuid and the sizes of name, role and address in one struct,
+    # followed by those strings and a JSON tail with the free-form urls, info and any extra fields. Other messages
+    # are sent as a JSON object after a zero flags byte.
+
+    @property
+    def tag(self) -> int:
+        return COMPACT_CODEC_TAG
+
+    def encode(self, message: dict[str, Any]) -> bytes:
+        if (header := _pack_service(message)) is None:
+            return pack('>BB', COMPACT_CODEC_TAG, 0) + _dump_json(message).encode('utf-8')
+        documents = [message['urls'], message['info']]
+        if len(message) > len(_SERVICE_KEYS):
+            documents.append({key: value for key, value in message.items() if key not in _SERVICE_KEYS})
+        # The enclosing brackets are implied, the decoder puts them back
+        return header + _dump_json(documents)[1:-1].encode('utf-8')
+
+    def decode(self, data: Buffer) -> dict[str, Any]:
+        if len(data) < 2:
+            raise ValueError('Truncated message')
+        if not data[1] & _SERVICE_FLAG:
+            if not isinstance(message := _load_json(str(data[2:], 'utf-8')), dict):
+                raise ValueError('Message is not an object')
+            return message
+        if len(data) < _SERVICE_HEADER.size:
+            raise ValueError('Truncated message')
+        _, flags, uuid, name_size, role_size, address_size = _SERVICE_HEADER.unpack_from(data)
+        role_offset = _SERVICE_HEADER.size + name_size
+        address_offset = role_offset + role_size
+        documents_offset = address_offset + address_size
+        if documents_offset > len(data):
+            raise ValueError('Truncated message')
+        documents = _load_json(f'[{str(data[documents_offset:], "utf-8")}]')
+        if len(documents) != (3 if flags & _EXTRA_FIELDS_FLAG else 2):
+            raise ValueError('Invalid service fields')
+        value = uuid.hex()
+        message = {
+            'uuid': f'{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}',
+            'name': str(data[_SERVICE_HEADER.size:role_offset], 'utf-8'),
+            'role': str(data[role_offset:address_offset], 'utf-8'),
+            'urls': documents[0],
+            'info': documents[1],
+            'address': None if flags & _NO_ADDRESS_FLAG else str(data[address_offset:documents_offset], 'utf-8'),
+        }
+        if flags & _EXTRA_FIELDS_FLAG:
+            if not isinstance(documents[2], dict):
+                raise ValueError('Invalid service fields')
+            message.update(documents[2])
+        return message
+
+
+def _pack_service(message: dict[str, Any]) -> bytes | None:
+    if not message.keys() >= _SERVICE_KEYS or (uuid := _pack_uuid(message['uuid'])) is None:
+        return None
+    name, role, address = message['name'], message['role'], message['address']
+    flags = _SERVICE_FLAG if len(message) == len(_SERVICE_KEYS) else _SERVICE_FLAG | _EXTRA_FIELDS_FLAG
+    if address is None:
+        flags |= _NO_ADDRESS_FLAG
+        address = ''
+    if not isinstance(name, str) or not isinstance(role, str) or not isinstance(address, str):
+        return None
+    fields = (name.encode('utf-8'), role.encode('utf-8'), address.encode('utf-8'))
+    sizes = [len(field) for field in fields]
+    if max(sizes) > MAX_HEADER_FIELD_SIZE:
+        return None
+    return _SERVICE_HEADER.pack(COMPACT_CODEC_TAG, flags, uuid, *sizes) + b''.join(fields)
+
+
+def _pack_uuid(value: Any) -> bytes | None:
+    # Only the canonical form survives the round trip, any other value makes the message fall back to JSON
+    if isinstance(value, str) and _UUID_PATTERN.fullmatch(value):
+        return bytes.fromhex(value.replace('-', ''))
+    return None
+
+
+def _dump_json(value: Any) -> str:
+    return ''.join(_encode_json(value, 0))
+
+
+def _load_json(text: str) -> Any:
+    try:
+        value, end = _scan_json(text, 0)
+    except StopIteration as error:
+        raise json.JSONDecodeError('Expecting value', text, error.value) from None
+    if end != len(text):
+        raise json.JSONDecodeError('Extra data', text, end)
+    return value
+
+
+class Compressor:
+
+    def __init__(self, threshold: int = 512, dictionary: bytes | None = SERVICE_DICTIONARY, level: int = 6) -> None:
+        self._threshold = threshold
+        self._dictionary = dictionary
+        self._level = level
+
+    def compress(self, payload: bytes) -> bytes:
+        if len(payload) < self._threshold:
+            return payload
+        if self._dictionary:
+            compressor = zlib.compressobj(self._level, zdict=self._dictionary)
+            flags = PRESET_DICTIONARY_FLAG
+        else:
+            compressor = zlib.compressobj(self._level)
+            flags = 0
+        compressed = pack('>BB', COMPRESSED_TAG, flags) + compressor.compress(payload) + compressor.flush()
+        return compressed if len(compressed) < len(payload) else payload
+
+
+class CodecRegistry:
+
+    def __init__(self, codecs: list[Codec] | None = None, dictionary: bytes | None = SERVICE_DICTIONARY) -> None:
+        self._dictionary = dictionary
+        self._codecs: dict[int, Codec] = {}
+        for codec in codecs if codecs is not None else [JsonCodec(), CompactCodec()]:
+            self.register(codec)
+
+    def register(self, codec: Codec) -> None:
+        self._codecs[codec.tag] = codec
+
+    def get(self, tag: int) -> Codec | None:
+        return self._codecs.get(tag)
+
+    def decode(self, data: Buffer) -> dict[str, Any]:
+        if not data:
+            raise ValueError('Empty message')
+        if codec := self._codecs.get(data[0]):
+            return codec.decode(data)
+        raise ValueError(f'Unsupported codec: {data[0]:#04x}')
+
+    def decode_all(self, data: Buffer, prefilter: Prefilter | None = None) -> list[dict[str, Any]]:
+        return [self.decode(payload) for payload in self.unpack(data, prefilter)]
+
+    def unpack(self, data: Buffer, prefilter: Prefilter | None = None) -> list[Buffer]:
+        if data and data[0] == BATCH_TAG:
+            payloads: list[Buffer] = []
+            for item in unpack_batch(data):
+                payloads.extend(self.unpack(item, prefilter))
+            return payloads
+        if data and data[0] == HEADER_TAG:
+            name, role, body = unpack_header(data)
+            if prefilter and not prefilter(name, role):
+                return []
+            return self.unpack(body, prefilter)
+        if data and data[0] == COMPRESSED_TAG:
+            return self.unpack(self._decompress(data), prefilter)
+        return [data]
+
+    def _decompress(self, data: Buffer) -> bytes:
+        if data[1] & PRESET_DICTIONARY_FLAG:
+            if not self._dictionary:
+                raise ValueError('Message compressed with preset dictionary, but no dictionary configured')
+            decompressor = zlib.decompressobj(zdict=self._dictionary)
+        else:
+            decompressor = zlib.decompressobj()
+        payload = decompressor.decompress(data[2:], MAX_DECOMPRESSED_SIZE)
+        if decompressor.unconsumed_tail:
+            raise ValueError(f'Decompressed message exceeds {MAX_DECOMPRESSED_SIZE} bytes')
+        if not decompressor.eof:
+            raise ValueError('Truncated compressed message')
+        return payload
+
+
+class Message(dict[str, Any]):
+    __slots__ = ('payload',)
+
+    def __init__(self, data: dict[str, Any], payload: bytes) -> None:
+        super().__init__(data)
+        self.payload = payload
+
+
+class DecodeCache:
+
+    def __init__(self, codecs: CodecRegistry, max_size: int = 1024) -> None:
+        self._codecs = codecs
+        self._max_size = max_size
+        self._messages: OrderedDict[Buffer, list[dict[str, Any]]] = OrderedDict()
+
+    def decode_all(self, data: Buffer, prefilter: Prefilter | None = None) -> list[dict[str, Any]]:
+        lookup = _get_lookup_key(data)
+        if (cached := self._messages.get(lookup)) is not None:
+            self._messages.move_to_end(lookup)
+            return cached
+        rejected = False
+
+        def record_rejection(name: str, role: str) -> bool:
+            nonlocal rejected
+            if prefilter and not prefilter(name, role):
+                rejected = True
+                return False
+            return True
+
+        messages: list[dict[str, Any]] = [
+            Message(self._codecs.decode(payload), bytes(payload))
+            for payload in self._codecs.unpack(data, record_rejection if prefilter else None)
+        ]
+        if not rejected:
+            self._messages[bytes(data)] = messages
+            if len(self._messages) > self._max_size:
+                self._messages.popitem(last=False)
+        return messages
+
+    def clear(self) -> None:
+        self._messages.clear()
+
+
+def _get_lookup_key(data: Buffer) -> Buffer:
+    # A read-only view hashes and compares like bytes, so a cache hit does not copy a zero-copy frame
+    if isinstance(data, bytes):
+        return data
+    return data.toreadonly() if isinstance(data.obj, Hashable) else bytes(data)
+
+
+def pack_batch(payloads: list[bytes]) -> bytes:
+    if not 0 < len(payloads) <= MAX_BATCH_SIZE:
+        raise ValueError(f'Batch size must be between 1 and {MAX_BATCH_SIZE}')
+    buffer = bytearray(pack('>BB', BATCH_TAG, len(payloads)))
+    for payload in payloads:
+        buffer += pack('>H', len(payload))
+        buffer += payload
+    return bytes(buffer)
+
+
+def pack_header(name: str, role: str, payload: bytes) -> bytes:
+    name_bytes, role_bytes = name.encode('utf-8'), role.encode('utf-8')
+    if len(name_bytes) > MAX_HEADER_FIELD_SIZE or len(role_bytes) > MAX_HEADER_FIELD_SIZE:
+        raise ValueError(f'Header fields must be at most {MAX_HEADER_FIELD_SIZE} bytes')
+    return pack('>BBB', HEADER_TAG, len(name_bytes), len(role_bytes)) + name_bytes + role_bytes + payload
+
+
+def unpack_header(data: Buffer) -> tuple[str, str, Buffer]:
+    if len(data) < HEADER_SIZE:
+        raise ValueError('Truncated header')
+    role_offset = HEADER_SIZE + data[1]
+    body_offset = role_offset + data[2]
+    if body_offset > len(data):
+        raise ValueError('Truncated header')
+    name = bytes(data[HEADER_SIZE:role_offset]).decode('utf-8')
+    role = bytes(data[role_offset:body_offset]).decode('utf-8')
+    return name, role, data[body_offset:]
+
+
+def unpack_batch(data: Buffer) -> list[Buffer]:
+    count = data[1]
+    offset = BATCH_HEADER_SIZE
+    payloads = []
+    for _ in range(count):
+        length = unpack_from('>H', data, offset)[0]
+        offset += BATCH_ITEM_HEADER_SIZE
+        if offset + length > len(data):
+            raise ValueError('Truncated batch')
+        payloads.append(data[offset:offset + length])
+        offset += length
+    if offset != len(data):
+        raise ValueError('Trailing data after batch')
+    return payloads
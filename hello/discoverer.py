@@ -2,23 +2,34 @@
 # SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
 # SPDX-License-Identifier: MIT
 
-from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from enum import Enum
 from logging import INFO, DEBUG
+from threading import Lock
 from typing import Any, Protocol
 from uuid import UUID
 
 from common_utility import IReusableTimer
 from context_logger import get_logger
 
-from hello import Group, ServiceQuery, Sender, Receiver, Service, ServiceMatcher, AbstractScheduler
+from hello import Group, ServiceQuery, Sender, Receiver, Service, MultiServiceMatcher, AbstractScheduler, \
+    ShardedExecutor, Message, OverflowPolicy, ExecutorStats, ServiceRegistry, ServiceSnapshot, ServiceExpiry
 
 
 class DiscoveryEventType(Enum):
     DISCOVERED = 'discovered'
     UNCHANGED = 'unchanged'
     UPDATED = 'updated'
+    LOST = 'lost'
+
+
+class UnchangedPolicy(Enum):
+    DELIVER = 'deliver'
+    SUPPRESS = 'suppress'
+    RATE_LIMIT = 'rate-limit'
+    DIGEST = 'digest'
 
 
 @dataclass
@@ -27,12 +38,27 @@ class DiscoveryEvent:
     query: ServiceQuery
     service: Service
     type: DiscoveryEventType
+    queries: list[ServiceQuery] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        if not self.queries:
+            self.queries = [self.query]
+
+
+@dataclass
+class DiscoveryDigest:
+    group: Group
+    uuids: list[UUID]
 
 
 class OnDiscoveryEvent(Protocol):
     def __call__(self, event: DiscoveryEvent) -> None: ...
 
 
+class OnDiscoveryDigest(Protocol):
+    def __call__(self, digest: DiscoveryDigest) -> None: ...
+
+
 class Discoverer:
 
     def __enter__(self) -> 'Discoverer':
@@ -50,59 +76,120 @@ class Discoverer:
     def discover(self, query: ServiceQuery | None = None, log_level: int = INFO) -> None:
         raise NotImplementedError()
 
+    def add_query(self, query: ServiceQuery) -> None:
+        raise NotImplementedError()
+
+    def remove_query(self, query: ServiceQuery) -> None:
+        raise NotImplementedError()
+
+    def get_queries(self) -> list[ServiceQuery]:
+        raise NotImplementedError()
+
     def register(self, handler: OnDiscoveryEvent, types: set[DiscoveryEventType] | None = None) -> None:
         raise NotImplementedError()
 
     def deregister(self, handler: OnDiscoveryEvent, types: set[DiscoveryEventType] | None = None) -> None:
         raise NotImplementedError()
 
-    def get_services(self) -> dict[UUID, Service]:
+    def register_digest(self, handler: OnDiscoveryDigest) -> None:
+        raise NotImplementedError()
+
+    def deregister_digest(self, handler: OnDiscoveryDigest) -> None:
+        raise NotImplementedError()
+
+    def get_services(self) -> ServiceSnapshot:
+        raise NotImplementedError()
+
+    def get_registry(self) -> ServiceRegistry:
         raise NotImplementedError()
 
 
 class DefaultDiscoverer(Discoverer):
 
-    def __init__(self, sender: Sender, receiver: Receiver, max_workers: int = 8) -> None:
+    def __init__(self, sender: Sender, receiver: Receiver, max_workers: int = 8, cache_size: int = 1024,
+                 queue_size: int = 1024, overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+                 registry: ServiceRegistry | None = None, expiry: ServiceExpiry | None = None,
+                 unchanged_policy: UnchangedPolicy = UnchangedPolicy.DELIVER, unchanged_interval: float = 60) -> None:
         self._sender = sender
         self._receiver = receiver
         self._group: Group | None = None
-        self._matcher: ServiceMatcher | None = None
-        self._services: dict[UUID, Service] = {}
+        self._query: ServiceQuery | None = None
+        self._queries: list[ServiceQuery] = []
+        self._matcher: MultiServiceMatcher | None = None
+        self._services = registry if registry is not None else ServiceRegistry()
+        self._expiry = expiry
+        self._cache_size = cache_size
+        self._service_cache: OrderedDict[bytes, tuple[Service, MultiServiceMatcher, list[ServiceQuery]]] = \
+            OrderedDict()
+        self._cache_lock = Lock()
         self._handlers: dict[DiscoveryEventType, list[OnDiscoveryEvent]] = {
             event_type: [] for event_type in DiscoveryEventType
         }
-        self._handler_executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._digest_handlers: list[OnDiscoveryDigest] = []
+        self._unchanged_policy = unchanged_policy
+        self._unchanged_interval = unchanged_interval
+        self._unchanged_times: dict[UUID, float] = {}
+        self._alive: set[UUID] = set()
+        self._digest_time = time.monotonic()
+        self._unchanged_lock = Lock()
+        self._handler_executor = ShardedExecutor(max_workers, queue_size, overflow_policy)
         self.log = get_logger(type(self).__name__)
 
     def start(self, group: Group, query: ServiceQuery | None = None) -> None:
         self._group = group
         if query:
-            self._matcher = ServiceMatcher(query)
+            self._set_query(query)
         self._sender.start(group.query())
-        self._receiver.register(self._handle_message)
+        self._receiver.register_batch(self._handle_messages, self._accepts)
         self._receiver.start(group.hello())
+        if self._expiry:
+            self._expiry.start(self._handle_expired)
         self.log.info('Discoverer started', group=self._group, query=query)
 
     def stop(self) -> None:
         self._group = None
-        self._matcher = None
+        self._set_query(None)
+        with self._cache_lock:
+            self._service_cache.clear()
+        with self._unchanged_lock:
+            self._unchanged_times.clear()
+            self._alive.clear()
+        if self._expiry:
+            self._expiry.stop()
         self._sender.stop()
-        self._receiver.deregister(self._handle_message)
+        self._receiver.deregister_batch(self._handle_messages)
         self._receiver.stop()
         self.log.info('Discoverer stopped')
 
     def discover(self, query: ServiceQuery | None = None, log_level: int = INFO) -> None:
         if self._group:
             if query:
-                self._matcher = ServiceMatcher(query)
-            if self._matcher:
-                self._sender.send(self._matcher.query)
-                self.log.log(log_level, 'Service discovery initiated', group=self._group, query=self._matcher.query)
+                self._set_query(query)
+            if queries := [query] if query else self.get_queries():
+                if len(queries) == 1:
+                    self._sender.send(queries[0])
+                else:
+                    self._sender.send_batch(queries)
+                self.log.log(log_level, 'Service discovery initiated', group=self._group, queries=queries)
             else:
                 self.log.warning('Cannot discover services, no query provided', group=self._group)
         else:
             self.log.warning('Cannot discover services, discoverer not started', query=query)
 
+    def add_query(self, query: ServiceQuery) -> None:
+        if query not in self._queries:
+            self._queries = self._queries + [query]
+            self._update_matcher()
+
+    def remove_query(self, query: ServiceQuery) -> None:
+        if query == self._query:
+            self._query = None
+        self._queries = [added for added in self._queries if added != query]
+        self._update_matcher()
+
+    def get_queries(self) -> list[ServiceQuery]:
+        return list(matcher.queries) if (matcher := self._matcher) else []
+
     def register(self, handler: OnDiscoveryEvent, types: set[DiscoveryEventType] | None = None) -> None:
         for event_type in types if types else self._get_event_types():
             self._handlers[event_type].append(handler)
@@ -111,46 +198,140 @@ class DefaultDiscoverer(Discoverer):
         for event_type in types if types else self._get_event_types():
             self._handlers[event_type].remove(handler)
 
-    def get_services(self) -> dict[UUID, Service]:
-        return self._services.copy()
+    def register_digest(self, handler: OnDiscoveryDigest) -> None:
+        self._digest_handlers.append(handler)
+
+    def deregister_digest(self, handler: OnDiscoveryDigest) -> None:
+        self._digest_handlers.remove(handler)
+
+    def get_services(self) -> ServiceSnapshot:
+        return self._services.snapshot()
+
+    def get_registry(self) -> ServiceRegistry:
+        return self._services
+
+    def get_handler_stats(self) -> ExecutorStats:
+        return self._handler_executor.get_stats()
+
+    def _set_query(self, query: ServiceQuery | None) -> None:
+        self._query = query
+        self._update_matcher()
+
+    def _update_matcher(self) -> None:
+        queries = ([self._query] if self._query else []) + [query for query in self._queries if query != self._query]
+        self._matcher = MultiServiceMatcher(queries) if queries else None
 
     def _get_event_types(self) -> set[DiscoveryEventType]:
         return set(self._handlers.keys())
 
+    def _accepts(self, name: str, role: str) -> bool:
+        return (matcher := self._matcher) is not None and matcher.matches_values(name, role)
+
     def _handle_message(self, message: dict[str, Any]) -> None:
-        if self._group and self._matcher:
-            try:
-                service = Service(UUID(message['uuid']), message['name'], message['role'],
-                                  message.get('urls', {}), message.get('info', {}), message['address'])
-                self.log.debug('Service received', service=service, group=self._group)
-                self._handle_service(service, self._group, self._matcher)
-            except Exception as error:
-                self.log.warn('Invalid service received', group=self._group, data=message, error=error)
-
-    def _handle_service(self, service: Service, group: Group, matcher: ServiceMatcher) -> None:
-        if matcher.matches(service):
-            stored = self._services.get(service.uuid)
-            event = self._create_event(group, matcher, stored, service)
-            self._handle_event(event)
-
-    def _create_event(self, group: Group, matcher: ServiceMatcher, stored: Service | None,
+        self._handle_messages([message])
+
+    def _handle_messages(self, messages: list[dict[str, Any]]) -> None:
+        if (group := self._group) and (matcher := self._matcher):
+            for message in messages:
+                try:
+                    service, queries = self._resolve_service(message, group, matcher)
+                    if queries and self._expiry:
+                        self._expiry.refresh(service.uuid, message.get('interval'))
+                except Exception as error:
+                    self.log.warn('Invalid service received', group=group, data=message, error=error)
+                    continue
+                if queries:
+                    self._handle_service(service, group, queries)
+
+    def _resolve_service(self, message: dict[str, Any], group: Group,
+                         matcher: MultiServiceMatcher) -> tuple[Service, list[ServiceQuery]]:
+        payload = message.payload if isinstance(message, Message) else None
+        if payload is not None and (cached := self._get_cached_service(payload)):
+            service, cached_matcher, queries = cached
+            if cached_matcher is matcher:
+                return service, queries
+        else:
+            service = Service(UUID(message['uuid']), message['name'], message['role'],
+                              message.get('urls', {}), message.get('info', {}), message['address'])
+            self.log.debug('Service received', service=service, group=group)
+        queries = matcher.match(service)
+        if payload is not None and self._cache_size > 0:
+            with self._cache_lock:
+                self._service_cache[payload] = (service, matcher, queries)
+                if len(self._service_cache) > self._cache_size:
+                    self._service_cache.popitem(last=False)
+        return service, queries
+
+    def _get_cached_service(self, payload: bytes) -> tuple[Service, MultiServiceMatcher, list[ServiceQuery]] | None:
+        with self._cache_lock:
+            if cached := self._service_cache.get(payload):
+                self._service_cache.move_to_end(payload)
+            return cached
+
+    def _handle_service(self, service: Service, group: Group, queries: list[ServiceQuery]) -> None:
+        # Notified under the service's registry stripe, so that concurrent receiver workers keep the event order
+        self._services.put(service, lambda stored: self._handle_stored(service, group, queries, stored))
+
+    def _handle_stored(self, service: Service, group: Group, queries: list[ServiceQuery],
+                       stored: Service | None) -> None:
+        if stored and stored.same_as(service) and not self._accepts_unchanged(group, service.uuid):
+            return
+        self._notify(self._create_event(group, queries, stored, service))
+
+    def _accepts_unchanged(self, group: Group, uuid: UUID) -> bool:
+        if self._unchanged_policy == UnchangedPolicy.DELIVER:
+            return True
+        if self._unchanged_policy == UnchangedPolicy.SUPPRESS:
+            return False
+        now = time.monotonic()
+        with self._unchanged_lock:
+            if self._unchanged_policy == UnchangedPolicy.RATE_LIMIT:
+                if now - self._unchanged_times.get(uuid, -self._unchanged_interval) < self._unchanged_interval:
+                    return False
+                self._unchanged_times[uuid] = now
+                return True
+            self._alive.add(uuid)
+            if now - self._digest_time < self._unchanged_interval:
+                return False
+            digest = DiscoveryDigest(group, list(self._alive))
+            self._alive.clear()
+            self._digest_time = now
+        self.log.debug('Services alive', group=group, count=len(digest.uuids))
+        for handler in self._digest_handlers:
+            self._handler_executor.submit(group.name, self._execute_digest_handler, handler, digest)
+        return False
+
+    def _create_event(self, group: Group, queries: list[ServiceQuery], stored: Service | None,
                       service: Service) -> DiscoveryEvent:
         if stored:
-            if stored != service:
+            if not stored.same_as(service):
                 self.log.info('Service updated', group=group, old_service=stored, new_service=service)
-                return DiscoveryEvent(group, matcher.query, service, DiscoveryEventType.UPDATED)
+                return DiscoveryEvent(group, queries[0], service, DiscoveryEventType.UPDATED, queries)
             else:
                 self.log.debug('Service unchanged', group=group, service=service)
-                return DiscoveryEvent(group, matcher.query, service, DiscoveryEventType.UNCHANGED)
+                return DiscoveryEvent(group, queries[0], service, DiscoveryEventType.UNCHANGED, queries)
         else:
             self.log.info('Service discovered', group=group, service=service)
-            return DiscoveryEvent(group, matcher.query, service, DiscoveryEventType.DISCOVERED)
-
-    def _handle_event(self, event: DiscoveryEvent) -> None:
-        self._services[event.service.uuid] = event.service
-
+            return DiscoveryEvent(group, queries[0], service, DiscoveryEventType.DISCOVERED, queries)
+
+    def _handle_expired(self, uuids: list[UUID]) -> None:
+        if (group := self._group) and (matcher := self._matcher):
+            for uuid in uuids:
+                with self._unchanged_lock:
+                    self._unchanged_times.pop(uuid, None)
+                    self._alive.discard(uuid)
+                self._services.remove(uuid, lambda service: self._handle_removed(group, matcher, service))
+
+    def _handle_removed(self, group: Group, matcher: MultiServiceMatcher, service: Service | None) -> None:
+        if service:
+            self.log.info('Service lost', group=group, service=service)
+            queries = matcher.match(service) or matcher.queries
+            self._notify(DiscoveryEvent(group, queries[0], service, DiscoveryEventType.LOST, queries))
+
+    def _notify(self, event: DiscoveryEvent) -> None:
         for handler in self._handlers[event.type]:
-            self._handler_executor.submit(self._execute_handler, handler, event)
+            self._handler_executor.submit(event.service.uuid, self._execute_handler, handler, event,
+                                          coalesce_key=(handler, event.service.uuid, event.type))
 
     def _execute_handler(self, handler: OnDiscoveryEvent, event: DiscoveryEvent) -> None:
         try:
@@ -158,6 +339,12 @@ class DefaultDiscoverer(Discoverer):
         except Exception as error:
             self.log.warn('Error in event handler execution', event=event, error=error)
 
+    def _execute_digest_handler(self, handler: OnDiscoveryDigest, digest: DiscoveryDigest) -> None:
+        try:
+            handler(digest)
+        except Exception as error:
+            self.log.warn('Error in digest handler execution', digest=digest, error=error)
+
 
 class ScheduledDiscoverer(AbstractScheduler[ServiceQuery], Discoverer):
 
@@ -181,14 +368,32 @@ class ScheduledDiscoverer(AbstractScheduler[ServiceQuery], Discoverer):
     def discover(self, query: ServiceQuery | None = None, log_level: int = INFO) -> None:
         self._discoverer.discover(query, log_level)
 
-    def get_services(self) -> dict[UUID, Service]:
+    def add_query(self, query: ServiceQuery) -> None:
+        self._discoverer.add_query(query)
+
+    def remove_query(self, query: ServiceQuery) -> None:
+        self._discoverer.remove_query(query)
+
+    def get_queries(self) -> list[ServiceQuery]:
+        return self._discoverer.get_queries()
+
+    def get_services(self) -> ServiceSnapshot:
         return self._discoverer.get_services()
 
+    def get_registry(self) -> ServiceRegistry:
+        return self._discoverer.get_registry()
+
     def register(self, handler: OnDiscoveryEvent, types: set[DiscoveryEventType] | None = None) -> None:
         self._discoverer.register(handler, types)
 
     def deregister(self, handler: OnDiscoveryEvent, types: set[DiscoveryEventType] | None = None) -> None:
         self._discoverer.deregister(handler, types)
 
+    def register_digest(self, handler: OnDiscoveryDigest) -> None:
+        self._discoverer.register_digest(handler)
+
+    def deregister_digest(self, handler: OnDiscoveryDigest) -> None:
+        self._discoverer.deregister_digest(handler)
+
     def _execute(self, query: ServiceQuery | None = None) -> None:
         self.discover(query, DEBUG)
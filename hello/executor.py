@@ -0,0 +1,185 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from enum import Enum
+from itertools import count
+from threading import Condition, Thread
+from typing import Any, Callable, Hashable
+
+from context_logger import get_logger
+
+
+class OverflowPolicy(Enum):
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop-oldest'
+    DROP_NEWEST = 'drop-newest'
+    COALESCE = 'coalesce'
+
+
+@dataclass
+class ExecutorStats:
+    submitted: int = 0
+    delayed: int = 0
+    coalesced: int = 0
+    dropped: int = 0
+
+    def __add__(self, other: 'ExecutorStats') -> 'ExecutorStats':
+        return ExecutorStats(self.submitted + other.submitted, self.delayed + other.delayed,
+                             self.coalesced + other.coalesced, self.dropped + other.dropped)
+
+
+@dataclass
+class _Task:
+    future: Future[Any]
+    function: Callable[..., Any]
+    args: tuple[Any, ...]
+    key: Hashable | None = None
+
+
+class BoundedExecutor:
+
+    def __init__(self, max_workers: int = 8, max_queue_size: int = 1024,
+                 policy: OverflowPolicy = OverflowPolicy.BLOCK) -> None:
+        if max_workers < 1:
+            raise ValueError(f'Invalid number of workers: {max_workers}')
+        if max_queue_size < 1:
+            raise ValueError(f'Invalid queue size: {max_queue_size}')
+        self._max_workers = max_workers
+        self._max_queue_size = max_queue_size
+        self._policy = policy
+        self._queue: OrderedDict[int, _Task] = OrderedDict()
+        self._keys: dict[Hashable, int] = {}
+        self._sequence = count()
+        self._condition = Condition()
+        self._stats = ExecutorStats()
+        self._workers: list[Thread] = []
+        self._idle = 0
+        self._shutdown = False
+        self.log = get_logger(type(self).__name__)
+
+    def __enter__(self) -> 'BoundedExecutor':
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.shutdown()
+
+    def submit(self, function: Callable[..., Any], *args: Any, key: Hashable | None = None) -> Future[Any]:
+        task = _Task(Future(), function, args, key if self._policy == OverflowPolicy.COALESCE else None)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError('Cannot submit task after shutdown')
+            self._stats.submitted += 1
+            if len(self._queue) >= self._max_queue_size and not self._make_room(task):
+                return task.future
+            sequence = next(self._sequence)
+            self._queue[sequence] = task
+            if task.key is not None:
+                self._keys[task.key] = sequence
+            worker = self._add_worker()
+            self._condition.notify_all()
+        # Started outside the lock, otherwise the new worker would block on it instead of picking up the task
+        if worker:
+            worker.start()
+        return task.future
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+            workers = list(self._workers)
+        if wait:
+            for worker in workers:
+                if worker.ident is not None:
+                    worker.join()
+
+    def get_stats(self) -> ExecutorStats:
+        with self._condition:
+            return replace(self._stats)
+
+    def _make_room(self, task: _Task) -> bool:
+        if self._coalesce(task):
+            return False
+        # A task that cannot be coalesced waits for room rather than evicting a distinct queued task
+        if self._policy in (OverflowPolicy.BLOCK, OverflowPolicy.COALESCE):
+            self._stats.delayed += 1
+            while len(self._queue) >= self._max_queue_size and not self._shutdown:
+                self._condition.wait()
+            if self._shutdown:
+                raise RuntimeError('Cannot submit task after shutdown')
+            return True
+        self._stats.dropped += 1
+        if self._policy == OverflowPolicy.DROP_NEWEST:
+            task.future.cancel()
+            self.log.debug('Task dropped, queue full', size=self._max_queue_size)
+            return False
+        self._pop_oldest().future.cancel()
+        self.log.debug('Oldest queued task dropped, queue full', size=self._max_queue_size)
+        return True
+
+    def _coalesce(self, task: _Task) -> bool:
+        if task.key is not None and (sequence := self._keys.get(task.key)) is not None:
+            self._queue[sequence].future.cancel()
+            self._queue[sequence] = task
+            self._stats.coalesced += 1
+            return True
+        return False
+
+    def _pop_oldest(self) -> _Task:
+        sequence, task = self._queue.popitem(last=False)
+        if task.key is not None and self._keys.get(task.key) == sequence:
+            del self._keys[task.key]
+        return task
+
+    def _add_worker(self) -> Thread | None:
+        if not self._idle and len(self._workers) < self._max_workers:
+            worker = Thread(target=self._work_loop, daemon=True)
+            self._workers.append(worker)
+            return worker
+        return None
+
+    def _work_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._shutdown:
+                    self._idle += 1
+                    self._condition.wait()
+                    self._idle -= 1
+                if not self._queue:
+                    return
+                task = self._pop_oldest()
+                self._condition.notify_all()
+            if task.future.set_running_or_notify_cancel():
+                try:
+                    task.future.set_result(task.function(*task.args))
+                except BaseException as error:
+                    task.future.set_exception(error)
+
+
+class ShardedExecutor:
+
+    def __init__(self, max_workers: int = 8, max_queue_size: int = 1024,
+                 policy: OverflowPolicy = OverflowPolicy.BLOCK) -> None:
+        if max_workers < 1:
+            raise ValueError(f'Invalid number of workers: {max_workers}')
+        self._lanes = [BoundedExecutor(1, max_queue_size, policy) for _ in range(max_workers)]
+
+    def __enter__(self) -> 'ShardedExecutor':
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.shutdown()
+
+    def submit(self, key: Hashable, function: Callable[..., Any], *args: Any,
+               coalesce_key: Hashable | None = None) -> Future[Any]:
+        return self._lanes[hash(key) % len(self._lanes)].submit(function, *args, key=coalesce_key)
+
+    def shutdown(self, wait: bool = True) -> None:
+        for lane in self._lanes:
+            lane.shutdown(wait)
+
+    def get_stats(self) -> ExecutorStats:
+        return sum((lane.get_stats() for lane in self._lanes), ExecutorStats())
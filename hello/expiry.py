@@ -0,0 +1,144 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import math
+import time
+from threading import Lock
+from typing import Generic, Hashable, Protocol, TypeGuard, TypeVar
+from uuid import UUID
+
+from common_utility import IReusableTimer, ReusableTimer
+from context_logger import get_logger
+
+K = TypeVar('K', bound=Hashable)
+
+MAX_ANNOUNCED_INTERVAL = 86400.0
+
+
+class TimingWheel(Generic[K]):
+
+    def __init__(self, tick: float = 1.0, wheel_size: int = 64, levels: int = 3, now: float | None = None) -> None:
+        if tick <= 0 or wheel_size < 2 or levels < 1:
+            raise ValueError(f'Invalid timing wheel: tick={tick}, size={wheel_size}, levels={levels}')
+        self._tick = tick
+        self._size = wheel_size
+        self._levels = levels
+        self._slots: list[list[set[K]]] = [[set() for _ in range(wheel_size)] for _ in range(levels)]
+        self._entries: dict[K, tuple[int, int, int]] = {}
+        self._current = self._to_tick(time.monotonic() if now is None else now)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def schedule(self, key: K, timeout: float, now: float | None = None) -> None:
+        deadline = max(self._to_tick((time.monotonic() if now is None else now) + timeout), self._current + 1)
+        self.cancel(key)
+        self._insert(key, deadline)
+
+    def cancel(self, key: K) -> None:
+        if entry := self._entries.pop(key, None):
+            _, level, slot = entry
+            self._slots[level][slot].discard(key)
+
+    def advance(self, now: float | None = None) -> list[K]:
+        target = self._to_tick(time.monotonic() if now is None else now)
+        expired: list[K] = []
+        while self._current < target and self._entries:
+            self._current += 1
+            levels = 1
+            while levels < self._levels and self._current % self._size ** levels == 0:
+                levels += 1
+            for level in reversed(range(1, levels)):
+                self._cascade(level)
+            slot = self._slots[0][self._current % self._size]
+            for key in list(slot):
+                if self._entries[key][0] <= self._current:
+                    slot.discard(key)
+                    del self._entries[key]
+                    expired.append(key)
+        self._current = max(self._current, target)
+        return expired
+
+    def _to_tick(self, timestamp: float) -> int:
+        return math.ceil(timestamp / self._tick)
+
+    def _insert(self, key: K, deadline: int) -> None:
+        delta = deadline - self._current
+        level = 0
+        while level < self._levels - 1 and delta >= self._size ** (level + 1):
+            level += 1
+        slot = (deadline // self._size ** level) % self._size
+        self._slots[level][slot].add(key)
+        self._entries[key] = (deadline, level, slot)
+
+    def _cascade(self, level: int) -> None:
+        slot = self._slots[level][(self._current // self._size ** level) % self._size]
+        keys = list(slot)
+        slot.clear()
+        for key in keys:
+            deadline = self._entries[key][0]
+            self._insert(key, max(deadline, self._current))
+
+
+class OnServicesExpired(Protocol):
+    def __call__(self, uuids: list[UUID]) -> None: ...
+
+
+class ServiceExpiry:
+
+    def __init__(self, ttl: float, interval_factor: float | None = 3.0, timer: IReusableTimer | None = None,
+                 tick: float = 1.0) -> None:
+        self._ttl = ttl
+        self._interval_factor = interval_factor
+        self._timer = timer if timer else ReusableTimer()
+        self._tick = tick
+        self._wheel: TimingWheel[UUID] = TimingWheel(tick)
+        self._lock = Lock()
+        self._on_expired: OnServicesExpired | None = None
+        self.log = get_logger(type(self).__name__)
+
+    def start(self, on_expired: OnServicesExpired) -> None:
+        self._on_expired = on_expired
+        self._timer.start(self._tick, self._advance_and_restart)
+
+    def stop(self) -> None:
+        self._on_expired = None
+        self._timer.cancel()
+        with self._lock:
+            self._wheel = TimingWheel(self._tick)
+
+    def get_ttl(self, interval: float | None = None) -> float:
+        # The interval comes from the remote service, anything but a finite positive number is ignored
+        if self._interval_factor is not None and _is_valid_interval(interval):
+            return min(float(interval), MAX_ANNOUNCED_INTERVAL) * self._interval_factor
+        return self._ttl
+
+    def refresh(self, uuid: UUID, interval: float | None = None, now: float | None = None) -> None:
+        with self._lock:
+            self._wheel.schedule(uuid, self.get_ttl(interval), now)
+
+    def cancel(self, uuid: UUID) -> None:
+        with self._lock:
+            self._wheel.cancel(uuid)
+
+    def advance(self, now: float | None = None) -> None:
+        with self._lock:
+            expired = self._wheel.advance(now)
+        if expired and (on_expired := self._on_expired):
+            on_expired(expired)
+
+    def _advance_and_restart(self) -> None:
+        try:
+            self.advance()
+        except Exception as error:
+            self.log.error('Failed to expire services', error=error)
+        self._timer.restart()
+
+
+def _is_valid_interval(interval: object) -> TypeGuard[float]:
+    return (isinstance(interval, (int, float)) and not isinstance(interval, bool)
+            and math.isfinite(interval) and interval > 0)
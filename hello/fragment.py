@@ -0,0 +1,96 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from struct import pack, unpack_from
+
+from context_logger import get_logger
+
+from hello import Buffer
+
+FRAGMENT_TAG = 0x03
+FRAGMENT_HEADER_SIZE = 13
+MAX_FRAGMENT_COUNT = 0xffff
+
+
+def fragment_payload(payload: bytes, max_size: int) -> list[bytes]:
+    chunk_size = max_size - FRAGMENT_HEADER_SIZE
+    if chunk_size <= 0:
+        raise ValueError(f'Datagram size too small for fragmentation: {max_size}')
+    count = (len(payload) + chunk_size - 1) // chunk_size
+    if count > MAX_FRAGMENT_COUNT:
+        raise ValueError(f'Payload too large for fragmentation: {len(payload)}')
+    message_id = random.getrandbits(64)
+    return [
+        pack('>BQHH', FRAGMENT_TAG, message_id, index, count) + payload[offset:offset + chunk_size]
+        for index, offset in enumerate(range(0, len(payload), chunk_size))
+    ]
+
+
+@dataclass
+class PartialMessage:
+    count: int
+    created: float
+    size: int = 0
+    chunks: dict[int, bytes] = field(default_factory=dict)
+
+
+class Reassembler:
+
+    def __init__(self, max_messages: int = 64, timeout: float = 5.0, max_message_size: int = 1 << 20) -> None:
+        self._max_messages = max_messages
+        self._timeout = timeout
+        self._max_message_size = max_message_size
+        self._messages: OrderedDict[int, PartialMessage] = OrderedDict()
+        self.log = get_logger(type(self).__name__)
+
+    def add(self, data: Buffer) -> bytes | None:
+        message_id, index, count = unpack_from('>QHH', data, 1)
+        if index >= count:
+            raise ValueError(f'Invalid fragment index: {index}/{count}')
+
+        now = time.monotonic()
+        self._expire(now)
+
+        if not (message := self._messages.get(message_id)):
+            message = self._create(message_id, count, now)
+        elif message.count != count:
+            raise ValueError(f'Fragment count mismatch: {count} != {message.count}')
+
+        if index not in message.chunks:
+            chunk = bytes(data[FRAGMENT_HEADER_SIZE:])
+            message.chunks[index] = chunk
+            message.size += len(chunk)
+
+        if message.size > self._max_message_size:
+            del self._messages[message_id]
+            self.log.warning('Fragmented message too large, dropped', id=message_id, size=message.size)
+        elif len(message.chunks) == message.count:
+            del self._messages[message_id]
+            return b''.join(message.chunks[index] for index in range(message.count))
+
+        return None
+
+    def clear(self) -> None:
+        self._messages.clear()
+
+    def _create(self, message_id: int, count: int, now: float) -> PartialMessage:
+        if len(self._messages) >= self._max_messages:
+            evicted_id, evicted = self._messages.popitem(last=False)
+            self.log.warning('Reassembly buffer full, dropped oldest message', id=evicted_id,
+                             received=len(evicted.chunks), count=evicted.count)
+        message = self._messages[message_id] = PartialMessage(count, now)
+        return message
+
+    def _expire(self, now: float) -> None:
+        while self._messages:
+            message_id, message = next(iter(self._messages.items()))
+            if now - message.created < self._timeout:
+                break
+            del self._messages[message_id]
+            self.log.warning('Fragmented message timed out, dropped', id=message_id,
+                             received=len(message.chunks), count=message.count)
@@ -0,0 +1,180 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from enum import Enum
+from itertools import count
+from threading import Lock, Condition
+from typing import Protocol
+
+from context_logger import get_logger
+
+
+class ThrottlePolicy(Enum):
+    QUEUE = 'queue'
+    COALESCE = 'coalesce'
+    DROP = 'drop'
+
+
+@dataclass
+class ThrottleStats:
+    sent: int = 0
+    queued: int = 0
+    coalesced: int = 0
+    dropped: int = 0
+
+
+class OnPayload(Protocol):
+    def __call__(self, payload: bytes) -> None: ...
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        tokens = min(tokens, self._burst)
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def release(self, tokens: int = 1) -> None:
+        with self._lock:
+            self._tokens = min(self._tokens + min(tokens, self._burst), self._burst)
+
+    def get_wait_time(self, tokens: int = 1) -> float:
+        with self._lock:
+            self._refill()
+            return max(0.0, (min(tokens, self._burst) - self._tokens) / self._rate)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+class GroupTokenBuckets:
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = Lock()
+
+    def get(self, group: str) -> TokenBucket:
+        with self._lock:
+            if not (bucket := self._buckets.get(group)):
+                bucket = self._buckets[group] = TokenBucket(self._rate, self._burst)
+            return bucket
+
+
+class Throttle:
+
+    def __init__(self, bucket: TokenBucket | None = None, group_buckets: GroupTokenBuckets | None = None,
+                 policy: ThrottlePolicy = ThrottlePolicy.QUEUE, max_queue_size: int = 256) -> None:
+        self._bucket = bucket
+        self._group_buckets = group_buckets
+        self._policy = policy
+        self._max_queue_size = max_queue_size
+        self._buckets: list[TokenBucket] = []
+        self._queue: OrderedDict[object, tuple[bytes, int]] = OrderedDict()
+        self._sequence = count()
+        self._condition = Condition()
+        self._stats = ThrottleStats()
+        self._send: OnPayload | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self.log = get_logger(type(self).__name__)
+
+    def start(self, group: str, send: OnPayload) -> None:
+        with self._condition:
+            self._buckets = [bucket for bucket in [self._bucket] if bucket]
+            if self._group_buckets:
+                self._buckets.append(self._group_buckets.get(group))
+            self._send = send
+            if self._policy != ThrottlePolicy.DROP:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+                self._executor.submit(self._flush_loop)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._send = None
+            self._stats.dropped += len(self._queue)
+            self._queue.clear()
+            self._condition.notify_all()
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown()
+
+    def get_stats(self) -> ThrottleStats:
+        with self._condition:
+            return replace(self._stats)
+
+    def submit(self, payload: bytes, cost: int = 1) -> None:
+        with self._condition:
+            if not (send := self._send):
+                return
+            if self._queue or not self._acquire(cost):
+                self._enqueue(payload, cost)
+                return
+            self._stats.sent += 1
+        send(payload)
+
+    def _enqueue(self, payload: bytes, cost: int) -> None:
+        if self._policy == ThrottlePolicy.DROP:
+            self._stats.dropped += 1
+            self.log.debug('Message dropped, rate limit exceeded', size=len(payload))
+        elif self._policy == ThrottlePolicy.COALESCE and payload in self._queue:
+            self._stats.coalesced += 1
+        else:
+            if len(self._queue) >= self._max_queue_size:
+                self._queue.popitem(last=False)
+                self._stats.dropped += 1
+                self.log.debug('Oldest queued message dropped, queue full', size=self._max_queue_size)
+            key = payload if self._policy == ThrottlePolicy.COALESCE else next(self._sequence)
+            self._queue[key] = (payload, cost)
+            self._stats.queued += 1
+            self._condition.notify_all()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._condition:
+                if not (send := self._send):
+                    return
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+                key, (payload, cost) = next(iter(self._queue.items()))
+                if not self._acquire(cost):
+                    self._condition.wait(self._get_wait_time(cost))
+                    continue
+                del self._queue[key]
+                self._stats.sent += 1
+            try:
+                send(payload)
+            except Exception as error:
+                self.log.error('Failed to send queued message', size=len(payload), error=error)
+
+    def _acquire(self, cost: int) -> bool:
+        acquired: list[TokenBucket] = []
+        for bucket in self._buckets:
+            if not bucket.try_acquire(cost):
+                for taken in acquired:
+                    taken.release(cost)
+                return False
+            acquired.append(bucket)
+        return True
+
+    def _get_wait_time(self, cost: int) -> float:
+        return max([bucket.get_wait_time(cost) for bucket in self._buckets] + [0.001])
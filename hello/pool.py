@@ -0,0 +1,61 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any
+
+from context_logger import get_logger
+from zmq import Context, RADIO, Socket
+
+
+@dataclass
+class PooledSocket:
+    socket: Socket[bytes]
+    references: int = 0
+
+
+class SocketPool:
+
+    def __init__(self, context: Context[Any], socket_type: int = RADIO) -> None:
+        self._context = context
+        self._socket_type = socket_type
+        self._sockets: dict[str, PooledSocket] = {}
+        self._lock = Lock()
+        self.log = get_logger(type(self).__name__)
+
+    def __enter__(self) -> 'SocketPool':
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    def acquire(self, url: str) -> Socket[bytes]:
+        with self._lock:
+            if not (pooled := self._sockets.get(url)):
+                pooled = self._sockets[url] = PooledSocket(self._connect(url))
+                self.log.debug('Socket connected', url=url)
+            pooled.references += 1
+            return pooled.socket
+
+    def release(self, url: str) -> None:
+        with self._lock:
+            if pooled := self._sockets.get(url):
+                pooled.references = max(0, pooled.references - 1)
+
+    def close(self) -> None:
+        with self._lock:
+            sockets, self._sockets = self._sockets, {}
+        for url, pooled in sockets.items():
+            pooled.socket.close()
+            self.log.debug('Socket closed', url=url, references=pooled.references)
+
+    def _connect(self, url: str) -> Socket[bytes]:
+        socket: Socket[bytes] = self._context.socket(self._socket_type)
+        try:
+            socket.connect(url)
+            return socket
+        except Exception:
+            socket.close()
+            raise
@@ -2,19 +2,25 @@
 # SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
 # SPDX-License-Identifier: MIT
 
+import socket
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Protocol
+from typing import Any, Protocol, Callable
 
 from context_logger import get_logger
-from zmq import DISH, Poller, POLLIN, Context
+from zmq import DISH, Poller, POLLIN, Context, NOBLOCK, Again
 
-from hello import PrefixedGroup
+from hello import PrefixedGroup, CodecRegistry, DecodeCache, Reassembler, FRAGMENT_TAG, Buffer, BoundedExecutor, \
+    OverflowPolicy, ExecutorStats, Prefilter
 
 
 class OnMessage(Protocol):
     def __call__(self, message: dict[str, Any]) -> None: ...
 
 
+class OnMessageBatch(Protocol):
+    def __call__(self, messages: list[dict[str, Any]]) -> None: ...
+
+
 class Receiver:
 
     def __enter__(self) -> 'Receiver':
@@ -29,24 +35,44 @@ class Receiver:
     def stop(self) -> None:
         raise NotImplementedError()
 
-    def register(self, handler: OnMessage) -> None:
+    def register(self, handler: OnMessage, prefilter: Prefilter | None = None) -> None:
         raise NotImplementedError()
 
     def deregister(self, handler: OnMessage) -> None:
         raise NotImplementedError()
 
+    def register_batch(self, handler: OnMessageBatch, prefilter: Prefilter | None = None) -> None:
+        raise NotImplementedError()
+
+    def deregister_batch(self, handler: OnMessageBatch) -> None:
+        raise NotImplementedError()
+
 
 class DishReceiver(Receiver):
 
-    def __init__(self, context: Context[Any], max_workers: int = 8, poll_timeout: float = 0.1) -> None:
+    def __init__(self, context: Context[Any], max_workers: int = 8, poll_timeout: float | None = None,
+                 codecs: CodecRegistry | None = None, reassembler: Reassembler | None = None,
+                 zero_copy: bool = False, max_batch: int = 64, inline: bool = False,
+                 cache_size: int = 0, queue_size: int = 1024,
+                 overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK) -> None:
         self._context = context
+        self._zero_copy = zero_copy
+        self._max_batch = max_batch
+        self._codecs = codecs if codecs else CodecRegistry()
+        self._cache = DecodeCache(self._codecs, cache_size) if cache_size > 0 else None
+        self._reassembler = reassembler if reassembler else Reassembler()
         self._dish = self._context.socket(DISH)
         self._poller = Poller()
         self._loop_executor = ThreadPoolExecutor(max_workers=1)
-        self._handler_executor = ThreadPoolExecutor(max_workers=max_workers)
-        self._poll_timeout = int(poll_timeout * 1000)
+        self._handler_executor = None if inline else BoundedExecutor(max_workers, queue_size, overflow_policy)
+        self._poll_timeout = None if poll_timeout is None else int(poll_timeout * 1000)
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
         self._group: str | None = None
         self._handlers: list[OnMessage] = []
+        self._batch_handlers: list[OnMessageBatch] = []
+        self._prefilters: dict[OnMessage | OnMessageBatch, Prefilter | None] = {}
+        self._prefilter: Prefilter | None = None
         self.log = get_logger(type(self).__name__)
 
     def start(self, group: PrefixedGroup) -> None:
@@ -54,6 +80,7 @@ class DishReceiver(Receiver):
             if self._group:
                 raise RuntimeError('Receiver already started')
             self._poller.register(self._dish, POLLIN)
+            self._poller.register(self._wakeup_reader, POLLIN)
             self._dish.bind(group.url)
             self._dish.join(group.name)
             self._group = group.name
@@ -66,36 +93,119 @@ class DishReceiver(Receiver):
     def stop(self) -> None:
         try:
             self._group = None
+            self._wake_up()
             self._loop_executor.shutdown()
+            self._reassembler.clear()
+            if self._cache:
+                self._cache.clear()
             self._dish.close()
+            self._wakeup_reader.close()
+            self._wakeup_writer.close()
             self.log.debug('Receiver stopped')
         except Exception as error:
             self.log.error('Failed to stop receiver', error=error)
             raise error
 
-    def register(self, handler: OnMessage) -> None:
+    def register(self, handler: OnMessage, prefilter: Prefilter | None = None) -> None:
         self._handlers.append(handler)
+        self._set_prefilter(handler, prefilter)
 
     def deregister(self, handler: OnMessage) -> None:
         self._handlers.remove(handler)
+        self._set_prefilter(handler, None, True)
+
+    def register_batch(self, handler: OnMessageBatch, prefilter: Prefilter | None = None) -> None:
+        self._batch_handlers.append(handler)
+        self._set_prefilter(handler, prefilter)
+
+    def deregister_batch(self, handler: OnMessageBatch) -> None:
+        self._batch_handlers.remove(handler)
+        self._set_prefilter(handler, None, True)
+
+    def get_handler_stats(self) -> ExecutorStats | None:
+        return self._handler_executor.get_stats() if self._handler_executor else None
+
+    def _set_prefilter(self, handler: OnMessage | OnMessageBatch, prefilter: Prefilter | None,
+                       remove: bool = False) -> None:
+        if remove:
+            self._prefilters.pop(handler, None)
+        else:
+            self._prefilters[handler] = prefilter
+        prefilters = list(self._prefilters.values())
+        self._prefilter = self._accepts if prefilters and None not in prefilters else None
+
+    def _accepts(self, name: str, role: str) -> bool:
+        return any(prefilter and prefilter(name, role) for prefilter in list(self._prefilters.values()))
 
     def _receive_loop(self) -> None:
         while self._group:
             try:
                 sockets = dict(self._poller.poll(timeout=self._poll_timeout))
+                if self._wakeup_reader in sockets:
+                    self._wakeup_reader.recv(64)
                 if self._dish in sockets and sockets[self._dish] == POLLIN:
-                    message = self._dish.recv_json()
-                    self._handle_message(message)
+                    self._receive()
             except Exception as error:
                 self.log.error('Failed to receive message', group=self._group, error=error)
 
+    def _wake_up(self) -> None:
+        if self._wakeup_writer.fileno() != -1:
+            self._wakeup_writer.send(b'\x00')
+
+    def _receive(self) -> None:
+        messages: list[dict[str, Any]] = []
+        for _ in range(self._max_batch):
+            try:
+                data = self._dish.recv(NOBLOCK, copy=False).buffer if self._zero_copy else self._dish.recv(NOBLOCK)
+            except Again:
+                break
+            try:
+                messages.extend(self._process(data))
+            except Exception as error:
+                self.log.warn('Failed to process message', group=self._group, error=error)
+        if messages:
+            self._handle_messages(messages)
+
+    def _process(self, data: Buffer) -> list[dict[str, Any]]:
+        if self._handlers or self._batch_handlers:
+            if payload := self._reassemble(data):
+                if self._cache:
+                    return self._cache.decode_all(payload, self._prefilter)
+                return self._codecs.decode_all(payload, self._prefilter)
+        return []
+
+    def _reassemble(self, data: Buffer) -> Buffer | None:
+        if data and data[0] == FRAGMENT_TAG:
+            return self._reassembler.add(data)
+        return data
+
+    def _handle_messages(self, messages: list[dict[str, Any]]) -> None:
+        for message in messages:
+            self._handle_message(message)
+        for batch_handler in self._batch_handlers:
+            self._dispatch(self._execute_batch_handler, batch_handler, messages)
+
     def _handle_message(self, message: dict[str, Any]) -> None:
         self.log.debug('Message received', data=message, group=self._group)
+        # Only a well-formed uuid is a safe coalescing key, the message content is not validated yet
+        uuid = message.get('uuid')
         for handler in self._handlers:
-            self._handler_executor.submit(self._execute_handler, handler, message)
+            self._dispatch(self._execute_handler, handler, message, (handler, uuid) if isinstance(uuid, str) else None)
+
+    def _dispatch(self, execute: Callable[[Any, Any], None], handler: Any, data: Any, key: Any = None) -> None:
+        if self._handler_executor:
+            self._handler_executor.submit(execute, handler, data, key=key)
+        else:
+            execute(handler, data)
 
     def _execute_handler(self, handler: OnMessage, message: dict[str, Any]) -> None:
         try:
             handler(message)
         except Exception as error:
             self.log.warn('Handler failed to process message', data=message, group=self._group, error=error)
+
+    def _execute_batch_handler(self, handler: OnMessageBatch, messages: list[dict[str, Any]]) -> None:
+        try:
+            handler(messages)
+        except Exception as error:
+            self.log.warn('Handler failed to process messages', count=len(messages), group=self._group, error=error)
@@ -0,0 +1,204 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from collections.abc import Hashable, Iterator, Mapping
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from threading import Lock, RLock
+from typing import Any, Protocol
+from uuid import UUID
+
+from hello import Service, ServiceQuery, ServiceMatcher
+
+
+class OnServiceChanged(Protocol):
+    def __call__(self, previous: Service | None) -> None: ...
+
+
+@dataclass
+class SnapshotDiff:
+    added: list[Service] = field(default_factory=list)
+    updated: list[Service] = field(default_factory=list)
+    removed: list[Service] = field(default_factory=list)
+
+
+class ServiceSnapshot(Mapping[UUID, Service]):
+    __slots__ = ('version', '_services')
+
+    def __init__(self, version: int, services: dict[UUID, Service]) -> None:
+        self.version = version
+        self._services = services
+
+    def __getitem__(self, uuid: UUID) -> Service:
+        return self._services[uuid]
+
+    def __iter__(self) -> Iterator[UUID]:
+        return iter(self._services)
+
+    def __len__(self) -> int:
+        return len(self._services)
+
+    def __repr__(self) -> str:
+        return f'ServiceSnapshot(version={self.version}, services={self._services})'
+
+    def diff(self, previous: Mapping[UUID, Service]) -> SnapshotDiff:
+        diff = SnapshotDiff()
+        for uuid, service in self._services.items():
+            if (stored := previous.get(uuid)) is None:
+                diff.added.append(service)
+            elif not stored.same_as(service):
+                diff.updated.append(service)
+        diff.removed = [service for uuid, service in previous.items() if uuid not in self._services]
+        return diff
+
+
+class ServiceRegistry:
+
+    def __init__(self, info_keys: list[str] | tuple[str, ...] = (), stripes: int = 16) -> None:
+        if stripes < 1:
+            raise ValueError(f'Invalid number of lock stripes: {stripes}')
+        self._info_keys = tuple(info_keys)
+        self._services: dict[UUID, Service] = {}
+        self._names: dict[str, set[UUID]] = {}
+        self._roles: dict[str, set[UUID]] = {}
+        self._addresses: dict[str | None, set[UUID]] = {}
+        self._info: dict[str, dict[Hashable, set[UUID]]] = {key: {} for key in self._info_keys}
+        self._version = 0
+        self._snapshot = ServiceSnapshot(0, {})
+        self._stripes = [Lock() for _ in range(stripes)]
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self._services)
+
+    def __contains__(self, uuid: object) -> bool:
+        return uuid in self._services
+
+    def get(self, uuid: UUID) -> Service | None:
+        return self._services.get(uuid)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def put(self, service: Service, on_stored: OnServiceChanged | None = None) -> Service | None:
+        # Unchanged services, the bulk of the traffic, do not take the registry-wide lock
+        if on_stored is None and (previous := self._services.get(service.uuid)) is service:
+            return previous
+        with self._stripe(service.uuid):
+            previous = self._services.get(service.uuid)
+            if previous is not None and previous.same_as(service):
+                self._services[service.uuid] = service
+            else:
+                with self._lock:
+                    self._services[service.uuid] = service
+                    if previous:
+                        self._unindex(previous)
+                    self._index(service)
+                    self._version += 1
+            # Still under the stripe, so that callbacks for the same service run in the order of the changes
+            if on_stored:
+                on_stored(previous)
+            return previous
+
+    def remove(self, uuid: UUID, on_removed: OnServiceChanged | None = None) -> Service | None:
+        with self._stripe(uuid):
+            with self._lock:
+                if service := self._services.pop(uuid, None):
+                    self._unindex(service)
+                    self._version += 1
+            if on_removed:
+                on_removed(service)
+            return service
+
+    def clear(self) -> None:
+        # All stripes are taken first, as in put() and remove(), so that no in-flight put() survives the clear
+        with ExitStack() as stack:
+            for stripe in self._stripes:
+                stack.enter_context(stripe)
+            stack.enter_context(self._lock)
+            if self._services:
+                self._version += 1
+            self._services.clear()
+            self._names.clear()
+            self._roles.clear()
+            self._addresses.clear()
+            for index in self._info.values():
+                index.clear()
+
+    def to_dict(self) -> dict[UUID, Service]:
+        with self._lock:
+            return self._services.copy()
+
+    def snapshot(self) -> ServiceSnapshot:
+        if (snapshot := self._snapshot).version == self._version:
+            return snapshot
+        with self._lock:
+            if self._snapshot.version != self._version:
+                self._snapshot = ServiceSnapshot(self._version, self._services.copy())
+            return self._snapshot
+
+    def find(self, name: str | None = None, role: str | None = None, address: str | None = None,
+             **info: Any) -> list[Service]:
+        with self._lock:
+            candidates: list[set[UUID]] = []
+            if name is not None:
+                candidates.append(self._names.get(name, set()))
+            if role is not None:
+                candidates.append(self._roles.get(role, set()))
+            if address is not None:
+                candidates.append(self._addresses.get(address, set()))
+            unindexed: dict[str, Any] = {}
+            for key, value in info.items():
+                if key in self._info and isinstance(value, Hashable):
+                    candidates.append(self._info[key].get(value, set()))
+                else:
+                    unindexed[key] = value
+            if candidates:
+                uuids = set.intersection(*sorted(candidates, key=len))
+                services = [self._services[uuid] for uuid in uuids]
+            else:
+                services = list(self._services.values())
+            return [service for service in services if _has_info(service, unindexed)]
+
+    def select(self, query: ServiceQuery) -> list[Service]:
+        matcher = ServiceMatcher(query)
+        with self._lock:
+            by_name = set[UUID]().union(*[
+                uuids for name, uuids in self._names.items() if matcher.matches_name(name)
+            ])
+            by_role = set[UUID]().union(*[
+                uuids for role, uuids in self._roles.items() if matcher.matches_role(role)
+            ])
+            return [self._services[uuid] for uuid in by_name & by_role]
+
+    def _stripe(self, uuid: UUID) -> Lock:
+        return self._stripes[uuid.int % len(self._stripes)]
+
+    def _index(self, service: Service) -> None:
+        self._names.setdefault(service.name, set()).add(service.uuid)
+        self._roles.setdefault(service.role, set()).add(service.uuid)
+        self._addresses.setdefault(service.address, set()).add(service.uuid)
+        for key, index in self._info.items():
+            if key in service.info and isinstance(value := service.info[key], Hashable):
+                index.setdefault(value, set()).add(service.uuid)
+
+    def _unindex(self, service: Service) -> None:
+        _discard(self._names, service.name, service.uuid)
+        _discard(self._roles, service.role, service.uuid)
+        _discard(self._addresses, service.address, service.uuid)
+        for key, index in self._info.items():
+            if key in service.info and isinstance(value := service.info[key], Hashable):
+                _discard(index, value, service.uuid)
+
+
+def _discard(index: dict[Any, set[UUID]], value: Any, uuid: UUID) -> None:
+    if uuids := index.get(value):
+        uuids.discard(uuid)
+        if not uuids:
+            del index[value]
+
+
+def _has_info(service: Service, info: dict[str, Any]) -> bool:
+    return all(key in service.info and service.info[key] == value for key, value in info.items())
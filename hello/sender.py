@@ -5,9 +5,35 @@
 from typing import Any, cast
 
 from context_logger import get_logger
-from zmq import Context, RADIO, Socket
+from zmq import Context, Socket
 
-from hello import PrefixedGroup
+from hello import PrefixedGroup, Codec, JsonCodec, Compressor, pack_batch, MAX_BATCH_SIZE, BATCH_HEADER_SIZE, \
+    BATCH_ITEM_HEADER_SIZE, fragment_payload, FRAGMENT_HEADER_SIZE, Throttle, ThrottleStats, SocketPool, pack_header
+
+MAX_DATAGRAM_SIZE = 8192
+_FALLBACK_CODEC = JsonCodec()
+
+
+def convert_to_dict(data: Any) -> dict[str, Any] | None:
+    if isinstance(data, dict):
+        return data
+    elif hasattr(data, 'to_dict') and callable(getattr(data, 'to_dict')):
+        return cast(dict[str, Any], data.to_dict())
+    elif hasattr(data, 'as_dict') and callable(getattr(data, 'as_dict')):
+        return cast(dict[str, Any], data.as_dict())
+    elif hasattr(data, '__dict__'):
+        return cast(dict[str, Any], data.__dict__)
+    return None
+
+
+def add_header(message: dict[str, Any], payload: bytes) -> bytes:
+    name, role = message.get('name'), message.get('role')
+    if isinstance(name, str) and isinstance(role, str):
+        try:
+            return pack_header(name, role, payload)
+        except ValueError:
+            pass
+    return payload
 
 
 class Sender:
@@ -27,12 +53,39 @@ class Sender:
     def send(self, data: object) -> None:
         raise NotImplementedError()
 
+    def encode(self, data: object) -> bytes | None:
+        # Fallback for senders that only implement send(): the payload is decoded again in send_encoded()
+        message = convert_to_dict(data)
+        return _FALLBACK_CODEC.encode(message) if message is not None else None
+
+    def send_encoded(self, payload: bytes) -> None:
+        self.send(_FALLBACK_CODEC.decode(payload))
+
+    def send_batch(self, items: list[Any]) -> None:
+        for item in items:
+            self.send(item)
+
+    def send_encoded_batch(self, payloads: list[bytes]) -> None:
+        for payload in payloads:
+            self.send_encoded(payload)
+
 
 class RadioSender(Sender):
 
-    def __init__(self, context: Context[Any]) -> None:
+    def __init__(self, context: Context[Any], codec: Codec | None = None,
+                 max_datagram_size: int = MAX_DATAGRAM_SIZE, compressor: Compressor | None = None,
+                 throttle: Throttle | None = None, pool: SocketPool | None = None, header: bool = False) -> None:
         self._context = context
-        self._radio: Socket[bytes] = self._context.socket(RADIO)
+        self._codec = codec if codec else JsonCodec()
+        self._compressor = compressor
+        self._header = header
+        self._throttle = throttle
+        self._pool = pool if pool else SocketPool(context)
+        self._owns_pool = pool is None
+        self._max_datagram_size = max_datagram_size
+        self._payload_budget = max_datagram_size
+        self._radio: Socket[bytes] | None = None
+        self._url: str | None = None
         self._group: str | None = None
         self.log = get_logger(type(self).__name__)
 
@@ -40,8 +93,12 @@ class RadioSender(Sender):
         try:
             if self._group:
                 raise RuntimeError('Sender already started')
-            self._radio.connect(group.url)
+            self._radio = self._pool.acquire(group.url)
+            self._url = group.url
+            self._payload_budget = self._max_datagram_size - len(group.name.encode('utf-8')) - 1
             self._group = group.name
+            if self._throttle:
+                self._throttle.start(group.name, self._transmit)
             self.log.debug('Sender started', url=group.url, group=group.name)
         except Exception as error:
             self.log.error('Failed to start sender', url=group.url, group=group.name, error=error)
@@ -49,7 +106,9 @@ class RadioSender(Sender):
 
     def stop(self) -> None:
         try:
-            self._radio.close()
+            if self._throttle:
+                self._throttle.stop()
+            self._release_socket()
             self._group = None
             self.log.debug('Sender stopped')
         except Exception as error:
@@ -59,26 +118,110 @@ class RadioSender(Sender):
     def send(self, data: Any) -> None:
         if self._group:
             if message := self._convert_to_dict(data):
-                self._send_json(message)
+                self._send_message(message)
             else:
                 self.log.warning('Unsupported message type', data=data, group=self._group)
         else:
             self.log.warning('Cannot send message, sender not started', data=data)
 
-    def _convert_to_dict(self, data: Any) -> dict[str, Any] | None:
-        if isinstance(data, dict):
-            return data
-        elif hasattr(data, 'to_dict') and callable(getattr(data, 'to_dict')):
-            return cast(dict[str, Any], data.to_dict())
-        elif hasattr(data, 'as_dict') and callable(getattr(data, 'as_dict')):
-            return cast(dict[str, Any], data.as_dict())
-        elif hasattr(data, '__dict__'):
-            return cast(dict[str, Any], data.__dict__)
+    def get_throttle_stats(self) -> ThrottleStats | None:
+        return self._throttle.get_stats() if self._throttle else None
+
+    def encode(self, data: Any) -> bytes | None:
+        if message := self._convert_to_dict(data):
+            try:
+                return self._encode(message)
+            except Exception as error:
+                self.log.error('Failed to encode message', data=data, error=error)
+        else:
+            self.log.warning('Unsupported message type', data=data)
         return None
 
-    def _send_json(self, data: dict[str, Any]) -> None:
+    def send_encoded(self, payload: bytes) -> None:
+        if self._group:
+            self._send_payload(payload)
+        else:
+            self.log.warning('Cannot send message, sender not started', size=len(payload))
+
+    def send_batch(self, items: list[Any]) -> None:
+        if self._group:
+            self.send_encoded_batch([payload for item in items if (payload := self.encode(item)) is not None])
+        else:
+            self.log.warning('Cannot send batch, sender not started', count=len(items))
+
+    def send_encoded_batch(self, payloads: list[bytes]) -> None:
+        if self._group:
+            for batch in self._split_batch(payloads):
+                self._send_payload(batch[0] if len(batch) == 1 else pack_batch(batch))
+            self.log.debug('Batch sent', count=len(payloads), group=self._group)
+        else:
+            self.log.warning('Cannot send batch, sender not started', count=len(payloads))
+
+    def _convert_to_dict(self, data: Any) -> dict[str, Any] | None:
+        return convert_to_dict(data)
+
+    def _send_message(self, data: dict[str, Any]) -> None:
         try:
-            self._radio.send_json(data, group=self._group)
+            self._send_datagrams(self._encode(data))
             self.log.debug('Message sent', data=data, group=self._group)
         except Exception as error:
             self.log.error('Failed to send message', data=data, group=self._group, error=error)
+
+    def _release_socket(self) -> None:
+        if self._url:
+            self._pool.release(self._url)
+        self._radio = None
+        self._url = None
+        if self._owns_pool:
+            self._pool.close()
+
+    def _encode(self, message: dict[str, Any]) -> bytes:
+        payload = self._codec.encode(message)
+        if self._compressor:
+            payload = self._compressor.compress(payload)
+        return add_header(message, payload) if self._header else payload
+
+    def _split_batch(self, payloads: list[bytes]) -> list[list[bytes]]:
+        batches: list[list[bytes]] = []
+        batch: list[bytes] = []
+        size = BATCH_HEADER_SIZE
+        for payload in payloads:
+            item_size = BATCH_ITEM_HEADER_SIZE + len(payload)
+            if batch and (size + item_size > self._payload_budget or len(batch) == MAX_BATCH_SIZE):
+                batches.append(batch)
+                batch, size = [], BATCH_HEADER_SIZE
+            batch.append(payload)
+            size += item_size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _send_payload(self, payload: bytes) -> None:
+        try:
+            self._send_datagrams(payload)
+            self.log.debug('Encoded message sent', size=len(payload), group=self._group)
+        except Exception as error:
+            self.log.error('Failed to send encoded message', size=len(payload), group=self._group, error=error)
+
+    def _send_datagrams(self, payload: bytes) -> None:
+        if self._throttle:
+            self._throttle.submit(payload, self._count_datagrams(payload))
+        else:
+            self._transmit(payload)
+
+    def _count_datagrams(self, payload: bytes) -> int:
+        if len(payload) > self._payload_budget:
+            chunk_size = self._payload_budget - FRAGMENT_HEADER_SIZE
+            return (len(payload) + chunk_size - 1) // chunk_size
+        return 1
+
+    def _transmit(self, payload: bytes) -> None:
+        if not (radio := self._radio):
+            raise RuntimeError('Sender not started')
+        if len(payload) > self._payload_budget:
+            fragments = fragment_payload(payload, self._payload_budget)
+            for fragment in fragments:
+                radio.send(fragment, group=self._group)
+            self.log.debug('Message fragmented', size=len(payload), fragments=len(fragments), group=self._group)
+        else:
+            radio.send(payload, group=self._group)
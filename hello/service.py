@@ -2,9 +2,14 @@
 # SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
 # SPDX-License-Identifier: MIT
 
+import json
 import re
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Any
+from fnmatch import translate
+from hashlib import blake2b
+from threading import Lock
+from typing import Any, Callable
 from uuid import UUID
 
 
@@ -16,6 +21,7 @@ class Service:
     urls: dict[str, str] = field(default_factory=dict)
     info: dict[str, Any] = field(default_factory=dict)
     address: str | None = None
+    _fingerprint: int | None = field(default=None, init=False, repr=False, compare=False)
 
     def __repr__(self) -> str:
         return (f"Service(uuid='{self.uuid}', name='{self.name}', role='{self.role}', "
@@ -31,21 +37,204 @@ class Service:
             'address': self.address,
         }
 
+    @property
+    def fingerprint(self) -> int:
+        if self._fingerprint is None:
+            content = json.dumps(self.to_dict(), sort_keys=True, separators=(',', ':'), default=str)
+            self._fingerprint = int.from_bytes(blake2b(content.encode('utf-8'), digest_size=8).digest())
+        return self._fingerprint
+
+    def same_as(self, other: 'Service') -> bool:
+        return self is other or self.fingerprint == other.fingerprint
+
 
 @dataclass
 class ServiceQuery(object):
     name: str
     role: str
 
+    @classmethod
+    def glob(cls, name: str, role: str) -> 'ServiceQuery':
+        return cls(translate(name), translate(role))
+
 
 class ServiceMatcher(object):
 
     def __init__(self, query: ServiceQuery) -> None:
         self.query = query
-        self._name_matcher = re.compile(query.name)
-        self._role_matcher = re.compile(query.role)
+        self._name_matcher = _compile_pattern(query.name)
+        self._role_matcher = _compile_pattern(query.role)
 
     def matches(self, service: Service) -> bool:
-        name_match = self._name_matcher.match(service.name)
-        role_match = self._role_matcher.match(service.role)
-        return bool(name_match and role_match)
+        return self.matches_values(service.name, service.role)
+
+    def matches_values(self, name: str, role: str) -> bool:
+        return self.matches_name(name) and self.matches_role(role)
+
+    def matches_name(self, name: str) -> bool:
+        return self._name_matcher(name)
+
+    def matches_role(self, role: str) -> bool:
+        return self._role_matcher(role)
+
+
+class ServiceMatcherCache(object):
+
+    def __init__(self, max_size: int = 256) -> None:
+        self._max_size = max_size
+        self._entries: OrderedDict[tuple[str, str], tuple[ServiceMatcher, Service, bool]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def matches(self, query: ServiceQuery, service: Service) -> bool:
+        with self._lock:
+            entry = self._get_entry(query)
+        if entry and entry[1] is service:
+            return entry[2]
+        matcher = entry[0] if entry else ServiceMatcher(query)
+        matched = matcher.matches(service)
+        self._put(matcher, service, matched)
+        return matched
+
+    def _get_entry(self, query: ServiceQuery) -> tuple[ServiceMatcher, Service, bool] | None:
+        if entry := self._entries.get(key := (query.name, query.role)):
+            self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, matcher: ServiceMatcher, service: Service, matched: bool) -> None:
+        if self._max_size > 0:
+            with self._lock:
+                self._entries[(matcher.query.name, matcher.query.role)] = (matcher, service, matched)
+                if len(self._entries) > self._max_size:
+                    self._entries.popitem(last=False)
+
+
+class MultiServiceMatcher(object):
+
+    def __init__(self, queries: list[ServiceQuery]) -> None:
+        self.queries = list(queries)
+        self._names = _PatternSet([query.name for query in self.queries])
+        self._roles = _PatternSet([query.role for query in self.queries])
+        self._indexes = [(self._names.index(query.name), self._roles.index(query.role)) for query in self.queries]
+
+    def matches(self, service: Service) -> bool:
+        return self.matches_values(service.name, service.role)
+
+    def matches_values(self, name: str, role: str) -> bool:
+        return bool(self.match_values(name, role))
+
+    def match(self, service: Service) -> list[ServiceQuery]:
+        return self.match_values(service.name, service.role)
+
+    def match_values(self, name: str, role: str) -> list[ServiceQuery]:
+        if not (names := self._names.match(name)) or not (roles := self._roles.match(role)):
+            return []
+        return [query for query, (name_index, role_index) in zip(self.queries, self._indexes)
+                if name_index in names and role_index in roles]
+
+
+class _PatternSet(object):
+
+    def __init__(self, patterns: list[str]) -> None:
+        self._patterns = list(dict.fromkeys(patterns))
+        self._indexes = {pattern: index for index, pattern in enumerate(self._patterns)}
+        self._matchers = [_compile_simple(pattern) for pattern in self._patterns]
+        self._regexes = {
+            index: re.compile(pattern) for index, pattern in enumerate(self._patterns) if not self._matchers[index]
+        }
+        self._combined = _combine(list(self._regexes.values()))
+
+    def index(self, pattern: str) -> int:
+        return self._indexes[pattern]
+
+    def match(self, value: str) -> set[int]:
+        matched = {index for index, matcher in enumerate(self._matchers) if matcher and matcher(value)}
+        if self._regexes and (not self._combined or self._combined.match(value)):
+            matched.update(index for index, regex in self._regexes.items() if regex.match(value))
+        return matched
+
+
+def _combine(matchers: list[re.Pattern[str]]) -> re.Pattern[str] | None:
+    # Group numbers and global flags do not survive merging, such patterns are only matched one by one
+    if len(matchers) < 2 or any(matcher.groups for matcher in matchers):
+        return None
+    try:
+        return re.compile('|'.join(f'(?:{matcher.pattern})' for matcher in matchers))
+    except re.error:
+        return None
+
+
+_META_CHARACTERS = frozenset('.^$*+?{}[]\\|()')
+
+
+def _compile_pattern(pattern: str) -> Callable[[str], bool]:
+    if matcher := _compile_simple(pattern):
+        return matcher
+    regex = re.compile(pattern)
+    return lambda value: regex.match(value) is not None
+
+
+def _compile_simple(pattern: str) -> Callable[[str], bool] | None:
+    # Plain string operations for the common patterns, translated globs included, with re.match semantics
+    pattern, anchor, dotall = _split_anchor(pattern)
+    pattern, wildcard = _split_wildcard(pattern.removeprefix('^'))
+    if (literal := _unescape(pattern)) is None:
+        return None
+    if not wildcard:
+        return _match_literal(literal, anchor)
+    if anchor and not dotall:
+        return None
+    return _match_prefix(literal, wildcard, dotall)
+
+
+def _split_anchor(pattern: str) -> tuple[str, str, bool]:
+    if pattern.startswith('(?s:') and pattern.endswith(')\\Z'):
+        return pattern[4:-3], '\\Z', True
+    if pattern.endswith('\\Z'):
+        return pattern[:-2], '\\Z', False
+    if pattern.endswith('$'):
+        return pattern[:-1], '$', False
+    return pattern, '', False
+
+
+def _split_wildcard(pattern: str) -> tuple[str, str]:
+    if pattern.endswith('.*') or pattern.endswith('.+'):
+        return pattern[:-2], pattern[-2:]
+    return pattern, ''
+
+
+def _match_literal(literal: str, anchor: str) -> Callable[[str], bool]:
+    if anchor == '\\Z':
+        return lambda value: value == literal
+    if anchor == '$':
+        return lambda value: value == literal or value == literal + '\n'
+    return lambda value: value.startswith(literal)
+
+
+def _match_prefix(literal: str, wildcard: str, dotall: bool) -> Callable[[str], bool]:
+    size = len(literal)
+    if wildcard == '.*':
+        return lambda value: value.startswith(literal)
+    if dotall:
+        return lambda value: len(value) > size and value.startswith(literal)
+    return lambda value: len(value) > size and value[size] != '\n' and value.startswith(literal)
+
+
+def _unescape(pattern: str) -> str | None:
+    literal: list[str] = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            if char.isalnum():
+                return None
+            literal.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char in _META_CHARACTERS:
+            return None
+        else:
+            literal.append(char)
+    return None if escaped else ''.join(literal)
@@ -0,0 +1,149 @@
+import asyncio
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+from context_logger import setup_logging
+
+from hello import Service, Group, AsyncAdvertizer, AsyncRadioSender, AsyncDishReceiver
+
+GROUP = Group('test-group', 'udp://239.0.0.1:5555')
+SERVICE = Service(uuid4(), 'test-service', 'test-role', {'test': 'http://localhost:8080'})
+
+
+class AsyncAdvertizerTest(IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    async def test_starts_sender_and_receiver_when_started(self):
+        # Given
+        sender = MagicMock(spec=AsyncRadioSender)
+        receiver, queries = _create_receiver()
+        advertizer = AsyncAdvertizer(sender, receiver)
+
+        # When
+        await advertizer.start(GROUP, SERVICE)
+
+        # Then
+        sender.start.assert_called_once_with(GROUP.hello())
+        receiver.start.assert_called_once_with(GROUP.query())
+        await advertizer.stop()
+
+    async def test_reuses_encoded_service_when_advertised_repeatedly(self):
+        # Given
+        sender = MagicMock(spec=AsyncRadioSender)
+        advertizer = AsyncAdvertizer(sender)
+        await advertizer.start(GROUP, SERVICE)
+
+        # When
+        await advertizer.advertise()
+        await advertizer.advertise(SERVICE)
+
+        # Then
+        sender.encode.assert_called_once_with(SERVICE)
+        self.assertEqual(2, sender.send_encoded.await_count)
+        sender.send_encoded.assert_awaited_with(sender.encode.return_value)
+        await advertizer.stop()
+
+    async def test_does_not_send_service_when_not_started(self):
+        # Given
+        sender = MagicMock(spec=AsyncRadioSender)
+        advertizer = AsyncAdvertizer(sender)
+
+        # When
+        await advertizer.advertise(SERVICE)
+
+        # Then
+        sender.send_encoded.assert_not_awaited()
+
+    async def test_responds_to_matching_query(self):
+        # Given
+        sender = MagicMock(spec=AsyncRadioSender)
+        receiver, queries = _create_receiver()
+        advertizer = AsyncAdvertizer(sender, receiver, max_response_delay=0)
+        await advertizer.start(GROUP, SERVICE)
+
+        # When
+        queries.put_nowait([{'name': 'test-service', 'role': 'test-role'}])
+
+        # Then
+        await _wait_for_assertion(lambda: sender.send_encoded.assert_awaited_once_with(sender.encode.return_value))
+        await advertizer.stop()
+
+    async def test_does_not_respond_to_not_matching_query(self):
+        # Given
+        sender = MagicMock(spec=AsyncRadioSender)
+        receiver, queries = _create_receiver()
+        advertizer = AsyncAdvertizer(sender, receiver, max_response_delay=0)
+        await advertizer.start(GROUP, SERVICE)
+
+        # When
+        queries.put_nowait([{'name': 'other-service', 'role': 'test-role'}, {'invalid': 'query'}])
+
+        # Then
+        await _wait_for_assertion(lambda: self.assertTrue(queries.empty()))
+        await asyncio.sleep(0.01)
+        sender.send_encoded.assert_not_awaited()
+        await advertizer.stop()
+
+    async def test_passes_service_prefilter_to_receiver(self):
+        # Given
+        sender = MagicMock(spec=AsyncRadioSender)
+        receiver, queries = _create_receiver()
+        advertizer = AsyncAdvertizer(sender, receiver)
+        await advertizer.start(GROUP, SERVICE)
+        await _wait_for_assertion(lambda: receiver.receive.assert_awaited())
+
+        # When
+        prefilter = receiver.receive.call_args.args[0]
+
+        # Then
+        self.assertTrue(prefilter('test-.*', 'test-role'))
+        self.assertFalse(prefilter('other-service', 'test-role'))
+        await advertizer.stop()
+
+    async def test_stops_sender_and_receiver_on_exit(self):
+        # Given
+        sender = MagicMock(spec=AsyncRadioSender)
+        receiver, queries = _create_receiver()
+
+        async with AsyncAdvertizer(sender, receiver) as advertizer:
+            await advertizer.start(GROUP, SERVICE)
+
+            # When
+
+        # Then
+        sender.stop.assert_called_once()
+        receiver.stop.assert_called_once()
+
+
+def _create_receiver() -> tuple[MagicMock, asyncio.Queue[list[dict[str, str]]]]:
+    receiver = MagicMock(spec=AsyncDishReceiver)
+    queries: asyncio.Queue[list[dict[str, str]]] = asyncio.Queue()
+
+    async def receive(prefilter=None):
+        return await queries.get()
+
+    receiver.receive.side_effect = receive
+    return receiver, queries
+
+
+async def _wait_for_assertion(assertion) -> None:
+    # The assertion has to be retried on the event loop, so that the advertizer tasks can progress
+    for _ in range(100):
+        try:
+            assertion()
+            return
+        except AssertionError:
+            await asyncio.sleep(0.01)
+    assertion()
+
+
+if __name__ == '__main__':
+    unittest.main()
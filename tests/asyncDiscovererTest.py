@@ -0,0 +1,139 @@
+import asyncio
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+from context_logger import setup_logging
+
+from hello import Service, Group, ServiceQuery, AsyncDiscoverer, AsyncRadioSender, AsyncDishReceiver, \
+    DiscoveryEvent, DiscoveryEventType
+
+GROUP = Group('test-group', 'udp://239.0.0.1:5555')
+QUERY = ServiceQuery('test-service', 'test-role')
+SERVICE = Service(uuid4(), 'test-service', 'test-role', {'test': 'http://localhost:8080'}, {}, '192.168.1.1')
+
+
+class AsyncDiscovererTest(IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    async def test_starts_sender_and_receiver_when_started(self):
+        # Given
+        sender = MagicMock(spec=AsyncRadioSender)
+        receiver, messages = _create_receiver()
+        discoverer = AsyncDiscoverer(sender, receiver)
+
+        # When
+        await discoverer.start(GROUP, QUERY)
+
+        # Then
+        sender.start.assert_called_once_with(GROUP.query())
+        receiver.start.assert_called_once_with(GROUP.hello())
+        await discoverer.stop()
+
+    async def test_sends_query_when_discovering(self):
+        # Given
+        sender = MagicMock(spec=AsyncRadioSender)
+        receiver, messages = _create_receiver()
+        discoverer = AsyncDiscoverer(sender, receiver)
+        await discoverer.start(GROUP)
+
+        # When
+        await discoverer.discover(QUERY)
+
+        # Then
+        sender.send.assert_awaited_once_with(QUERY)
+        await discoverer.stop()
+
+    async def test_yields_discovered_updated_and_unchanged_events(self):
+        # Given
+        receiver, messages = _create_receiver()
+        discoverer = AsyncDiscoverer(MagicMock(spec=AsyncRadioSender), receiver)
+        await discoverer.start(GROUP, QUERY)
+        updated = Service(SERVICE.uuid, SERVICE.name, SERVICE.role, {'test': 'http://localhost:9090'}, {},
+                          SERVICE.address)
+        messages.put_nowait([SERVICE.to_dict()])
+        messages.put_nowait([SERVICE.to_dict(), updated.to_dict()])
+        events = []
+
+        # When
+        async for event in discoverer:
+            events.append(event)
+            if len(events) == 3:
+                break
+
+        # Then
+        self.assertEqual([
+            DiscoveryEvent(GROUP, QUERY, SERVICE, DiscoveryEventType.DISCOVERED),
+            DiscoveryEvent(GROUP, QUERY, SERVICE, DiscoveryEventType.UNCHANGED),
+            DiscoveryEvent(GROUP, QUERY, updated, DiscoveryEventType.UPDATED)
+        ], events)
+        self.assertEqual({SERVICE.uuid: updated}, discoverer.get_services())
+        await discoverer.stop()
+
+    async def test_does_not_yield_event_for_not_matching_or_invalid_service(self):
+        # Given
+        receiver, messages = _create_receiver()
+        discoverer = AsyncDiscoverer(MagicMock(spec=AsyncRadioSender), receiver)
+        await discoverer.start(GROUP, QUERY)
+        other = Service(uuid4(), 'other-service', 'test-role', {}, {}, '192.168.1.2')
+        messages.put_nowait([other.to_dict(), {'name': 'test-service'}, SERVICE.to_dict()])
+
+        # When
+        event = await anext(aiter(discoverer))
+
+        # Then
+        self.assertEqual(DiscoveryEvent(GROUP, QUERY, SERVICE, DiscoveryEventType.DISCOVERED), event)
+        self.assertEqual({SERVICE.uuid: SERVICE}, discoverer.get_services())
+        await discoverer.stop()
+
+    async def test_passes_query_prefilter_to_receiver(self):
+        # Given
+        receiver, messages = _create_receiver()
+        discoverer = AsyncDiscoverer(MagicMock(spec=AsyncRadioSender), receiver)
+        await discoverer.start(GROUP, ServiceQuery('test-.*', 'test-role'))
+        messages.put_nowait([SERVICE.to_dict()])
+
+        # When
+        await anext(aiter(discoverer))
+
+        # Then
+        prefilter = receiver.receive.call_args.args[0]
+        self.assertTrue(prefilter('test-service', 'test-role'))
+        self.assertFalse(prefilter('other-service', 'test-role'))
+        await discoverer.stop()
+
+    async def test_stops_sender_and_receiver_on_exit(self):
+        # Given
+        sender = MagicMock(spec=AsyncRadioSender)
+        receiver, messages = _create_receiver()
+
+        async with AsyncDiscoverer(sender, receiver) as discoverer:
+            await discoverer.start(GROUP, QUERY)
+
+            # When
+
+        # Then
+        sender.stop.assert_called_once()
+        receiver.stop.assert_called_once()
+
+
+def _create_receiver() -> tuple[MagicMock, asyncio.Queue[list[dict[str, object]]]]:
+    receiver = MagicMock(spec=AsyncDishReceiver)
+    messages: asyncio.Queue[list[dict[str, object]]] = asyncio.Queue()
+
+    async def receive(prefilter=None):
+        return await messages.get()
+
+    receiver.receive.side_effect = receive
+    return receiver, messages
+
+
+if __name__ == '__main__':
+    unittest.main()
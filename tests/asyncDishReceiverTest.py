@@ -0,0 +1,171 @@
+import asyncio
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import MagicMock, AsyncMock
+from uuid import uuid4
+
+from context_logger import setup_logging
+from zmq import Again, NOBLOCK
+from zmq.asyncio import Context as AsyncContext
+
+from hello import Service, Group, AsyncDishReceiver, JsonCodec, fragment_payload, pack_header
+
+GROUP = Group('test-group', 'udp://239.0.0.1:5555')
+SERVICE = Service(uuid4(), 'test-service', 'test-role', {'test': 'http://localhost:8080'})
+PAYLOAD = JsonCodec().encode(SERVICE.to_dict())
+
+
+class AsyncDishReceiverTest(IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    async def test_returns_empty_list_when_not_started(self):
+        # Given
+        receiver = AsyncDishReceiver(MagicMock(spec=AsyncContext))
+
+        # When
+        result = await receiver.receive()
+
+        # Then
+        self.assertEqual([], result)
+
+    async def test_drains_pending_messages_after_first_message(self):
+        # Given
+        context, dish = _create_context([PAYLOAD, PAYLOAD, Again()])
+        receiver = AsyncDishReceiver(context)
+        receiver.start(GROUP.hello())
+
+        # When
+        result = await receiver.receive()
+
+        # Then
+        self.assertEqual([SERVICE.to_dict(), SERVICE.to_dict()], result)
+        self.assertEqual(NOBLOCK, dish.recv.call_args_list[1].args[0])
+        self.assertEqual(3, dish.recv.call_count)
+
+    async def test_drains_at_most_max_batch_messages(self):
+        # Given
+        context, dish = _create_context([PAYLOAD, PAYLOAD, PAYLOAD])
+        receiver = AsyncDishReceiver(context, max_batch=2)
+        receiver.start(GROUP.hello())
+
+        # When
+        result = await receiver.receive()
+
+        # Then
+        self.assertEqual([SERVICE.to_dict(), SERVICE.to_dict()], result)
+        self.assertEqual(2, dish.recv.call_count)
+
+    async def test_reassembles_fragmented_message(self):
+        # Given
+        fragments = fragment_payload(PAYLOAD, 64)
+        context, dish = _create_context([*fragments, Again()])
+        receiver = AsyncDishReceiver(context)
+        receiver.start(GROUP.hello())
+
+        # When
+        result = await receiver.receive()
+
+        # Then
+        self.assertLess(1, len(fragments))
+        self.assertEqual([SERVICE.to_dict()], result)
+
+    async def test_drops_message_rejected_by_prefilter(self):
+        # Given
+        other = JsonCodec().encode({'name': 'other-service', 'role': 'other-role'})
+        context, dish = _create_context([pack_header('test-service', 'test-role', PAYLOAD),
+                                         pack_header('other-service', 'other-role', other), Again()])
+        receiver = AsyncDishReceiver(context)
+        receiver.start(GROUP.hello())
+
+        # When
+        result = await receiver.receive(lambda name, role: name == 'test-service')
+
+        # Then
+        self.assertEqual([SERVICE.to_dict()], result)
+
+    async def test_skips_message_that_fails_to_decode(self):
+        # Given
+        context, dish = _create_context([b'\xff' + PAYLOAD, PAYLOAD, Again()])
+        receiver = AsyncDishReceiver(context)
+        receiver.start(GROUP.hello())
+
+        # When
+        result = await receiver.receive()
+
+        # Then
+        self.assertEqual([SERVICE.to_dict()], result)
+
+    async def test_returns_empty_list_when_stopped_while_receiving(self):
+        # Given
+        context, dish = _create_context([])
+        receiver = AsyncDishReceiver(context)
+        receiver.start(GROUP.hello())
+        task = asyncio.create_task(receiver.receive())
+        await asyncio.sleep(0)
+
+        # When
+        receiver.stop()
+        task.cancel()
+
+        # Then
+        self.assertEqual([], await task)
+        dish.close.assert_called_once()
+
+    async def test_propagates_cancellation_when_cancelled_while_running(self):
+        # Given
+        context, dish = _create_context([])
+        receiver = AsyncDishReceiver(context)
+        receiver.start(GROUP.hello())
+        task = asyncio.create_task(receiver.receive())
+        await asyncio.sleep(0)
+
+        # When
+        task.cancel()
+
+        # Then
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        receiver.stop()
+
+    async def test_yields_received_messages_until_stopped(self):
+        # Given
+        context, dish = _create_context([PAYLOAD, Again(), PAYLOAD, Again()])
+        receiver = AsyncDishReceiver(context)
+        receiver.start(GROUP.hello())
+        messages = []
+
+        # When
+        async for message in receiver:
+            messages.append(message)
+            if len(messages) == 2:
+                receiver.stop()
+
+        # Then
+        self.assertEqual([SERVICE.to_dict(), SERVICE.to_dict()], messages)
+
+
+def _create_context(responses: list[object]) -> tuple[MagicMock, MagicMock]:
+    context = MagicMock(spec=AsyncContext)
+    dish = context.socket.return_value
+    pending = list(responses)
+
+    async def recv(*args):
+        if pending:
+            response = pending.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        await asyncio.Event().wait()
+
+    dish.recv = AsyncMock(side_effect=recv)
+    return context, dish
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from uuid import uuid4
+
+from context_logger import setup_logging
+
+from hello import Service, Group, ServiceQuery, Hello, HelloConfig, DiscoveryEvent, DiscoveryEventType
+
+GROUP = Group('test-group', 'udp://239.0.0.1:5555')
+SERVICE = Service(
+    uuid4(),
+    'test-service',
+    'test-role',
+    {'test': 'http://localhost:8080'},
+    {'site': 'test-site', 'range': 'test-range'},
+    '192.168.1.100'
+)
+SERVICE_QUERY = ServiceQuery('test-service', 'test-role')
+
+
+class AsyncIntegrationTest(IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    async def test_discoverer_yields_event_for_advertised_service(self):
+        # Given
+        config = HelloConfig(advertizer_responder=False)
+
+        async with (Hello.builder(config).advertizer().asyncio() as advertizer,
+                    Hello.builder(config).discoverer().asyncio() as discoverer):
+            await advertizer.start(GROUP, SERVICE)
+            await discoverer.start(GROUP, SERVICE_QUERY)
+
+            # When
+            await advertizer.advertise()
+
+            event = await asyncio.wait_for(anext(aiter(discoverer)), 1)
+
+        # Then
+        self.assertEqual(DiscoveryEvent(GROUP, SERVICE_QUERY, SERVICE, DiscoveryEventType.DISCOVERED), event)
+        self.assertEqual({SERVICE.uuid: SERVICE}, discoverer.get_services())
+
+    async def test_advertizer_responds_to_discovery_query(self):
+        # Given
+        config = HelloConfig()
+
+        async with (Hello.builder(config).advertizer().asyncio() as advertizer,
+                    Hello.builder(config).discoverer().asyncio() as discoverer):
+            await advertizer.start(GROUP, SERVICE)
+            await discoverer.start(GROUP, SERVICE_QUERY)
+
+            # When
+            await discoverer.discover()
+
+            event = await asyncio.wait_for(anext(aiter(discoverer)), 1)
+
+        # Then
+        self.assertEqual(SERVICE, event.service)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import time
+import unittest
+from threading import Event, Timer
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from hello import BoundedExecutor, OverflowPolicy, ExecutorStats
+
+
+class BoundedExecutorTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_executes_submitted_tasks(self):
+        # Given
+        with BoundedExecutor(2) as executor:
+            # When
+            futures = [executor.submit(pow, value, 2) for value in range(5)]
+
+            # Then
+            self.assertEqual([0, 1, 4, 9, 16], [future.result(1) for future in futures])
+
+    def test_drops_newest_task_when_queue_full(self):
+        # Given
+        gate = Event()
+
+        with BoundedExecutor(1, 2, OverflowPolicy.DROP_NEWEST) as executor:
+            self._block_worker(executor, gate)
+
+            # When
+            futures = [executor.submit(str, value) for value in range(4)]
+            gate.set()
+
+            # Then
+            self.assertEqual(['0', '1'], [future.result(1) for future in futures[:2]])
+            self.assertTrue(all(future.cancelled() for future in futures[2:]))
+            self.assertEqual(ExecutorStats(submitted=5, dropped=2), executor.get_stats())
+
+    def test_drops_oldest_task_when_queue_full(self):
+        # Given
+        gate = Event()
+
+        with BoundedExecutor(1, 2, OverflowPolicy.DROP_OLDEST) as executor:
+            self._block_worker(executor, gate)
+
+            # When
+            futures = [executor.submit(str, value) for value in range(4)]
+            gate.set()
+
+            # Then
+            self.assertTrue(all(future.cancelled() for future in futures[:2]))
+            self.assertEqual(['2', '3'], [future.result(1) for future in futures[2:]])
+            self.assertEqual(ExecutorStats(submitted=5, dropped=2), executor.get_stats())
+
+    def test_queues_tasks_with_same_key_while_queue_has_room(self):
+        # Given
+        gate = Event()
+
+        with BoundedExecutor(1, 4, OverflowPolicy.COALESCE) as executor:
+            self._block_worker(executor, gate)
+
+            # When
+            futures = [executor.submit(str, value, key='service') for value in range(4)]
+            gate.set()
+
+            # Then
+            self.assertEqual(['0', '1', '2', '3'], [future.result(1) for future in futures])
+            self.assertEqual(ExecutorStats(submitted=5), executor.get_stats())
+
+    def test_coalesces_tasks_with_same_key_when_queue_full(self):
+        # Given
+        gate = Event()
+
+        with BoundedExecutor(1, 2, OverflowPolicy.COALESCE) as executor:
+            self._block_worker(executor, gate)
+            other = executor.submit(str, 'other', key='other')
+
+            # When
+            futures = [executor.submit(str, value, key='service') for value in range(4)]
+            gate.set()
+
+            # Then
+            self.assertEqual('other', other.result(1))
+            self.assertTrue(all(future.cancelled() for future in futures[:3]))
+            self.assertEqual('3', futures[3].result(1))
+            self.assertEqual(ExecutorStats(submitted=6, coalesced=3), executor.get_stats())
+
+    def test_blocks_submitter_when_queue_full_and_task_cannot_be_coalesced(self):
+        # Given
+        gate = Event()
+
+        with BoundedExecutor(1, 2, OverflowPolicy.COALESCE) as executor:
+            self._block_worker(executor, gate)
+            queued = [executor.submit(str, 'service', key='service'), executor.submit(str, 'none')]
+            Timer(0.1, gate.set).start()
+
+            # When
+            start = time.monotonic()
+            future = executor.submit(str, 'other', key='other')
+
+            # Then
+            self.assertGreaterEqual(time.monotonic() - start, 0.05)
+            self.assertEqual(['service', 'none', 'other'], [future.result(1) for future in queued + [future]])
+            self.assertEqual(ExecutorStats(submitted=4, delayed=1), executor.get_stats())
+
+    def test_blocks_submitter_until_queue_has_room(self):
+        # Given
+        gate = Event()
+
+        with BoundedExecutor(1, 1, OverflowPolicy.BLOCK) as executor:
+            self._block_worker(executor, gate)
+            executor.submit(str, 0)
+            Timer(0.1, gate.set).start()
+
+            # When
+            start = time.monotonic()
+            future = executor.submit(str, 1)
+
+            # Then
+            self.assertGreaterEqual(time.monotonic() - start, 0.05)
+            self.assertEqual('1', future.result(1))
+            self.assertEqual(ExecutorStats(submitted=3, delayed=1), executor.get_stats())
+
+    def test_raises_error_when_submitted_after_shutdown(self):
+        # Given
+        executor = BoundedExecutor(1)
+        executor.shutdown()
+
+        # When, Then
+        with self.assertRaises(RuntimeError):
+            executor.submit(str, 0)
+
+    def _block_worker(self, executor: BoundedExecutor, gate: Event) -> None:
+        started = Event()
+        executor.submit(lambda: (started.set(), gate.wait()))
+        started.wait(1)
+
+
+if __name__ == '__main__':
+    unittest.main()
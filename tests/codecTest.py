@@ -0,0 +1,466 @@
+import json
+import unittest
+from unittest import TestCase
+from uuid import uuid4
+
+from context_logger import setup_logging
+from zmq import Frame
+
+from hello import Service, JsonCodec, CompactCodec, CodecRegistry, Compressor, COMPACT_CODEC_TAG, BATCH_TAG, \
+    COMPRESSED_TAG, HEADER_TAG, pack_batch, unpack_batch, pack_header, unpack_header, DecodeCache, Message
+
+SERVICE = Service(
+    uuid4(),
+    'test-service',
+    'test-role',
+    {'test': 'http://localhost:8080'},
+    {'site': 'test-site', 'range': 'test-range', 'ports': [8080, -1, 65536], 'ratio': 0.5, 'enabled': True},
+    '192.168.1.100'
+)
+
+
+class JsonCodecTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_encodes_message_as_legacy_compatible_json(self):
+        # Given
+        codec = JsonCodec()
+
+        # When
+        result = codec.encode(SERVICE.to_dict())
+
+        # Then
+        self.assertEqual(ord('{'), result[0])
+        self.assertEqual(SERVICE.to_dict(), json.loads(result))
+
+    def test_decodes_message_from_memoryview(self):
+        # Given
+        codec = JsonCodec()
+
+        # When
+        result = codec.decode(memoryview(codec.encode(SERVICE.to_dict())))
+
+        # Then
+        self.assertEqual(SERVICE.to_dict(), result)
+
+    def test_raises_error_when_decoded_message_is_not_an_object(self):
+        # Given
+        codec = JsonCodec()
+
+        # When, Then
+        with self.assertRaises(ValueError):
+            codec.decode(b'[1, 2, 3]')
+
+
+class CompactCodecTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_encodes_and_decodes_message(self):
+        # Given
+        codec = CompactCodec()
+
+        # When
+        result = codec.decode(codec.encode(SERVICE.to_dict()))
+
+        # Then
+        self.assertEqual(SERVICE.to_dict(), result)
+
+    def test_encodes_message_tagged_and_smaller_than_json(self):
+        # Given
+        codec = CompactCodec()
+
+        # When
+        result = codec.encode(SERVICE.to_dict())
+
+        # Then
+        self.assertEqual(COMPACT_CODEC_TAG, result[0])
+        self.assertLess(len(result), len(JsonCodec().encode(SERVICE.to_dict())) * 0.75)
+
+    def test_encodes_and_decodes_service_without_address(self):
+        # Given
+        codec = CompactCodec()
+        message = {**SERVICE.to_dict(), 'address': None}
+
+        # When
+        result = codec.decode(codec.encode(message))
+
+        # Then
+        self.assertEqual(message, result)
+
+    def test_encodes_and_decodes_service_with_extra_fields(self):
+        # Given
+        codec = CompactCodec()
+        message = {**SERVICE.to_dict(), 'interval': 5.0}
+
+        # When
+        result = codec.decode(codec.encode(message))
+
+        # Then
+        self.assertEqual(message, result)
+
+    def test_encodes_and_decodes_message_not_fitting_service_layout(self):
+        # Given
+        codec = CompactCodec()
+        message = {**SERVICE.to_dict(), 'uuid': str(SERVICE.uuid).upper(), 'name': 'x' * 256}
+
+        # When
+        result = codec.decode(codec.encode(message))
+
+        # Then
+        self.assertEqual(message, result)
+
+    def test_decodes_message_from_memoryview(self):
+        # Given
+        codec = CompactCodec()
+
+        # When
+        result = codec.decode(memoryview(codec.encode(SERVICE.to_dict())))
+
+        # Then
+        self.assertEqual(SERVICE.to_dict(), result)
+
+    def test_converts_non_string_keys_like_json(self):
+        # Given
+        codec = CompactCodec()
+        message = {'info': {1: 'one', None: 'none', 2.5: 'half'}}
+
+        # When
+        result = codec.decode(codec.encode(message))
+
+        # Then
+        self.assertEqual(json.loads(json.dumps(message)), result)
+
+    def test_raises_error_when_value_not_serializable(self):
+        # Given
+        codec = CompactCodec()
+
+        # When, Then
+        with self.assertRaises(TypeError):
+            codec.encode({'info': {'data': object()}})
+
+    def test_raises_error_when_message_truncated(self):
+        # Given
+        codec = CompactCodec()
+        data = codec.encode(SERVICE.to_dict())
+
+        # When, Then
+        with self.assertRaises(Exception):
+            codec.decode(data[:-5])
+
+
+class CodecRegistryTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_decodes_message_with_codec_selected_by_tag(self):
+        # Given
+        registry = CodecRegistry()
+
+        # When
+        json_result = registry.decode(JsonCodec().encode(SERVICE.to_dict()))
+        compact_result = registry.decode(CompactCodec().encode(SERVICE.to_dict()))
+
+        # Then
+        self.assertEqual(SERVICE.to_dict(), json_result)
+        self.assertEqual(SERVICE.to_dict(), compact_result)
+
+    def test_decodes_legacy_json_message(self):
+        # Given
+        registry = CodecRegistry()
+
+        # When
+        result = registry.decode(json.dumps(SERVICE.to_dict()).encode())
+
+        # Then
+        self.assertEqual(SERVICE.to_dict(), result)
+
+    def test_raises_error_when_codec_not_registered(self):
+        # Given
+        registry = CodecRegistry([JsonCodec()])
+
+        # When, Then
+        with self.assertRaises(ValueError):
+            registry.decode(CompactCodec().encode(SERVICE.to_dict()))
+
+    def test_decodes_all_messages_of_batch(self):
+        # Given
+        registry = CodecRegistry()
+        query = {'name': 'test-.*', 'role': 'test-.*'}
+        data = pack_batch([JsonCodec().encode(SERVICE.to_dict()), CompactCodec().encode(query)])
+
+        # When
+        result = registry.decode_all(data)
+
+        # Then
+        self.assertEqual([SERVICE.to_dict(), query], result)
+
+    def test_decodes_single_message_when_not_batched(self):
+        # Given
+        registry = CodecRegistry()
+
+        # When
+        result = registry.decode_all(JsonCodec().encode(SERVICE.to_dict()))
+
+        # Then
+        self.assertEqual([SERVICE.to_dict()], result)
+
+
+class BatchTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_packs_and_unpacks_payloads(self):
+        # Given
+        payloads = [b'{"a":1}', b'\x01\x80', b'{}']
+
+        # When
+        data = pack_batch(payloads)
+
+        # Then
+        self.assertEqual(BATCH_TAG, data[0])
+        self.assertEqual(payloads, unpack_batch(data))
+
+    def test_raises_error_when_batch_empty(self):
+        # When, Then
+        with self.assertRaises(ValueError):
+            pack_batch([])
+
+    def test_raises_error_when_batch_truncated(self):
+        # Given
+        data = pack_batch([b'{"a":1}', b'{"b":2}'])
+
+        # When, Then
+        with self.assertRaises(ValueError):
+            unpack_batch(data[:-1])
+
+
+class HeaderTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_packs_and_unpacks_header(self):
+        # Given
+        payload = JsonCodec().encode(SERVICE.to_dict())
+
+        # When
+        data = pack_header('test-service', 'test-role', payload)
+
+        # Then
+        self.assertEqual(HEADER_TAG, data[0])
+        self.assertEqual(('test-service', 'test-role', payload), unpack_header(data))
+
+    def test_raises_error_when_header_field_too_long(self):
+        # When, Then
+        with self.assertRaises(ValueError):
+            pack_header('x' * 256, 'test-role', b'{}')
+
+    def test_raises_error_when_header_truncated(self):
+        # Given
+        data = pack_header('test-service', 'test-role', b'{}')
+
+        # When, Then
+        with self.assertRaises(ValueError):
+            unpack_header(data[:10])
+
+    def test_decodes_message_behind_header(self):
+        # Given
+        data = pack_header('test-service', 'test-role', Compressor(0).compress(JsonCodec().encode(SERVICE.to_dict())))
+
+        # When
+        result = CodecRegistry().decode_all(data)
+
+        # Then
+        self.assertEqual([SERVICE.to_dict()], result)
+
+    def test_skips_body_when_prefilter_rejects_header(self):
+        # Given
+        data = pack_batch([
+            pack_header('other-service', 'test-role', b'{invalid'),
+            pack_header('test-service', 'test-role', JsonCodec().encode(SERVICE.to_dict()))
+        ])
+
+        # When
+        result = CodecRegistry().decode_all(data, lambda name, role: name == 'test-service')
+
+        # Then
+        self.assertEqual([SERVICE.to_dict()], result)
+
+    def test_does_not_cache_partially_rejected_payload(self):
+        # Given
+        cache = DecodeCache(CodecRegistry())
+        data = pack_batch([
+            pack_header('other-service', 'test-role', JsonCodec().encode({'name': 'other-service'})),
+            pack_header('test-service', 'test-role', JsonCodec().encode(SERVICE.to_dict()))
+        ])
+        cache.decode_all(data, lambda name, role: name == 'test-service')
+
+        # When
+        result = cache.decode_all(data)
+
+        # Then
+        self.assertEqual([{'name': 'other-service'}, SERVICE.to_dict()], result)
+
+
+class CompressorTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_compresses_payload_above_threshold(self):
+        # Given
+        compressor = Compressor(threshold=100)
+        payload = JsonCodec().encode(SERVICE.to_dict())
+
+        # When
+        result = compressor.compress(payload)
+
+        # Then
+        self.assertEqual(COMPRESSED_TAG, result[0])
+        self.assertLess(len(result), len(payload))
+        self.assertEqual([SERVICE.to_dict()], CodecRegistry().decode_all(result))
+
+    def test_compresses_payload_without_preset_dictionary(self):
+        # Given
+        compressor = Compressor(threshold=100, dictionary=None)
+        payload = JsonCodec().encode(SERVICE.to_dict())
+
+        # When
+        result = compressor.compress(payload)
+
+        # Then
+        self.assertEqual(COMPRESSED_TAG, result[0])
+        self.assertEqual([SERVICE.to_dict()], CodecRegistry(dictionary=None).decode_all(result))
+
+    def test_does_not_compress_payload_below_threshold(self):
+        # Given
+        compressor = Compressor(threshold=10000)
+        payload = JsonCodec().encode(SERVICE.to_dict())
+
+        # When
+        result = compressor.compress(payload)
+
+        # Then
+        self.assertEqual(payload, result)
+
+    def test_does_not_compress_payload_when_not_smaller(self):
+        # Given
+        compressor = Compressor(threshold=0)
+        payload = b'{}'
+
+        # When
+        result = compressor.compress(payload)
+
+        # Then
+        self.assertEqual(payload, result)
+
+    def test_raises_error_when_decompressing_without_dictionary(self):
+        # Given
+        data = Compressor(threshold=0).compress(JsonCodec().encode(SERVICE.to_dict()))
+
+        # When, Then
+        with self.assertRaises(ValueError):
+            CodecRegistry(dictionary=None).decode_all(data)
+
+    def test_raises_error_when_compressed_message_truncated(self):
+        # Given
+        data = Compressor(threshold=0).compress(JsonCodec().encode(SERVICE.to_dict()))
+
+        # When, Then
+        with self.assertRaises(ValueError):
+            CodecRegistry().decode_all(data[:-4])
+
+
+class DecodeCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_decodes_messages_with_their_payloads(self):
+        # Given
+        cache = DecodeCache(CodecRegistry())
+        payloads = [JsonCodec().encode(SERVICE.to_dict()), CompactCodec().encode({'name': 'a', 'role': 'b'})]
+
+        # When
+        result = cache.decode_all(memoryview(pack_batch(payloads)))
+
+        # Then
+        self.assertEqual([SERVICE.to_dict(), {'name': 'a', 'role': 'b'}], result)
+        self.assertTrue(all(isinstance(message, Message) for message in result))
+        self.assertEqual(payloads, [message.payload for message in result])
+
+    def test_returns_cached_messages_for_identical_payload(self):
+        # Given
+        cache = DecodeCache(CodecRegistry())
+        first = cache.decode_all(JsonCodec().encode(SERVICE.to_dict()))
+
+        # When
+        result = cache.decode_all(JsonCodec().encode(SERVICE.to_dict()))
+
+        # Then
+        self.assertIs(first, result)
+
+    def test_returns_cached_messages_for_identical_zero_copy_frame(self):
+        # Given
+        cache = DecodeCache(CodecRegistry())
+        payload = CompactCodec().encode(SERVICE.to_dict())
+        first = cache.decode_all(Frame(payload).buffer)
+
+        # When
+        result = cache.decode_all(Frame(payload).buffer)
+
+        # Then
+        self.assertIs(first, result)
+        self.assertIs(first, cache.decode_all(payload))
+
+    def test_evicts_least_recently_used_payload(self):
+        # Given
+        cache = DecodeCache(CodecRegistry(), max_size=2)
+        first = cache.decode_all(b'{"a":1}')
+        second = cache.decode_all(b'{"b":2}')
+        cache.decode_all(b'{"a":1}')
+
+        # When
+        cache.decode_all(b'{"c":3}')
+
+        # Then
+        self.assertIs(first, cache.decode_all(b'{"a":1}'))
+        self.assertIsNot(second, cache.decode_all(b'{"b":2}'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,7 @@ from uuid import uuid4
 
 from context_logger import setup_logging
 
-from hello import Service, Group, Sender, DefaultAdvertizer
+from hello import Service, Group, Sender, DefaultAdvertizer, PrefixedGroup
 
 GROUP = Group('test-group', 'udp://239.0.0.1:5555')
 SERVICE = Service(uuid4(), 'test-service', 'test-role', {'test': 'http://localhost:8080'})
@@ -65,7 +65,8 @@ class DefaultAdvertizerTest(TestCase):
         advertizer.advertise()
 
         # Then
-        sender.send.assert_called_once_with(SERVICE)
+        sender.encode.assert_called_once_with(SERVICE)
+        sender.send_encoded.assert_called_once_with(sender.encode.return_value)
 
     def test_sends_service_when_passed_at_advertise(self):
         # Given
@@ -77,7 +78,8 @@ class DefaultAdvertizerTest(TestCase):
         advertizer.advertise(SERVICE)
 
         # Then
-        sender.send.assert_called_once_with(SERVICE)
+        sender.encode.assert_called_once_with(SERVICE)
+        sender.send_encoded.assert_called_once_with(sender.encode.return_value)
 
     def test_sends_last_service_when_passed_at_start_and_at_advertise(self):
         # Given
@@ -89,7 +91,8 @@ class DefaultAdvertizerTest(TestCase):
         advertizer.advertise(SERVICE)
 
         # Then
-        sender.send.assert_called_once_with(SERVICE)
+        sender.encode.assert_called_once_with(SERVICE)
+        sender.send_encoded.assert_called_once_with(sender.encode.return_value)
 
     def test_does_not_send_service_when_no_service_provided(self):
         # Given
@@ -101,7 +104,7 @@ class DefaultAdvertizerTest(TestCase):
         advertizer.advertise()
 
         # Then
-        sender.send.assert_not_called()
+        sender.send_encoded.assert_not_called()
 
     def test_does_not_send_service_when_not_started(self):
         # Given
@@ -112,7 +115,93 @@ class DefaultAdvertizerTest(TestCase):
         advertizer.advertise(SERVICE)
 
         # Then
-        sender.send.assert_not_called()
+        sender.send_encoded.assert_not_called()
+
+    def test_reuses_encoded_service_when_advertised_repeatedly(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        advertizer = DefaultAdvertizer(sender)
+        advertizer.start(GROUP, SERVICE)
+
+        # When
+        advertizer.advertise()
+        advertizer.advertise(SERVICE)
+        advertizer.advertise(Service(SERVICE.uuid, SERVICE.name, SERVICE.role, dict(SERVICE.urls)))
+
+        # Then
+        sender.encode.assert_called_once_with(SERVICE)
+        self.assertEqual(3, sender.send_encoded.call_count)
+
+    def test_announces_interval_when_set(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        advertizer = DefaultAdvertizer(sender)
+        advertizer.start(GROUP, SERVICE)
+        advertizer.advertise()
+
+        # When
+        advertizer.set_interval(30)
+        advertizer.advertise()
+
+        # Then
+        sender.encode.assert_called_with({**SERVICE.to_dict(), 'interval': 30})
+        self.assertEqual(2, sender.encode.call_count)
+
+    def test_encodes_service_again_when_different_service_advertised(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        advertizer = DefaultAdvertizer(sender)
+        advertizer.start(GROUP, SERVICE)
+        advertizer.advertise()
+        new_service = Service(SERVICE.uuid, SERVICE.name, SERVICE.role, {'test': 'http://localhost:9090'})
+
+        # When
+        advertizer.advertise(new_service)
+
+        # Then
+        sender.encode.assert_called_with(new_service)
+        self.assertEqual(2, sender.encode.call_count)
+
+    def test_does_not_send_service_when_encoding_fails(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        sender.encode.return_value = None
+        advertizer = DefaultAdvertizer(sender)
+        advertizer.start(GROUP, SERVICE)
+
+        # When
+        advertizer.advertise()
+
+        # Then
+        sender.send_encoded.assert_not_called()
+
+    def test_sends_service_through_send_when_sender_does_not_pre_encode(self):
+        # Given
+        sender = SendOnlySender()
+        advertizer = DefaultAdvertizer(sender)
+        advertizer.start(GROUP, SERVICE)
+
+        # When
+        advertizer.advertise()
+        advertizer.advertise()
+
+        # Then
+        self.assertEqual([SERVICE.to_dict(), SERVICE.to_dict()], sender.messages)
+
+
+class SendOnlySender(Sender):
+
+    def __init__(self) -> None:
+        self.messages: list[object] = []
+
+    def start(self, group: PrefixedGroup) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def send(self, data: object) -> None:
+        self.messages.append(data)
 
 
 if __name__ == '__main__':
@@ -1,13 +1,18 @@
+import json
+import time
 import unittest
+from threading import Event, Thread, Timer
 from unittest import TestCase
 from unittest.mock import MagicMock
 from uuid import uuid4
 
+from common_utility import IReusableTimer
 from context_logger import setup_logging
 from test_utility import wait_for_assertion
 
 from hello import Service, Group, ServiceQuery, DefaultDiscoverer, Sender, Receiver, OnDiscoveryEvent, \
-    DiscoveryEventType, DiscoveryEvent
+    DiscoveryEventType, DiscoveryEvent, JsonCodec, Message, ServiceExpiry, UnchangedPolicy, OnDiscoveryDigest, \
+    DiscoveryDigest, OverflowPolicy
 
 GROUP = Group('test-group', 'udp://239.0.0.1:5555')
 SERVICE_QUERY = ServiceQuery('test-.*', 'test-.*')
@@ -158,6 +163,7 @@ class DefaultDiscovererTest(TestCase):
         handler = MagicMock(spec=OnDiscoveryEvent)
         discoverer.register(handler)
         discoverer._handle_message(SERVICE.to_dict())
+        wait_for_assertion(1, lambda: handler.assert_called_once())
         handler.reset_mock()
         new_service = Service(
             SERVICE.uuid,
@@ -186,6 +192,7 @@ class DefaultDiscovererTest(TestCase):
         handler = MagicMock(spec=OnDiscoveryEvent)
         discoverer.register(handler, {DiscoveryEventType.DISCOVERED, DiscoveryEventType.UPDATED})
         discoverer._handle_message(SERVICE.to_dict())
+        wait_for_assertion(1, lambda: handler.assert_called_once())
         handler.reset_mock()
 
         # When
@@ -195,6 +202,283 @@ class DefaultDiscovererTest(TestCase):
         with self.assertRaises(AssertionError):
             wait_for_assertion(0.1, lambda: handler.assert_called())
 
+    def test_does_not_coalesce_discovered_event_with_unchanged_events(self):
+        # Given
+        gate = Event()
+        discoverer = DefaultDiscoverer(MagicMock(spec=Sender), MagicMock(spec=Receiver), max_workers=1, queue_size=1,
+                                       overflow_policy=OverflowPolicy.COALESCE)
+        discoverer.start(GROUP, SERVICE_QUERY)
+        events = []
+        discoverer.register(lambda event: (events.append(event.type), gate.wait(1)))
+        other = Service(uuid4(), 'test-other', 'test-role', {}, {}, '192.168.1.101')
+        discoverer._handle_message(other.to_dict())
+        wait_for_assertion(1, lambda: self.assertEqual(1, len(events)))
+
+        discoverer._handle_message(SERVICE.to_dict())
+        Timer(0.1, gate.set).start()
+
+        # When
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # Then
+        wait_for_assertion(1, lambda: self.assertEqual([DiscoveryEventType.DISCOVERED, DiscoveryEventType.DISCOVERED,
+                                                        DiscoveryEventType.UNCHANGED], events))
+        self.assertEqual(0, discoverer.get_handler_stats().coalesced)
+        discoverer.stop()
+
+    def test_delivers_events_in_order_when_services_handled_concurrently(self):
+        # Given
+        discoverer = DefaultDiscoverer(MagicMock(spec=Sender), MagicMock(spec=Receiver))
+        discoverer.start(GROUP, SERVICE_QUERY)
+        events = []
+        discoverer.register(lambda event: events.append(event.type))
+        discovering = self._delay_notification(discoverer, DiscoveryEventType.DISCOVERED)
+        updated = Service(SERVICE.uuid, SERVICE.name, SERVICE.role, {'test': 'http://localhost:9090'},
+                          SERVICE.info, SERVICE.address)
+        worker = Thread(target=discoverer._handle_message, args=(SERVICE.to_dict(),))
+        worker.start()
+        discovering.wait(1)
+
+        # When
+        discoverer._handle_message(updated.to_dict())
+
+        # Then
+        worker.join(1)
+        wait_for_assertion(1, lambda: self.assertEqual(
+            [DiscoveryEventType.DISCOVERED, DiscoveryEventType.UPDATED], events))
+        discoverer.stop()
+
+    def test_delivers_lost_event_before_rediscovered_event(self):
+        # Given
+        expiry = ServiceExpiry(10, timer=MagicMock(spec=IReusableTimer))
+        discoverer = DefaultDiscoverer(MagicMock(spec=Sender), MagicMock(spec=Receiver), expiry=expiry)
+        discoverer.start(GROUP, SERVICE_QUERY)
+        events = []
+        discoverer.register(lambda event: events.append(event.type))
+        discoverer._handle_message(SERVICE.to_dict())
+        losing = self._delay_notification(discoverer, DiscoveryEventType.LOST)
+        worker = Thread(target=expiry.advance, args=(time.monotonic() + 11,))
+        worker.start()
+        losing.wait(1)
+
+        # When
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # Then
+        worker.join(1)
+        wait_for_assertion(1, lambda: self.assertEqual(
+            [DiscoveryEventType.DISCOVERED, DiscoveryEventType.LOST, DiscoveryEventType.DISCOVERED], events))
+        discoverer.stop()
+
+    def test_handles_remaining_services_when_announced_interval_invalid(self):
+        # Given
+        expiry = ServiceExpiry(10, timer=MagicMock(spec=IReusableTimer))
+        discoverer = DefaultDiscoverer(MagicMock(spec=Sender), MagicMock(spec=Receiver), expiry=expiry)
+        discoverer.start(GROUP, SERVICE_QUERY)
+        other = Service(uuid4(), 'test-other', 'test-role', {}, {}, '192.168.1.101')
+        invalid = json.loads(json.dumps({**SERVICE.to_dict(), 'interval': float('inf')}))
+
+        # When
+        discoverer._handle_messages([invalid, other.to_dict()])
+
+        # Then
+        self.assertEqual({SERVICE.uuid: SERVICE, other.uuid: other}, discoverer.get_services())
+        discoverer.stop()
+
+    def test_removes_service_and_calls_handler_when_service_expires(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        expiry = ServiceExpiry(10, timer=MagicMock(spec=IReusableTimer))
+        discoverer = DefaultDiscoverer(sender, receiver, expiry=expiry)
+        discoverer.start(GROUP, SERVICE_QUERY)
+        handler = MagicMock(spec=OnDiscoveryEvent)
+        discoverer.register(handler, {DiscoveryEventType.LOST})
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # When
+        expiry.advance(time.monotonic() + 11)
+
+        # Then
+        self.assertEqual({}, discoverer.get_services())
+        wait_for_assertion(1, lambda: handler.assert_called_once_with(
+            DiscoveryEvent(GROUP, SERVICE_QUERY, SERVICE, DiscoveryEventType.LOST)
+        ))
+
+    def test_keeps_service_when_refreshed_before_expiry(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        expiry = ServiceExpiry(10, timer=MagicMock(spec=IReusableTimer))
+        discoverer = DefaultDiscoverer(sender, receiver, expiry=expiry)
+        discoverer.start(GROUP, SERVICE_QUERY)
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # When
+        discoverer._handle_message({**SERVICE.to_dict(), 'interval': 60})
+        expiry.advance(time.monotonic() + 11)
+
+        # Then
+        self.assertEqual({SERVICE.uuid: SERVICE}, discoverer.get_services())
+
+    def test_starts_and_stops_expiry_with_discoverer(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        expiry = MagicMock(spec=ServiceExpiry)
+        discoverer = DefaultDiscoverer(sender, receiver, expiry=expiry)
+        discoverer.start(GROUP, SERVICE_QUERY)
+
+        # When
+        discoverer.stop()
+
+        # Then
+        expiry.start.assert_called_once_with(discoverer._handle_expired)
+        expiry.stop.assert_called_once()
+
+    def test_suppresses_unchanged_event_when_policy_is_suppress(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        discoverer = DefaultDiscoverer(sender, receiver, unchanged_policy=UnchangedPolicy.SUPPRESS)
+        discoverer.start(GROUP, SERVICE_QUERY)
+        handler = MagicMock(spec=OnDiscoveryEvent)
+        discoverer.register(handler, {DiscoveryEventType.UNCHANGED})
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # When
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # Then
+        with self.assertRaises(AssertionError):
+            wait_for_assertion(0.1, lambda: handler.assert_called())
+
+    def test_rate_limits_unchanged_events_per_service(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        discoverer = DefaultDiscoverer(sender, receiver, unchanged_policy=UnchangedPolicy.RATE_LIMIT)
+        discoverer.start(GROUP, SERVICE_QUERY)
+        handler = MagicMock(spec=OnDiscoveryEvent)
+        discoverer.register(handler, {DiscoveryEventType.UNCHANGED})
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # When
+        for _ in range(3):
+            discoverer._handle_message(SERVICE.to_dict())
+
+        # Then
+        wait_for_assertion(1, lambda: handler.assert_called_once_with(
+            DiscoveryEvent(GROUP, SERVICE_QUERY, SERVICE, DiscoveryEventType.UNCHANGED)
+        ))
+
+    def test_delivers_digest_of_alive_services_instead_of_unchanged_events(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        discoverer = DefaultDiscoverer(sender, receiver, unchanged_policy=UnchangedPolicy.DIGEST, unchanged_interval=0)
+        discoverer.start(GROUP, SERVICE_QUERY)
+        handler = MagicMock(spec=OnDiscoveryEvent)
+        digest_handler = MagicMock(spec=OnDiscoveryDigest)
+        discoverer.register(handler, {DiscoveryEventType.UNCHANGED})
+        discoverer.register_digest(digest_handler)
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # When
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # Then
+        wait_for_assertion(1, lambda: digest_handler.assert_called_once_with(DiscoveryDigest(GROUP, [SERVICE.uuid])))
+        handler.assert_not_called()
+
+    def test_reuses_cached_service_when_payload_repeats(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        discoverer = DefaultDiscoverer(sender, receiver)
+        discoverer.start(GROUP, SERVICE_QUERY)
+        handler = MagicMock(spec=OnDiscoveryEvent)
+        discoverer.register(handler, {DiscoveryEventType.UNCHANGED})
+        payload = JsonCodec().encode(SERVICE.to_dict())
+        discoverer._handle_message(Message(SERVICE.to_dict(), payload))
+        stored = discoverer.get_services()[SERVICE.uuid]
+
+        # When
+        discoverer._handle_message(Message({}, payload))
+
+        # Then
+        self.assertIs(stored, discoverer.get_services()[SERVICE.uuid])
+        wait_for_assertion(1, lambda: handler.assert_called_once_with(
+            DiscoveryEvent(GROUP, SERVICE_QUERY, SERVICE, DiscoveryEventType.UNCHANGED)
+        ))
+
+    def test_matches_cached_service_again_when_query_changes(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        discoverer = DefaultDiscoverer(sender, receiver)
+        discoverer.start(GROUP, ServiceQuery('other-service', 'test-role'))
+        payload = JsonCodec().encode(SERVICE.to_dict())
+        discoverer._handle_message(Message(SERVICE.to_dict(), payload))
+        discoverer.discover(SERVICE_QUERY)
+
+        # When
+        discoverer._handle_message(Message(SERVICE.to_dict(), payload))
+
+        # Then
+        self.assertEqual({SERVICE.uuid: SERVICE}, discoverer.get_services())
+
+    def test_tags_event_with_all_matching_queries(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        discoverer = DefaultDiscoverer(sender, receiver)
+        other_query = ServiceQuery('.*-service', 'test-role')
+        discoverer.start(GROUP, SERVICE_QUERY)
+        discoverer.add_query(ServiceQuery('other-.*', 'other-.*'))
+        discoverer.add_query(other_query)
+        handler = MagicMock(spec=OnDiscoveryEvent)
+        discoverer.register(handler, {DiscoveryEventType.DISCOVERED})
+
+        # When
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # Then
+        wait_for_assertion(1, lambda: handler.assert_called_once_with(
+            DiscoveryEvent(GROUP, SERVICE_QUERY, SERVICE, DiscoveryEventType.DISCOVERED, [SERVICE_QUERY, other_query])
+        ))
+
+    def test_does_not_match_service_when_query_removed(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        discoverer = DefaultDiscoverer(sender, receiver)
+        discoverer.start(GROUP)
+        discoverer.add_query(SERVICE_QUERY)
+
+        # When
+        discoverer.remove_query(SERVICE_QUERY)
+        discoverer._handle_message(SERVICE.to_dict())
+
+        # Then
+        self.assertEqual([], discoverer.get_queries())
+        self.assertEqual({}, discoverer.get_services())
+
+    def test_sends_all_queries_in_batch_when_discovering(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        discoverer = DefaultDiscoverer(sender, receiver)
+        other_query = ServiceQuery('other-.*', 'other-.*')
+        discoverer.start(GROUP, SERVICE_QUERY)
+        discoverer.add_query(other_query)
+
+        # When
+        discoverer.discover()
+
+        # Then
+        sender.send_batch.assert_called_once_with([SERVICE_QUERY, other_query])
+
     def test_handles_handler_error_gracefully(self):
         # Given
         sender = MagicMock(spec=Sender)
@@ -214,6 +498,32 @@ class DefaultDiscovererTest(TestCase):
             DiscoveryEvent(GROUP, SERVICE_QUERY, SERVICE, DiscoveryEventType.DISCOVERED)
         ))
 
+    def test_caches_all_matching_services_of_batch(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        discoverer = DefaultDiscoverer(sender, receiver)
+        discoverer.start(GROUP, SERVICE_QUERY)
+        other_service = Service(uuid4(), 'test-service2', 'test-role', {}, {}, '192.168.1.101')
+
+        # When
+        discoverer._handle_messages([SERVICE.to_dict(), {'invalid': 'message'}, other_service.to_dict()])
+
+        # Then
+        self.assertEqual({SERVICE.uuid: SERVICE, other_service.uuid: other_service}, discoverer.get_services())
+
+    def test_registers_batch_handler_on_receiver_when_started(self):
+        # Given
+        sender = MagicMock(spec=Sender)
+        receiver = MagicMock(spec=Receiver)
+        discoverer = DefaultDiscoverer(sender, receiver)
+
+        # When
+        discoverer.start(GROUP, SERVICE_QUERY)
+
+        # Then
+        receiver.register_batch.assert_called_once_with(discoverer._handle_messages, discoverer._accepts)
+
     def test_handles_invalid_message_gracefully(self):
         # Given
         sender = MagicMock(spec=Sender)
@@ -326,6 +636,19 @@ class DefaultDiscovererTest(TestCase):
         # Then
         sender.send.assert_not_called()
 
+    def _delay_notification(self, discoverer: DefaultDiscoverer, event_type: DiscoveryEventType) -> Event:
+        notifying = Event()
+        notify = discoverer._notify
+
+        def delayed_notify(event: DiscoveryEvent) -> None:
+            if event.type == event_type and not notifying.is_set():
+                notifying.set()
+                time.sleep(0.1)
+            notify(event)
+
+        discoverer._notify = delayed_notify
+        return notifying
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,17 +1,22 @@
+import time
 import unittest
 from itertools import chain, repeat
+from select import select
+from threading import current_thread
 from unittest import TestCase
 from unittest.mock import MagicMock
 from uuid import uuid4
 
 from context_logger import setup_logging
 from test_utility import wait_for_assertion
-from zmq import Context, ZMQError, Poller, POLLIN
+from zmq import Context, ZMQError, Poller, POLLIN, NOBLOCK, Again
 
-from hello import Service, Group, DishReceiver, OnMessage
+from hello import Service, Group, DishReceiver, OnMessage, OnMessageBatch, JsonCodec, CompactCodec, pack_batch, \
+    fragment_payload, CodecRegistry, pack_header, OverflowPolicy, BoundedExecutor
 
 GROUP = Group('test-group', 'udp://239.0.0.1:5555')
 SERVICE = Service(uuid4(), 'test-service', 'test-role', {'test': 'http://localhost:8080'})
+JSON_CODEC = JsonCodec()
 
 
 class DishReceiverTest(TestCase):
@@ -72,6 +77,25 @@ class DishReceiverTest(TestCase):
         # Then
         context.socket.return_value.close.assert_called_once()
 
+    def test_wakes_up_blocked_receive_loop_when_stopped(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        receiver = DishReceiver(context)
+        receiver._poller = MagicMock(spec=Poller)
+        receiver._poller.poll.side_effect = lambda timeout: [
+            (reader, POLLIN) for reader in select([receiver._wakeup_reader], [], [])[0]
+        ]
+        receiver.start(group)
+        wait_for_assertion(1, lambda: receiver._poller.poll.assert_called_with(timeout=None))
+        start = time.monotonic()
+
+        # When
+        receiver.stop()
+
+        # Then
+        self.assertLess(time.monotonic() - start, 0.5)
+
     def test_raises_error_when_fails_to_close_socket_on_stop(self):
         # Given
         group = GROUP.hello()
@@ -114,7 +138,7 @@ class DishReceiverTest(TestCase):
         # Given
         group = GROUP.hello()
         context = MagicMock(spec=Context)
-        context.socket.return_value.recv_json.return_value = SERVICE.to_dict()
+        context.socket.return_value.recv.side_effect = chain([JSON_CODEC.encode(SERVICE.to_dict())], repeat(Again()))
         handler = MagicMock(spec=OnMessage)
 
         with DishReceiver(context) as receiver:
@@ -132,7 +156,7 @@ class DishReceiverTest(TestCase):
         # Given
         group = GROUP.hello()
         context = MagicMock(spec=Context)
-        context.socket.return_value.recv_json.side_effect = ZMQError(1, "Receive failed")
+        context.socket.return_value.recv.side_effect = ZMQError(1, "Receive failed")
         handler = MagicMock(spec=OnMessage)
 
         with DishReceiver(context) as receiver:
@@ -150,7 +174,7 @@ class DishReceiverTest(TestCase):
         # Given
         group = GROUP.hello()
         context = MagicMock(spec=Context)
-        context.socket.return_value.recv_json.return_value = SERVICE.to_dict()
+        context.socket.return_value.recv.side_effect = chain([JSON_CODEC.encode(SERVICE.to_dict())], repeat(Again()))
         handler = MagicMock(spec=OnMessage)
         handler.side_effect = Exception("Execution failed")
 
@@ -165,6 +189,272 @@ class DishReceiverTest(TestCase):
             # Then
             wait_for_assertion(1, lambda: handler.assert_called_once_with(SERVICE.to_dict()))
 
+    def test_calls_registered_handler_on_message_encoded_with_compact_codec(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        context.socket.return_value.recv.side_effect = chain([CompactCodec().encode(SERVICE.to_dict())],
+                                                             repeat(Again()))
+        handler = MagicMock(spec=OnMessage)
+
+        with DishReceiver(context) as receiver:
+            receiver._poller = MagicMock(spec=Poller)
+            receiver._poller.poll.side_effect = chain([{context.socket.return_value: POLLIN}], repeat({}))
+            receiver.register(handler)
+
+            # When
+            receiver.start(group)
+
+            # Then
+            wait_for_assertion(1, lambda: handler.assert_called_once_with(SERVICE.to_dict()))
+
+    def test_does_not_call_handler_when_message_codec_not_supported(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        context.socket.return_value.recv.side_effect = chain([b'\xff' + JSON_CODEC.encode(SERVICE.to_dict())],
+                                                             repeat(Again()))
+        handler = MagicMock(spec=OnMessage)
+
+        with DishReceiver(context) as receiver:
+            receiver._poller = MagicMock(spec=Poller)
+            receiver._poller.poll.side_effect = chain([{context.socket.return_value: POLLIN}], repeat({}))
+            receiver.register(handler)
+
+            # When
+            receiver.start(group)
+
+            # Then
+            with self.assertRaises(AssertionError):
+                wait_for_assertion(0.1, lambda: handler.assert_called())
+
+    def test_calls_registered_handlers_on_batch_message(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        query = {'name': 'test-.*', 'role': 'test-.*'}
+        context.socket.return_value.recv.side_effect = chain([pack_batch([
+            JSON_CODEC.encode(SERVICE.to_dict()), JSON_CODEC.encode(query)
+        ])], repeat(Again()))
+        handler = MagicMock(spec=OnMessage)
+        batch_handler = MagicMock(spec=OnMessageBatch)
+
+        with DishReceiver(context) as receiver:
+            receiver._poller = MagicMock(spec=Poller)
+            receiver._poller.poll.side_effect = chain([{context.socket.return_value: POLLIN}], repeat({}))
+            receiver.register(handler)
+            receiver.register_batch(batch_handler)
+
+            # When
+            receiver.start(group)
+
+            # Then
+            wait_for_assertion(1, lambda: batch_handler.assert_called_once_with([SERVICE.to_dict(), query]))
+            wait_for_assertion(1, lambda: self.assertEqual(2, handler.call_count))
+
+    def test_calls_registered_handler_on_reassembled_message(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        fragments = fragment_payload(JSON_CODEC.encode(SERVICE.to_dict()), 50)
+        context.socket.return_value.recv.side_effect = chain(fragments, repeat(Again()))
+        handler = MagicMock(spec=OnMessage)
+
+        with DishReceiver(context) as receiver:
+            receiver._poller = MagicMock(spec=Poller)
+            receiver._poller.poll.side_effect = chain([{context.socket.return_value: POLLIN}], repeat({}))
+            receiver.register(handler)
+
+            # When
+            receiver.start(group)
+
+            # Then
+            wait_for_assertion(1, lambda: handler.assert_called_once_with(SERVICE.to_dict()))
+
+    def test_calls_registered_handler_on_message_received_without_copy(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        frame = MagicMock(buffer=memoryview(CompactCodec().encode(SERVICE.to_dict())))
+        context.socket.return_value.recv.side_effect = chain([frame], repeat(Again()))
+        handler = MagicMock(spec=OnMessage)
+
+        with DishReceiver(context, zero_copy=True) as receiver:
+            receiver._poller = MagicMock(spec=Poller)
+            receiver._poller.poll.side_effect = chain([{context.socket.return_value: POLLIN}], repeat({}))
+            receiver.register(handler)
+
+            # When
+            receiver.start(group)
+
+            # Then
+            wait_for_assertion(1, lambda: handler.assert_called_once_with(SERVICE.to_dict()))
+            context.socket.return_value.recv.assert_called_with(NOBLOCK, copy=False)
+
+    def test_does_not_decode_message_when_no_handler_registered(self):
+        # Given
+        context = MagicMock(spec=Context)
+        codecs = MagicMock(spec=CodecRegistry)
+        receiver = DishReceiver(context, codecs=codecs)
+
+        # When
+        receiver._process(JSON_CODEC.encode(SERVICE.to_dict()))
+
+        # Then
+        codecs.decode_all.assert_not_called()
+
+    def test_calls_batch_handler_once_with_all_pending_messages(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        payload = JSON_CODEC.encode(SERVICE.to_dict())
+        context.socket.return_value.recv.side_effect = chain([payload, payload, payload], repeat(Again()))
+        batch_handler = MagicMock(spec=OnMessageBatch)
+
+        with DishReceiver(context) as receiver:
+            receiver._poller = MagicMock(spec=Poller)
+            receiver._poller.poll.side_effect = chain([{context.socket.return_value: POLLIN}], repeat({}))
+            receiver.register_batch(batch_handler)
+
+            # When
+            receiver.start(group)
+
+            # Then
+            wait_for_assertion(1, lambda: batch_handler.assert_called_once_with([SERVICE.to_dict()] * 3))
+
+    def test_drains_at_most_max_batch_messages_per_poll(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        payload = JSON_CODEC.encode(SERVICE.to_dict())
+        context.socket.return_value.recv.side_effect = chain([payload, payload, payload], repeat(Again()))
+        batch_handler = MagicMock(spec=OnMessageBatch)
+
+        with DishReceiver(context, max_batch=2) as receiver:
+            receiver._poller = MagicMock(spec=Poller)
+            receiver._poller.poll.side_effect = chain([{context.socket.return_value: POLLIN}] * 2, repeat({}))
+            receiver.register_batch(batch_handler)
+
+            # When
+            receiver.start(group)
+
+            # Then
+            wait_for_assertion(1, lambda: self.assertEqual(2, batch_handler.call_count))
+            self.assertEqual([SERVICE.to_dict()] * 2, batch_handler.call_args_list[0].args[0])
+            self.assertEqual([SERVICE.to_dict()], batch_handler.call_args_list[1].args[0])
+
+    def test_calls_handlers_on_receive_loop_thread_when_inline(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        context.socket.return_value.recv.side_effect = chain([JSON_CODEC.encode(SERVICE.to_dict())], repeat(Again()))
+        handler = MagicMock(spec=OnMessage)
+        batch_handler = MagicMock(spec=OnMessageBatch)
+        threads = []
+        handler.side_effect = lambda message: threads.append(current_thread())
+        batch_handler.side_effect = lambda messages: threads.append(current_thread())
+
+        with DishReceiver(context, inline=True) as receiver:
+            receiver._poller = MagicMock(spec=Poller)
+            receiver._poller.poll.side_effect = chain([{context.socket.return_value: POLLIN}], repeat({}))
+            receiver.register(handler)
+            receiver.register_batch(batch_handler)
+
+            # When
+            receiver.start(group)
+
+            # Then
+            wait_for_assertion(1, lambda: batch_handler.assert_called_once_with([SERVICE.to_dict()]))
+            handler.assert_called_once_with(SERVICE.to_dict())
+            self.assertIsNone(receiver._handler_executor)
+            self.assertEqual(1, len(set(threads)))
+            self.assertNotEqual(current_thread(), threads[0])
+
+    def test_does_not_decode_message_rejected_by_all_prefilters(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        payload = pack_header('test-service', 'test-role', b'{invalid')
+        context.socket.return_value.recv.side_effect = chain([payload], repeat(Again()))
+        handler = MagicMock(spec=OnMessage)
+        prefilter = MagicMock(return_value=False)
+
+        with DishReceiver(context) as receiver:
+            receiver._poller = MagicMock(spec=Poller)
+            receiver._poller.poll.side_effect = chain([{context.socket.return_value: POLLIN}], repeat({}))
+            receiver.register(handler, prefilter)
+
+            # When
+            receiver.start(group)
+
+            # Then
+            wait_for_assertion(1, lambda: prefilter.assert_called_once_with('test-service', 'test-role'))
+            handler.assert_not_called()
+
+    def test_decodes_message_when_any_handler_has_no_prefilter(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        payload = pack_header('test-service', 'test-role', JSON_CODEC.encode(SERVICE.to_dict()))
+        context.socket.return_value.recv.side_effect = chain([payload], repeat(Again()))
+        handler = MagicMock(spec=OnMessage)
+        batch_handler = MagicMock(spec=OnMessageBatch)
+
+        with DishReceiver(context) as receiver:
+            receiver._poller = MagicMock(spec=Poller)
+            receiver._poller.poll.side_effect = chain([{context.socket.return_value: POLLIN}], repeat({}))
+            receiver.register(handler, lambda name, role: False)
+            receiver.register_batch(batch_handler)
+
+            # When
+            receiver.start(group)
+
+            # Then
+            wait_for_assertion(1, lambda: batch_handler.assert_called_once_with([SERVICE.to_dict()]))
+
+    def test_deregisters_batch_handler(self):
+        # Given
+        context = MagicMock(spec=Context)
+        receiver = DishReceiver(context)
+        handler = MagicMock(spec=OnMessageBatch)
+        receiver.register_batch(handler)
+
+        # When
+        receiver.deregister_batch(handler)
+
+        # Then
+        self.assertNotIn(handler, receiver._batch_handlers)
+
+    def test_coalesces_handler_calls_by_service_uuid(self):
+        # Given
+        context = MagicMock(spec=Context)
+        receiver = DishReceiver(context, overflow_policy=OverflowPolicy.COALESCE)
+        receiver._handler_executor = MagicMock(spec=BoundedExecutor)
+        handler = MagicMock(spec=OnMessage)
+        receiver.register(handler)
+
+        # When
+        receiver._handle_messages([SERVICE.to_dict(), {'name': 'test-service', 'role': 'test-role'}, {'uuid': []}])
+
+        # Then
+        self.assertEqual([(handler, str(SERVICE.uuid)), None, None],
+                         [call.kwargs['key'] for call in receiver._handler_executor.submit.call_args_list])
+
+    def test_calls_handler_for_every_message_when_uuid_not_hashable(self):
+        # Given
+        context = MagicMock(spec=Context)
+        handler = MagicMock(spec=OnMessage)
+
+        with DishReceiver(context, overflow_policy=OverflowPolicy.COALESCE) as receiver:
+            receiver.register(handler)
+
+            # When
+            receiver._handle_messages([{'uuid': []}, SERVICE.to_dict()])
+
+            # Then
+            wait_for_assertion(1, lambda: self.assertEqual(2, handler.call_count))
+            handler.assert_called_with(SERVICE.to_dict())
+
 
 if __name__ == '__main__':
     unittest.main()
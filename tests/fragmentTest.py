@@ -0,0 +1,122 @@
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from hello import Reassembler, fragment_payload, FRAGMENT_TAG, FRAGMENT_HEADER_SIZE
+
+PAYLOAD = bytes(range(256)) * 20
+
+
+class FragmentTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_splits_payload_into_fragments_within_size_limit(self):
+        # When
+        fragments = fragment_payload(PAYLOAD, 1000)
+
+        # Then
+        self.assertEqual(6, len(fragments))
+        for fragment in fragments:
+            self.assertEqual(FRAGMENT_TAG, fragment[0])
+            self.assertLessEqual(len(fragment), 1000)
+
+    def test_raises_error_when_size_limit_too_small(self):
+        # When, Then
+        with self.assertRaises(ValueError):
+            fragment_payload(PAYLOAD, FRAGMENT_HEADER_SIZE)
+
+
+class ReassemblerTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_reassembles_fragments_received_out_of_order(self):
+        # Given
+        reassembler = Reassembler()
+        fragments = list(reversed(fragment_payload(PAYLOAD, 1000)))
+
+        # When
+        results = [reassembler.add(fragment) for fragment in fragments]
+
+        # Then
+        self.assertEqual([None] * (len(fragments) - 1) + [PAYLOAD], results)
+
+    def test_ignores_duplicate_fragments(self):
+        # Given
+        reassembler = Reassembler()
+        fragments = fragment_payload(PAYLOAD, 1000)
+
+        # When
+        reassembler.add(fragments[0])
+        reassembler.add(fragments[0])
+        results = [reassembler.add(fragment) for fragment in fragments[1:]]
+
+        # Then
+        self.assertEqual(PAYLOAD, results[-1])
+
+    def test_reassembles_interleaved_messages(self):
+        # Given
+        reassembler = Reassembler()
+        other_payload = bytes(reversed(PAYLOAD))
+        fragments = fragment_payload(PAYLOAD, 1000)
+        other_fragments = fragment_payload(other_payload, 1000)
+
+        # When
+        results = []
+        for fragment, other_fragment in zip(fragments, other_fragments):
+            results.append(reassembler.add(fragment))
+            results.append(reassembler.add(other_fragment))
+
+        # Then
+        self.assertEqual([PAYLOAD, other_payload], results[-2:])
+
+    def test_drops_oldest_message_when_buffer_full(self):
+        # Given
+        reassembler = Reassembler(max_messages=1)
+        fragments = fragment_payload(PAYLOAD, 1000)
+        other_fragments = fragment_payload(PAYLOAD, 1000)
+        reassembler.add(fragments[0])
+
+        # When
+        reassembler.add(other_fragments[0])
+
+        # Then
+        results = [reassembler.add(fragment) for fragment in fragments[1:]]
+        self.assertEqual([None] * len(results), results)
+
+    def test_drops_message_when_timed_out(self):
+        # Given
+        reassembler = Reassembler(timeout=0)
+        fragments = fragment_payload(PAYLOAD, 1000)
+
+        # When
+        results = [reassembler.add(fragment) for fragment in fragments]
+
+        # Then
+        self.assertEqual([None] * len(fragments), results)
+
+    def test_drops_message_when_too_large(self):
+        # Given
+        reassembler = Reassembler(max_message_size=len(PAYLOAD) - 1)
+
+        # When
+        results = [reassembler.add(fragment) for fragment in fragment_payload(PAYLOAD, 1000)]
+
+        # Then
+        self.assertEqual([None] * len(results), results)
+
+
+if __name__ == '__main__':
+    unittest.main()
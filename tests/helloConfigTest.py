@@ -0,0 +1,52 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+from zmq import Context
+
+from hello import HelloConfig, Hello, Group
+
+GROUP = Group('test-group', 'udp://239.0.0.1:5555')
+
+
+class HelloConfigTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_closes_pooled_sockets_when_closed(self):
+        # Given
+        context = MagicMock(spec=Context)
+        config = HelloConfig(context, advertizer_responder=False)
+        advertizer = Hello.default_advertizer(config)
+        advertizer.start(GROUP)
+        advertizer.stop()
+
+        # When
+        config.close()
+
+        # Then
+        context.socket.return_value.close.assert_called_once()
+
+    def test_closes_pooled_sockets_on_exit(self):
+        # Given
+        context = MagicMock(spec=Context)
+
+        with HelloConfig(context, advertizer_responder=False) as config:
+            advertizer = Hello.default_advertizer(config)
+            advertizer.start(GROUP)
+            advertizer.stop()
+
+            # When
+
+        # Then
+        context.socket.return_value.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+from test_utility import wait_for_assertion
+
+from hello import TokenBucket, GroupTokenBuckets, Throttle, ThrottlePolicy, ThrottleStats, OnPayload
+
+
+class TokenBucketTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_allows_burst_then_rejects(self):
+        # Given
+        bucket = TokenBucket(rate=0.001, burst=3)
+
+        # When
+        results = [bucket.try_acquire() for _ in range(4)]
+
+        # Then
+        self.assertEqual([True, True, True, False], results)
+
+    def test_refills_tokens_over_time(self):
+        # Given
+        bucket = TokenBucket(rate=100, burst=1)
+        bucket.try_acquire()
+
+        # When, Then
+        wait_for_assertion(1, lambda: self.assertTrue(bucket.try_acquire()))
+
+    def test_returns_wait_time_until_tokens_available(self):
+        # Given
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.try_acquire()
+
+        # When
+        result = bucket.get_wait_time()
+
+        # Then
+        self.assertGreater(result, 0.9)
+        self.assertLessEqual(result, 1)
+
+    def test_shares_bucket_per_group(self):
+        # Given
+        group_buckets = GroupTokenBuckets(rate=1, burst=1)
+
+        # When
+        bucket1 = group_buckets.get('hello:test-group')
+        bucket2 = group_buckets.get('hello:test-group')
+        bucket3 = group_buckets.get('query:test-group')
+
+        # Then
+        self.assertIs(bucket1, bucket2)
+        self.assertIsNot(bucket1, bucket3)
+
+
+class ThrottleTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_sends_immediately_when_tokens_available(self):
+        # Given
+        send = MagicMock(spec=OnPayload)
+        throttle = Throttle(TokenBucket(rate=1, burst=2))
+        throttle.start('hello:test-group', send)
+
+        # When
+        throttle.submit(b'message1')
+        throttle.submit(b'message2')
+
+        # Then
+        self.assertEqual([b'message1', b'message2'], [call.args[0] for call in send.call_args_list])
+        self.assertEqual(ThrottleStats(sent=2), throttle.get_stats())
+        throttle.stop()
+
+    def test_drops_messages_when_rate_exceeded_with_drop_policy(self):
+        # Given
+        send = MagicMock(spec=OnPayload)
+        throttle = Throttle(TokenBucket(rate=0.001, burst=1), policy=ThrottlePolicy.DROP)
+        throttle.start('hello:test-group', send)
+
+        # When
+        throttle.submit(b'message1')
+        throttle.submit(b'message2')
+
+        # Then
+        send.assert_called_once_with(b'message1')
+        self.assertEqual(ThrottleStats(sent=1, dropped=1), throttle.get_stats())
+        throttle.stop()
+
+    def test_sends_queued_messages_when_tokens_refilled(self):
+        # Given
+        send = MagicMock(spec=OnPayload)
+        throttle = Throttle(TokenBucket(rate=50, burst=1), policy=ThrottlePolicy.QUEUE)
+        throttle.start('hello:test-group', send)
+
+        # When
+        for index in range(3):
+            throttle.submit(f'message{index}'.encode())
+
+        # Then
+        wait_for_assertion(1, lambda: self.assertEqual(3, send.call_count))
+        self.assertEqual([b'message0', b'message1', b'message2'], [call.args[0] for call in send.call_args_list])
+        self.assertEqual(ThrottleStats(sent=3, queued=2), throttle.get_stats())
+        throttle.stop()
+
+    def test_coalesces_identical_queued_messages(self):
+        # Given
+        send = MagicMock(spec=OnPayload)
+        throttle = Throttle(TokenBucket(rate=50, burst=1), policy=ThrottlePolicy.COALESCE)
+        throttle.start('hello:test-group', send)
+
+        # When
+        for _ in range(5):
+            throttle.submit(b'message')
+
+        # Then
+        wait_for_assertion(1, lambda: self.assertEqual(2, send.call_count))
+        self.assertEqual(ThrottleStats(sent=2, queued=1, coalesced=3), throttle.get_stats())
+        throttle.stop()
+
+    def test_drops_oldest_message_when_queue_full(self):
+        # Given
+        send = MagicMock(spec=OnPayload)
+        throttle = Throttle(TokenBucket(rate=0.001, burst=1), max_queue_size=1)
+        throttle.start('hello:test-group', send)
+
+        # When
+        throttle.submit(b'message1')
+        throttle.submit(b'message2')
+        throttle.submit(b'message3')
+        throttle.stop()
+
+        # Then
+        send.assert_called_once_with(b'message1')
+        self.assertEqual(ThrottleStats(sent=1, queued=2, dropped=2), throttle.get_stats())
+
+    def test_limits_senders_sharing_group_bucket(self):
+        # Given
+        send1 = MagicMock(spec=OnPayload)
+        send2 = MagicMock(spec=OnPayload)
+        group_buckets = GroupTokenBuckets(rate=0.001, burst=1)
+        throttle1 = Throttle(group_buckets=group_buckets, policy=ThrottlePolicy.DROP)
+        throttle2 = Throttle(group_buckets=group_buckets, policy=ThrottlePolicy.DROP)
+        throttle1.start('hello:test-group', send1)
+        throttle2.start('hello:test-group', send2)
+
+        # When
+        throttle1.submit(b'message1')
+        throttle2.submit(b'message2')
+
+        # Then
+        send1.assert_called_once_with(b'message1')
+        send2.assert_not_called()
+        throttle1.stop()
+        throttle2.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
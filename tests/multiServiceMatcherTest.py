@@ -0,0 +1,129 @@
+import unittest
+from unittest import TestCase
+from uuid import uuid4
+
+from context_logger import setup_logging
+
+from hello import Service, ServiceQuery, MultiServiceMatcher, ServiceMatcherCache
+
+CAMERAS = ServiceQuery('camera-.*', '.*')
+SENSORS = ServiceQuery('sensor-.*', 'sensor')
+OUTDOOR = ServiceQuery('.*-outdoor', 'camera|sensor')
+
+
+class MultiServiceMatcherTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_returns_all_matching_queries_in_order(self):
+        # Given
+        matcher = MultiServiceMatcher([CAMERAS, SENSORS, OUTDOOR])
+
+        # When
+        result = matcher.match(Service(uuid4(), 'camera-outdoor', 'camera'))
+
+        # Then
+        self.assertEqual([CAMERAS, OUTDOOR], result)
+
+    def test_returns_no_queries_when_none_matching(self):
+        # Given
+        matcher = MultiServiceMatcher([CAMERAS, SENSORS, OUTDOOR])
+
+        # When
+        result = matcher.match_values('printer-1', 'printer')
+
+        # Then
+        self.assertEqual([], result)
+        self.assertFalse(matcher.matches_values('printer-1', 'printer'))
+
+    def test_requires_name_and_role_of_same_query_to_match(self):
+        # Given
+        matcher = MultiServiceMatcher([CAMERAS, SENSORS])
+
+        # When
+        result = matcher.matches_values('sensor-1', 'camera')
+
+        # Then
+        self.assertFalse(result)
+
+    def test_matches_patterns_with_groups_and_flags(self):
+        # Given
+        matcher = MultiServiceMatcher([ServiceQuery('(?i)CAMERA-.*', '.*'), ServiceQuery(r'(\w)\1-.*', '.*')])
+
+        # When
+        result = [matcher.matches_values(name, 'any') for name in ['camera-1', 'aa-1', 'ab-1']]
+
+        # Then
+        self.assertEqual([True, True, False], result)
+
+
+class ServiceMatcherCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_reuses_compiled_matcher_and_result_for_same_service(self):
+        # Given
+        cache = ServiceMatcherCache()
+        service = Service(uuid4(), 'camera-1', 'camera')
+        cache.matches(ServiceQuery('camera-.*', '.*'), service)
+        entry = cache._entries[('camera-.*', '.*')]
+
+        # When
+        result = cache.matches(ServiceQuery('camera-.*', '.*'), service)
+
+        # Then
+        self.assertTrue(result)
+        self.assertIs(entry, cache._entries[('camera-.*', '.*')])
+
+    def test_matches_again_when_service_changes(self):
+        # Given
+        cache = ServiceMatcherCache()
+        cache.matches(CAMERAS, Service(uuid4(), 'camera-1', 'camera'))
+        matcher = cache._entries[(CAMERAS.name, CAMERAS.role)][0]
+
+        # When
+        result = cache.matches(CAMERAS, Service(uuid4(), 'sensor-1', 'sensor'))
+
+        # Then
+        self.assertFalse(result)
+        self.assertIs(matcher, cache._entries[(CAMERAS.name, CAMERAS.role)][0])
+
+    def test_evicts_least_recently_used_matcher(self):
+        # Given
+        cache = ServiceMatcherCache(2)
+        service = Service(uuid4(), 'camera-1', 'camera')
+        cache.matches(CAMERAS, service)
+        cache.matches(SENSORS, service)
+        cache.matches(CAMERAS, service)
+
+        # When
+        cache.matches(OUTDOOR, service)
+
+        # Then
+        self.assertEqual(2, len(cache))
+        self.assertNotIn((SENSORS.name, SENSORS.role), cache._entries)
+
+    def test_does_not_cache_when_disabled(self):
+        # Given
+        cache = ServiceMatcherCache(0)
+
+        # When
+        result = cache.matches(CAMERAS, Service(uuid4(), 'camera-1', 'camera'))
+
+        # Then
+        self.assertTrue(result)
+        self.assertEqual(0, len(cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
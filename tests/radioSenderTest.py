@@ -7,12 +7,14 @@ from uuid import uuid4
 from context_logger import setup_logging
 from zmq import Context, ZMQError
 
-from hello import Service, Group, ServiceQuery
+from hello import Service, Group, ServiceQuery, JsonCodec, CompactCodec, Compressor, Reassembler, pack_batch, \
+    FRAGMENT_TAG, Throttle, TokenBucket, ThrottlePolicy, ThrottleStats, SocketPool, pack_header
 from hello.sender import RadioSender
 
 GROUP = Group('test-group', 'udp://239.0.0.1:5555')
 SERVICE = Service(uuid4(), 'test-service', 'test-role', {'test': 'http://localhost:8080'})
 SERVICE_QUERY = ServiceQuery('test-service', 'test-role')
+JSON_CODEC = JsonCodec()
 
 
 class RadioSenderTest(TestCase):
@@ -72,6 +74,43 @@ class RadioSenderTest(TestCase):
         # Then
         context.socket.return_value.close.assert_called_once()
 
+    def test_sends_message_when_restarted_after_stop(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        sender = RadioSender(context)
+        sender.start(group)
+        sender.stop()
+
+        # When
+        sender.start(group)
+        sender.send(SERVICE)
+
+        # Then
+        self.assertEqual(2, context.socket.call_count)
+        context.socket.return_value.send.assert_called_once_with(
+            JSON_CODEC.encode(SERVICE.to_dict()), group='hello:test-group'
+        )
+
+    def test_keeps_pooled_socket_open_when_stopped(self):
+        # Given
+        context = MagicMock(spec=Context)
+        pool = SocketPool(context)
+        sender1 = RadioSender(context, pool=pool)
+        sender2 = RadioSender(context, pool=pool)
+        sender1.start(GROUP.hello())
+        sender2.start(GROUP.query())
+
+        # When
+        sender1.stop()
+        sender2.stop()
+        sender1.start(GROUP.hello())
+
+        # Then
+        context.socket.assert_called_once()
+        context.socket.return_value.connect.assert_called_once_with(GROUP.url)
+        context.socket.return_value.close.assert_not_called()
+
     def test_raises_error_when_fails_to_close_socket_on_stop(self):
         # Given
         group = GROUP.hello()
@@ -95,7 +134,9 @@ class RadioSenderTest(TestCase):
         sender.send(SERVICE_QUERY)
 
         # Then
-        context.socket.return_value.send_json.assert_called_with(SERVICE_QUERY.__dict__, group='hello:test-group')
+        context.socket.return_value.send.assert_called_with(
+            JSON_CODEC.encode(SERVICE_QUERY.__dict__), group='hello:test-group'
+        )
 
     def test_sends_message_when_convertible_to_dict_with_to_dict(self):
         # Given
@@ -108,7 +149,9 @@ class RadioSenderTest(TestCase):
         sender.send(SERVICE)
 
         # Then
-        context.socket.return_value.send_json.assert_called_with(SERVICE.to_dict(), group='hello:test-group')
+        context.socket.return_value.send.assert_called_with(
+            JSON_CODEC.encode(SERVICE.to_dict()), group='hello:test-group'
+        )
 
     def test_sends_message_when_convertible_to_dict_with_as_dict(self):
         # Given
@@ -128,7 +171,9 @@ class RadioSenderTest(TestCase):
         sender.send(data)
 
         # Then
-        context.socket.return_value.send_json.assert_called_with(data.as_dict(), group='hello:test-group')
+        context.socket.return_value.send.assert_called_with(
+            JSON_CODEC.encode(data.as_dict()), group='hello:test-group'
+        )
 
     def test_sends_message_when_type_is_dict(self):
         # Given
@@ -141,7 +186,9 @@ class RadioSenderTest(TestCase):
         sender.send(SERVICE.to_dict())
 
         # Then
-        context.socket.return_value.send_json.assert_called_with(SERVICE.to_dict(), group='hello:test-group')
+        context.socket.return_value.send.assert_called_with(
+            JSON_CODEC.encode(SERVICE.to_dict()), group='hello:test-group'
+        )
 
     def test_does_not_send_message_when_not_serializable(self):
         # Given
@@ -154,7 +201,7 @@ class RadioSenderTest(TestCase):
         sender.send("not serializable message")
 
         # Then
-        context.socket.return_value.send_json.assert_not_called()
+        context.socket.return_value.send.assert_not_called()
 
     def test_does_not_send_message_when_not_started(self):
         # Given
@@ -165,7 +212,7 @@ class RadioSenderTest(TestCase):
         sender.send(SERVICE)
 
         # Then
-        context.socket.return_value.send_json.assert_not_called()
+        context.socket.return_value.send.assert_not_called()
 
     def test_handles_send_message_error_gracefully(self):
         # Given
@@ -173,13 +220,193 @@ class RadioSenderTest(TestCase):
         context = MagicMock(spec=Context)
         sender = RadioSender(context)
         sender.start(group)
-        context.socket.return_value.send_json.side_effect = ZMQError(1, "Send failed")
+        context.socket.return_value.send.side_effect = ZMQError(1, "Send failed")
+
+        # When
+        sender.send(SERVICE)
+
+        # Then
+        context.socket.return_value.send.assert_called_once_with(
+            JSON_CODEC.encode(SERVICE.to_dict()), group='hello:test-group'
+        )
+
+    def test_sends_message_encoded_with_configured_codec(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        codec = CompactCodec()
+        sender = RadioSender(context, codec)
+        sender.start(group)
+
+        # When
+        sender.send(SERVICE)
+
+        # Then
+        context.socket.return_value.send.assert_called_once_with(
+            codec.encode(SERVICE.to_dict()), group='hello:test-group'
+        )
+
+    def test_encodes_message_with_configured_codec(self):
+        # Given
+        context = MagicMock(spec=Context)
+        codec = CompactCodec()
+        sender = RadioSender(context, codec)
+
+        # When
+        result = sender.encode(SERVICE)
+
+        # Then
+        self.assertEqual(codec.encode(SERVICE.to_dict()), result)
+
+    def test_returns_none_when_message_not_encodable(self):
+        # Given
+        context = MagicMock(spec=Context)
+        sender = RadioSender(context)
+
+        # When
+        result = sender.encode("not serializable message")
+
+        # Then
+        self.assertIsNone(result)
+
+    def test_sends_encoded_message(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        sender = RadioSender(context)
+        sender.start(group)
+        payload = sender.encode(SERVICE)
+
+        # When
+        sender.send_encoded(payload)
+
+        # Then
+        context.socket.return_value.send.assert_called_once_with(payload, group='hello:test-group')
+
+    def test_does_not_send_encoded_message_when_not_started(self):
+        # Given
+        context = MagicMock(spec=Context)
+        sender = RadioSender(context)
 
         # When
+        sender.send_encoded(JSON_CODEC.encode(SERVICE.to_dict()))
+
+        # Then
+        context.socket.return_value.send.assert_not_called()
+
+    def test_sends_batch_in_single_datagram(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        sender = RadioSender(context)
+        sender.start(group)
+
+        # When
+        sender.send_batch([SERVICE, SERVICE_QUERY])
+
+        # Then
+        context.socket.return_value.send.assert_called_once_with(pack_batch([
+            JSON_CODEC.encode(SERVICE.to_dict()), JSON_CODEC.encode(SERVICE_QUERY.__dict__)
+        ]), group='hello:test-group')
+
+    def test_sends_batch_in_multiple_datagrams_when_exceeds_datagram_size(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        payload = JSON_CODEC.encode(SERVICE.to_dict())
+        sender = RadioSender(context, max_datagram_size=len(payload) * 2 + len(group.name) + 1)
+        sender.start(group)
+
+        # When
+        sender.send_batch([SERVICE, SERVICE, SERVICE])
+
+        # Then
+        send = context.socket.return_value.send
+        self.assertEqual(3, send.call_count)
+        send.assert_called_with(payload, group='hello:test-group')
+
+    def test_skips_unsupported_items_when_sending_batch(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        sender = RadioSender(context)
+        sender.start(group)
+
+        # When
+        sender.send_batch(["not serializable message", SERVICE])
+
+        # Then
+        context.socket.return_value.send.assert_called_once_with(
+            JSON_CODEC.encode(SERVICE.to_dict()), group='hello:test-group'
+        )
+
+    def test_sends_message_in_fragments_when_exceeds_datagram_size(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        service = Service(SERVICE.uuid, SERVICE.name, SERVICE.role, SERVICE.urls, {'data': 'x' * 2000})
+        sender = RadioSender(context, max_datagram_size=500)
+        sender.start(group)
+
+        # When
+        sender.send(service)
+
+        # Then
+        datagrams = [call.args[0] for call in context.socket.return_value.send.call_args_list]
+        self.assertEqual(5, len(datagrams))
+        self.assertTrue(all(datagram[0] == FRAGMENT_TAG for datagram in datagrams))
+        reassembler = Reassembler()
+        results = [reassembler.add(datagram) for datagram in datagrams]
+        self.assertEqual(JSON_CODEC.encode(service.to_dict()), results[-1])
+
+    def test_sends_compressed_message_when_compressor_configured(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        compressor = Compressor(threshold=0)
+        sender = RadioSender(context, compressor=compressor)
+        sender.start(group)
+
+        # When
+        sender.send(SERVICE)
+
+        # Then
+        context.socket.return_value.send.assert_called_once_with(
+            compressor.compress(JSON_CODEC.encode(SERVICE.to_dict())), group='hello:test-group'
+        )
+
+    def test_sends_message_with_name_and_role_header_when_enabled(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        sender = RadioSender(context, header=True)
+        sender.start(group)
+
+        # When
+        sender.send(SERVICE)
+
+        # Then
+        context.socket.return_value.send.assert_called_once_with(
+            pack_header('test-service', 'test-role', JSON_CODEC.encode(SERVICE.to_dict())), group='hello:test-group'
+        )
+
+    def test_drops_message_when_rate_limit_exceeded(self):
+        # Given
+        group = GROUP.hello()
+        context = MagicMock(spec=Context)
+        throttle = Throttle(TokenBucket(rate=0.001, burst=1), policy=ThrottlePolicy.DROP)
+        sender = RadioSender(context, throttle=throttle)
+        sender.start(group)
+
+        # When
+        sender.send(SERVICE)
         sender.send(SERVICE)
 
         # Then
-        context.socket.return_value.send_json.assert_called_once_with(SERVICE.to_dict(), group='hello:test-group')
+        context.socket.return_value.send.assert_called_once_with(
+            JSON_CODEC.encode(SERVICE.to_dict()), group='hello:test-group'
+        )
+        self.assertEqual(ThrottleStats(sent=1, dropped=1), sender.get_throttle_stats())
 
 
 if __name__ == '__main__':
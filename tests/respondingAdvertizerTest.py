@@ -72,7 +72,8 @@ class RespondingAdvertizerTest(TestCase):
         advertizer._handle_message(ServiceQuery('test-.*', 'test-.*').__dict__)
 
         # Then
-        sender.send.assert_called_once_with(SERVICE)
+        sender.encode.assert_called_once_with(SERVICE)
+        sender.send_encoded.assert_called_once_with(sender.encode.return_value)
 
     def test_does_not_send_service_when_receives_non_matching_query(self):
         # Given
@@ -85,7 +86,7 @@ class RespondingAdvertizerTest(TestCase):
         advertizer._handle_message(ServiceQuery('other-.*', 'test-.*').__dict__)
 
         # Then
-        sender.send.assert_not_called()
+        sender.send_encoded.assert_not_called()
 
     def test_does_not_send_service_when_no_service_set(self):
         # Given
@@ -98,7 +99,7 @@ class RespondingAdvertizerTest(TestCase):
         advertizer._handle_message(ServiceQuery('test-.*', 'test-.*').__dict__)
 
         # Then
-        sender.send.assert_not_called()
+        sender.send_encoded.assert_not_called()
 
     def test_handles_invalid_message_gracefully(self):
         # Given
@@ -111,7 +112,7 @@ class RespondingAdvertizerTest(TestCase):
         advertizer._handle_message({'invalid': 'message'})
 
         # Then
-        sender.send.assert_not_called()
+        sender.send_encoded.assert_not_called()
 
 
 if __name__ == '__main__':
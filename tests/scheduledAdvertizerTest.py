@@ -106,6 +106,20 @@ class ScheduledAdvertizerTest(TestCase):
 
         # Then
         timer.start.assert_called_once_with(60, scheduled_advertizer._execute_and_restart, [SERVICE])
+        advertizer.set_interval.assert_called_once_with(60)
+
+    def test_schedules_periodic_advertise_when_advertizer_does_not_announce_interval(self):
+        # Given
+        advertizer = AdvertiseOnlyAdvertizer()
+        timer = MagicMock(spec=IReusableTimer)
+        scheduled_advertizer = ScheduledAdvertizer(advertizer, timer)
+        scheduled_advertizer.start(GROUP)
+
+        # When
+        scheduled_advertizer.schedule_periodic(SERVICE, 60)
+
+        # Then
+        timer.start.assert_called_once_with(60, scheduled_advertizer._execute_and_restart, [SERVICE])
 
     def test_execute_and_restart_calls_advertise_and_restarts_timer(self):
         # Given
@@ -122,5 +136,17 @@ class ScheduledAdvertizerTest(TestCase):
         timer.restart.assert_called_once()
 
 
+class AdvertiseOnlyAdvertizer(Advertizer):
+
+    def start(self, group: Group, service: Service | None = None) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def advertise(self, service: Service | None = None, log_level: int = INFO) -> None:
+        pass
+
+
 if __name__ == '__main__':
     unittest.main()
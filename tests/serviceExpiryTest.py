@@ -0,0 +1,151 @@
+import time
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+from common_utility import IReusableTimer
+from context_logger import setup_logging
+
+from hello import TimingWheel, ServiceExpiry, OnServicesExpired, MAX_ANNOUNCED_INTERVAL
+
+
+class TimingWheelTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_expires_key_when_timeout_elapsed(self):
+        # Given
+        wheel = TimingWheel[str](now=0)
+        wheel.schedule('service', 5, now=0)
+
+        # When
+        early = wheel.advance(4)
+        expired = wheel.advance(5)
+
+        # Then
+        self.assertEqual([], early)
+        self.assertEqual(['service'], expired)
+        self.assertEqual(0, len(wheel))
+
+    def test_postpones_expiry_when_rescheduled(self):
+        # Given
+        wheel = TimingWheel[str](now=0)
+        wheel.schedule('service', 5, now=0)
+
+        # When
+        wheel.schedule('service', 5, now=4)
+
+        # Then
+        self.assertEqual([], wheel.advance(8))
+        self.assertEqual(['service'], wheel.advance(9))
+
+    def test_does_not_expire_cancelled_key(self):
+        # Given
+        wheel = TimingWheel[str](now=0)
+        wheel.schedule('service', 5, now=0)
+
+        # When
+        wheel.cancel('service')
+
+        # Then
+        self.assertNotIn('service', wheel)
+        self.assertEqual([], wheel.advance(10))
+
+    def test_cascades_long_timeouts_to_exact_tick(self):
+        # Given
+        wheel = TimingWheel[int](wheel_size=4, levels=2, now=0)
+        for timeout in [3, 4, 15, 16, 17, 40]:
+            wheel.schedule(timeout, timeout, now=0)
+
+        # When
+        expired = {tick: wheel.advance(tick) for tick in range(1, 41)}
+
+        # Then
+        self.assertEqual({3: [3], 4: [4], 15: [15], 16: [16], 17: [17], 40: [40]},
+                         {tick: keys for tick, keys in expired.items() if keys})
+
+    def test_raises_error_when_configuration_invalid(self):
+        # When, Then
+        with self.assertRaises(ValueError):
+            TimingWheel(wheel_size=1)
+
+
+class ServiceExpiryTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_calls_handler_with_expired_services(self):
+        # Given
+        timer = MagicMock(spec=IReusableTimer)
+        handler = MagicMock(spec=OnServicesExpired)
+        expiry = ServiceExpiry(10, timer=timer)
+        expiry.start(handler)
+        uuid = uuid4()
+        now = time.monotonic()
+        expiry.refresh(uuid, now=now)
+
+        # When
+        expiry.advance(now + 11)
+
+        # Then
+        handler.assert_called_once_with([uuid])
+
+    def test_derives_ttl_from_announced_interval(self):
+        # Given
+        expiry = ServiceExpiry(10, 3, timer=MagicMock(spec=IReusableTimer))
+
+        # When
+        result = expiry.get_ttl(60)
+
+        # Then
+        self.assertEqual(180, result)
+        self.assertEqual(10, expiry.get_ttl(None))
+        self.assertEqual(10, ServiceExpiry(10, None, timer=MagicMock(spec=IReusableTimer)).get_ttl(60))
+
+    def test_ignores_invalid_announced_interval(self):
+        # Given
+        expiry = ServiceExpiry(10, 3, timer=MagicMock(spec=IReusableTimer))
+
+        # When
+        result = [expiry.get_ttl(interval) for interval in [float('inf'), float('nan'), -60, 0, True, '60']]
+
+        # Then
+        self.assertEqual([10] * 6, result)
+
+    def test_clamps_announced_interval(self):
+        # Given
+        expiry = ServiceExpiry(10, 3, timer=MagicMock(spec=IReusableTimer))
+
+        # When
+        result = expiry.get_ttl(1e300)
+
+        # Then
+        self.assertEqual(MAX_ANNOUNCED_INTERVAL * 3, result)
+
+    def test_advances_and_restarts_timer_when_ticked(self):
+        # Given
+        timer = MagicMock(spec=IReusableTimer)
+        expiry = ServiceExpiry(10, timer=timer, tick=0.5)
+
+        # When
+        expiry.start(MagicMock(spec=OnServicesExpired))
+        expiry._advance_and_restart()
+
+        # Then
+        timer.start.assert_called_once_with(0.5, expiry._advance_and_restart)
+        timer.restart.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
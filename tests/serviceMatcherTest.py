@@ -0,0 +1,60 @@
+import re
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from hello import ServiceQuery, ServiceMatcher
+from hello.service import _compile_simple
+
+PATTERNS = ['', '.*', '.+', '^camera', 'camera', 'camera$', 'camera\\Z', 'camera-.*', 'camera-.+', 'camera\\.1',
+            'camera\\\\', 'camera.*\\Z', 'cam.ra', 'camera|sensor', 'camera-\\d+']
+VALUES = ['', '\n', 'camera', 'camera\n', 'camera-1', 'camera-\n', 'camera.1', 'camera\\', 'camXra', 'sensor']
+
+
+class ServiceMatcherTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_matches_like_regex_for_all_patterns(self):
+        for pattern in PATTERNS:
+            # Given
+            matcher = ServiceMatcher(ServiceQuery(pattern, pattern))
+
+            # When
+            result = [matcher.matches_name(value) for value in VALUES]
+
+            # Then
+            self.assertEqual([re.match(pattern, value) is not None for value in VALUES], result, pattern)
+
+    def test_uses_string_operations_for_simple_patterns(self):
+        # When
+        result = [pattern for pattern in PATTERNS if _compile_simple(pattern) is None]
+
+        # Then
+        self.assertEqual(['camera.*\\Z', 'cam.ra', 'camera|sensor', 'camera-\\d+'], result)
+
+    def test_matches_glob_query(self):
+        # Given
+        matcher = ServiceMatcher(ServiceQuery.glob('camera-*', '*'))
+
+        # When
+        result = [matcher.matches_values(name, 'camera') for name in ['camera-1', 'camera-', 'camera', 'my-camera-1']]
+
+        # Then
+        self.assertEqual([True, True, False, False], result)
+        self.assertIsNotNone(_compile_simple(matcher.query.name))
+
+    def test_raises_error_when_pattern_invalid(self):
+        # When, Then
+        with self.assertRaises(re.error):
+            ServiceMatcher(ServiceQuery('camera-(', '.*'))
+
+
+if __name__ == '__main__':
+    unittest.main()
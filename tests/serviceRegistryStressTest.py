@@ -0,0 +1,94 @@
+import random
+import unittest
+from threading import Barrier, Thread
+from unittest import TestCase
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+from context_logger import setup_logging
+from test_utility import wait_for_assertion
+
+from hello import Service, ServiceRegistry, DefaultDiscoverer, Sender, Receiver, Group, ServiceQuery, \
+    OnDiscoveryEvent, DiscoveryEventType
+
+THREADS = 16
+ITERATIONS = 2000
+UUIDS = [uuid4() for _ in range(32)]
+
+
+class ServiceRegistryStressTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'INFO', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_keeps_indexes_consistent_under_concurrent_updates(self):
+        # Given
+        registry = ServiceRegistry(['site'], stripes=4)
+
+        def hammer(seed: int) -> None:
+            rng = random.Random(seed)
+            for _ in range(ITERATIONS):
+                uuid = rng.choice(UUIDS)
+                operation = rng.random()
+                if operation < 0.7:
+                    registry.put(_create_service(uuid, rng.randrange(3)))
+                elif operation < 0.8:
+                    registry.remove(uuid)
+                elif operation < 0.9:
+                    registry.find(role='camera', site='site-1')
+                else:
+                    registry.snapshot()
+
+        # When
+        _run_concurrently(hammer)
+
+        # Then
+        services = registry.to_dict()
+        for index, field in [(registry._names, 'name'), (registry._roles, 'role'), (registry._addresses, 'address')]:
+            self.assertEqual({uuid for uuids in index.values() for uuid in uuids}, set(services))
+            for value, uuids in index.items():
+                self.assertTrue(all(getattr(services[uuid], field) == value for uuid in uuids))
+        for value, uuids in registry._info['site'].items():
+            self.assertTrue(all(services[uuid].info['site'] == value for uuid in uuids))
+        self.assertEqual(services, dict(registry.snapshot()))
+
+    def test_emits_single_discovered_event_when_same_service_received_concurrently(self):
+        # Given
+        discoverer = DefaultDiscoverer(MagicMock(spec=Sender), MagicMock(spec=Receiver))
+        discoverer.start(Group('test-group', 'udp://239.0.0.1:5555'), ServiceQuery('camera-.*', 'camera'))
+        handler = MagicMock(spec=OnDiscoveryEvent)
+        discoverer.register(handler, {DiscoveryEventType.DISCOVERED})
+        message = _create_service(UUIDS[0], 0).to_dict()
+
+        # When
+        _run_concurrently(lambda _: discoverer._handle_message(dict(message)))
+
+        # Then
+        wait_for_assertion(1, lambda: handler.assert_called_once())
+        discoverer.stop()
+
+
+def _create_service(uuid, variant: int) -> Service:
+    return Service(uuid, f'camera-{variant}', 'camera', {}, {'site': f'site-{variant}'}, f'192.168.1.{variant}')
+
+
+def _run_concurrently(function) -> None:
+    barrier = Barrier(THREADS)
+
+    def run(seed: int) -> None:
+        barrier.wait()
+        function(seed)
+
+    threads = [Thread(target=run, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,220 @@
+import unittest
+from threading import Thread
+from unittest import TestCase
+from uuid import uuid4
+
+from context_logger import setup_logging
+
+from hello import Service, ServiceQuery, ServiceRegistry, SnapshotDiff
+
+CAMERA1 = Service(uuid4(), 'camera-1', 'camera', {}, {'site': 'site-a', 'tags': ['outdoor']}, '192.168.1.1')
+CAMERA2 = Service(uuid4(), 'camera-2', 'camera', {}, {'site': 'site-b', 'tags': ['indoor']}, '192.168.1.2')
+SENSOR1 = Service(uuid4(), 'sensor-1', 'sensor', {}, {'site': 'site-a'}, '192.168.1.1')
+
+
+class ServiceRegistryTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_finds_services_by_indexed_fields(self):
+        # Given
+        registry = self._create_registry()
+
+        # When
+        result = registry.find(role='camera', site='site-a')
+
+        # Then
+        self.assertEqual([CAMERA1], result)
+
+    def test_finds_services_by_address(self):
+        # Given
+        registry = self._create_registry()
+
+        # When
+        result = registry.find(address='192.168.1.1')
+
+        # Then
+        self.assertCountEqual([CAMERA1, SENSOR1], result)
+
+    def test_finds_services_by_not_indexed_info_value(self):
+        # Given
+        registry = self._create_registry()
+
+        # When
+        result = registry.find(role='camera', tags=['indoor'])
+
+        # Then
+        self.assertEqual([CAMERA2], result)
+
+    def test_returns_all_services_when_no_criteria_given(self):
+        # Given
+        registry = self._create_registry()
+
+        # When
+        result = registry.find()
+
+        # Then
+        self.assertCountEqual([CAMERA1, CAMERA2, SENSOR1], result)
+
+    def test_selects_services_matching_query(self):
+        # Given
+        registry = self._create_registry()
+
+        # When
+        result = registry.select(ServiceQuery('camera-.*', '.*'))
+
+        # Then
+        self.assertCountEqual([CAMERA1, CAMERA2], result)
+
+    def test_reindexes_service_when_updated(self):
+        # Given
+        registry = self._create_registry()
+        moved = Service(CAMERA1.uuid, CAMERA1.name, CAMERA1.role, {}, {'site': 'site-c'}, CAMERA1.address)
+
+        # When
+        previous = registry.put(moved)
+
+        # Then
+        self.assertEqual(CAMERA1, previous)
+        self.assertEqual([], registry.find(role='camera', site='site-a'))
+        self.assertEqual([moved], registry.find(site='site-c'))
+
+    def test_removes_service_from_indexes(self):
+        # Given
+        registry = self._create_registry()
+
+        # When
+        registry.remove(SENSOR1.uuid)
+
+        # Then
+        self.assertEqual(2, len(registry))
+        self.assertNotIn(SENSOR1.uuid, registry)
+        self.assertEqual([], registry.find(role='sensor'))
+        self.assertNotIn('sensor', registry._roles)
+
+    def test_clears_services_and_indexes(self):
+        # Given
+        registry = self._create_registry()
+        version = registry.version
+
+        # When
+        registry.clear()
+
+        # Then
+        self.assertEqual(0, len(registry))
+        self.assertEqual([], registry.find(role='sensor'))
+        self.assertEqual(version + 1, registry.version)
+
+    def test_waits_for_in_flight_put_before_clearing(self):
+        # Given
+        registry = self._create_registry()
+        stripe = registry._stripe(SENSOR1.uuid)
+        stripe.acquire()
+        clearing = Thread(target=registry.clear)
+        clearing.start()
+
+        # When
+        clearing.join(0.1)
+        cleared_while_locked = not clearing.is_alive()
+        stripe.release()
+        clearing.join(1)
+
+        # Then
+        self.assertFalse(cleared_while_locked)
+        self.assertEqual(0, len(registry))
+
+    def test_calls_callbacks_with_previous_service(self):
+        # Given
+        registry = self._create_registry()
+        updated = Service(SENSOR1.uuid, SENSOR1.name, SENSOR1.role, {}, {'site': 'site-c'}, SENSOR1.address)
+        stored, removed = [], []
+
+        # When
+        registry.put(updated, stored.append)
+        registry.put(updated, stored.append)
+        registry.remove(SENSOR1.uuid, removed.append)
+        registry.remove(SENSOR1.uuid, removed.append)
+
+        # Then
+        self.assertEqual([SENSOR1, updated], stored)
+        self.assertEqual([updated, None], removed)
+
+    def test_returns_copy_of_services(self):
+        # Given
+        registry = self._create_registry()
+
+        # When
+        result = registry.to_dict()
+        result.clear()
+
+        # Then
+        self.assertEqual(3, len(registry.to_dict()))
+
+    def test_returns_same_snapshot_until_registry_changes(self):
+        # Given
+        registry = self._create_registry()
+        snapshot = registry.snapshot()
+
+        # When
+        result = registry.snapshot()
+
+        # Then
+        self.assertIs(snapshot, result)
+        self.assertEqual(registry.version, result.version)
+        self.assertEqual({CAMERA1.uuid: CAMERA1, CAMERA2.uuid: CAMERA2, SENSOR1.uuid: SENSOR1}, result)
+
+    def test_keeps_snapshot_unchanged_when_registry_changes(self):
+        # Given
+        registry = self._create_registry()
+        snapshot = registry.snapshot()
+
+        # When
+        registry.remove(CAMERA1.uuid)
+
+        # Then
+        self.assertEqual(3, len(snapshot))
+        self.assertEqual(2, len(registry.snapshot()))
+        self.assertLess(snapshot.version, registry.snapshot().version)
+
+    def test_does_not_change_version_when_equal_service_put(self):
+        # Given
+        registry = self._create_registry()
+        version = registry.version
+
+        # When
+        registry.put(Service(CAMERA1.uuid, CAMERA1.name, CAMERA1.role, {}, dict(CAMERA1.info), CAMERA1.address))
+
+        # Then
+        self.assertEqual(version, registry.version)
+
+    def test_diffs_snapshot_against_previous_one(self):
+        # Given
+        registry = self._create_registry()
+        previous = registry.snapshot()
+        moved = Service(CAMERA1.uuid, CAMERA1.name, CAMERA1.role, {}, {'site': 'site-c'}, CAMERA1.address)
+        added = Service(uuid4(), 'sensor-2', 'sensor', {}, {'site': 'site-b'}, '192.168.1.3')
+        registry.put(moved)
+        registry.put(Service(CAMERA2.uuid, CAMERA2.name, CAMERA2.role, {}, dict(CAMERA2.info), CAMERA2.address))
+        registry.put(added)
+        registry.remove(SENSOR1.uuid)
+
+        # When
+        result = registry.snapshot().diff(previous)
+
+        # Then
+        self.assertEqual(SnapshotDiff([added], [moved], [SENSOR1]), result)
+
+    def _create_registry(self) -> ServiceRegistry:
+        registry = ServiceRegistry(['site'])
+        for service in [CAMERA1, CAMERA2, SENSOR1]:
+            registry.put(service)
+        return registry
+
+
+if __name__ == '__main__':
+    unittest.main()
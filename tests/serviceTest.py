@@ -0,0 +1,61 @@
+import unittest
+from unittest import TestCase
+from uuid import uuid4
+
+from context_logger import setup_logging
+
+from hello import Service
+
+SERVICE = Service(uuid4(), 'camera-1', 'camera', {'api': 'http://192.168.1.1:8080'}, {'site': 'a', 'tags': [1, 2]},
+                  '192.168.1.1')
+
+
+class ServiceTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_has_same_fingerprint_when_content_equal(self):
+        # Given
+        service = Service(SERVICE.uuid, SERVICE.name, SERVICE.role, dict(SERVICE.urls),
+                          {'tags': [1, 2], 'site': 'a'}, SERVICE.address)
+
+        # When
+        result = service.fingerprint
+
+        # Then
+        self.assertEqual(SERVICE.fingerprint, result)
+        self.assertTrue(service.same_as(SERVICE))
+
+    def test_has_different_fingerprint_when_content_differs(self):
+        # Given
+        service = Service(SERVICE.uuid, SERVICE.name, SERVICE.role, dict(SERVICE.urls),
+                          {'site': 'a', 'tags': [2, 1]}, SERVICE.address)
+
+        # When
+        result = service.fingerprint
+
+        # Then
+        self.assertNotEqual(SERVICE.fingerprint, result)
+        self.assertFalse(service.same_as(SERVICE))
+
+    def test_ignores_fingerprint_in_equality_and_representation(self):
+        # Given
+        service = Service(SERVICE.uuid, SERVICE.name, SERVICE.role, dict(SERVICE.urls), dict(SERVICE.info),
+                          SERVICE.address)
+
+        # When
+        SERVICE.fingerprint
+
+        # Then
+        self.assertEqual(SERVICE, service)
+        self.assertNotIn('fingerprint', repr(SERVICE))
+        self.assertNotIn('_fingerprint', SERVICE.to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
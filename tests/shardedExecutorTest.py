@@ -0,0 +1,63 @@
+import time
+import unittest
+from threading import current_thread
+from unittest import TestCase
+from uuid import uuid4
+
+from context_logger import setup_logging
+
+from hello import ShardedExecutor
+
+
+class ShardedExecutorTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_executes_tasks_of_same_key_in_submission_order(self):
+        # Given
+        key = uuid4()
+        results = []
+
+        with ShardedExecutor(4) as executor:
+            # When
+            for index in range(100):
+                executor.submit(key, lambda value: (time.sleep(0.001 * (value % 3)), results.append(value)), index)
+
+        # Then
+        self.assertEqual(list(range(100)), results)
+
+    def test_executes_tasks_of_same_key_on_same_thread(self):
+        # Given
+        key = uuid4()
+
+        with ShardedExecutor(4) as executor:
+            # When
+            threads = {executor.submit(key, current_thread).result() for _ in range(10)}
+
+        # Then
+        self.assertEqual(1, len(threads))
+
+    def test_executes_tasks_of_different_keys_on_multiple_threads(self):
+        # Given
+        keys = [uuid4() for _ in range(32)]
+
+        with ShardedExecutor(4) as executor:
+            # When
+            threads = {executor.submit(key, current_thread).result() for key in keys}
+
+        # Then
+        self.assertGreater(len(threads), 1)
+
+    def test_raises_error_when_no_workers(self):
+        # When, Then
+        with self.assertRaises(ValueError):
+            ShardedExecutor(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
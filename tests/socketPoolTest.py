@@ -0,0 +1,89 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+from zmq import Context, ZMQError, RADIO
+
+from hello import SocketPool
+
+URL = 'udp://239.0.0.1:5555'
+
+
+class SocketPoolTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('hello', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_creates_and_connects_socket_on_first_acquire(self):
+        # Given
+        context = MagicMock(spec=Context)
+        pool = SocketPool(context)
+
+        # When
+        socket = pool.acquire(URL)
+
+        # Then
+        context.socket.assert_called_once_with(RADIO)
+        socket.connect.assert_called_once_with(URL)
+
+    def test_shares_socket_for_same_url(self):
+        # Given
+        context = MagicMock(spec=Context)
+        context.socket.side_effect = lambda socket_type: MagicMock()
+        pool = SocketPool(context)
+
+        # When
+        socket1 = pool.acquire(URL)
+        socket2 = pool.acquire(URL)
+        socket3 = pool.acquire('udp://239.0.0.2:5555')
+
+        # Then
+        self.assertIs(socket1, socket2)
+        self.assertIsNot(socket1, socket3)
+        self.assertEqual(2, context.socket.call_count)
+
+    def test_keeps_socket_open_for_reuse_when_released(self):
+        # Given
+        context = MagicMock(spec=Context)
+        pool = SocketPool(context)
+        socket = pool.acquire(URL)
+
+        # When
+        pool.release(URL)
+
+        # Then
+        socket.close.assert_not_called()
+        self.assertIs(socket, pool.acquire(URL))
+        context.socket.assert_called_once()
+
+    def test_closes_all_sockets_on_exit(self):
+        # Given
+        context = MagicMock(spec=Context)
+
+        with SocketPool(context) as pool:
+            socket = pool.acquire(URL)
+
+            # When
+
+        # Then
+        socket.close.assert_called_once()
+
+    def test_closes_socket_and_raises_error_when_fails_to_connect(self):
+        # Given
+        context = MagicMock(spec=Context)
+        context.socket.return_value.connect.side_effect = ZMQError(1, "Connect failed")
+        pool = SocketPool(context)
+
+        # When, Then
+        with self.assertRaises(ZMQError):
+            pool.acquire(URL)
+        context.socket.return_value.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()